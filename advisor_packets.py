@@ -0,0 +1,188 @@
+"""One-page advisor packets for a whole cohort of students, bundled in one ZIP.
+
+Each packet is a printable HTML page with the student's latest metrics, a GPA
+trend chart, their model risk factors and the dashboard's recommendations.
+The ZIP holds index.html, packets/<student_id>.html and charts/<student_id>.png.
+"""
+import html
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+# -----------------------------
+# BATCH ADVISOR PACKETS
+# -----------------------------
+# Chart rendering is the slow part, so students are split into batches and
+# each batch is rendered in its own worker process, which sets up one
+# matplotlib figure and only swaps the line data per student. Every chart is rendered once
+# and stored once in the ZIP; the packet and the index both link to it.
+# Recommendations and risk factors are worked out by the caller and passed in
+# as text, so the workers need nothing from the dashboard itself.
+
+PACKET_METRICS = {
+    'cum_gpa': ('Cumulative GPA', '{:.2f}'),
+    'gpa_term': ('Term GPA', '{:.2f}'),
+    'attendance_rate': ('Attendance Rate', '{:.1f}%'),
+    'assignments_on_time_pct': ('Assignments On Time', '{:.1f}%'),
+    'lms_logins': ('LMS Logins', '{:.0f}'),
+    'course_drop_count': ('Course Drops', '{:.0f}'),
+    'credits_attempted': ('Credits Attempted', '{:.0f}'),
+    'advisor_meetings': ('Advisor Meetings', '{:.0f}'),
+    'tutoring_sessions': ('Tutoring Sessions', '{:.0f}'),
+}
+TREND_COLUMNS = {'gpa_term': 'Term GPA', 'cum_gpa': 'Cumulative GPA'}
+HISTORY_COLUMNS = ['student_id', 'term'] + list(TREND_COLUMNS)
+# Terms listed under the chart; the chart shows them all
+RECENT_TERMS = 4
+DEFAULT_BATCH_SIZE = 100
+
+PACKET_STYLE = """
+@page { size: letter; margin: 1.5cm; }
+body { font-family: Helvetica, Arial, sans-serif; color: #222; max-width: 18cm; margin: auto; }
+h1 { font-size: 20px; margin-bottom: 0; }
+.subtitle { color: #666; margin-top: 4px; }
+.risk { font-size: 18px; color: #d62728; font-weight: bold; }
+table { border-collapse: collapse; width: 100%; }
+td, th { border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left; }
+img { width: 100%; }
+"""
+
+
+def _safe_name(student_id):
+    return ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(student_id))
+
+
+def new_chart():
+    """A GPA-by-term figure whose lines are redrawn per student, so axes, legend and layout are built once"""
+    # A bare Figure, not pyplot: no global figure registry to leak into, and it renders with Agg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(7, 2.6), dpi=80)
+    ax = fig.subplots()
+    lines = [ax.plot([], [], marker='o', label=label)[0] for label in TREND_COLUMNS.values()]
+    ax.axhline(2.0, color='#d62728', linestyle='--', linewidth=1)
+    ax.set_ylim(0, 4.1)
+    ax.set_ylabel('GPA')
+    ax.legend(loc='lower left', fontsize=8)
+    ax.tick_params(axis='x', labelsize=8)
+    fig.subplots_adjust(left=0.08, right=0.98, top=0.95, bottom=0.12)
+    return fig, ax, lines
+
+
+def trend_chart(chart, history):
+    """PNG of the student's GPA by term"""
+    fig, ax, lines = chart
+    positions = range(len(history))
+    for line, col in zip(lines, TREND_COLUMNS):
+        line.set_data(positions, history[col].to_numpy())
+    ax.set_xlim(-0.5, max(len(history), 1) - 0.5)
+    ax.set_xticks(positions, history['term'].astype(str).tolist())
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def packet_html(student, history, chart_file):
+    """One student's packet; student is a dict of the latest row plus 'recommendations' and 'risk_factors'"""
+    esc = lambda value: html.escape(str(value))
+    metric_rows = ''.join(
+        f"<tr><th>{label}</th><td>{fmt.format(student[col]) if pd.notna(student.get(col)) else '–'}</td></tr>"
+        for col, (label, fmt) in PACKET_METRICS.items() if col in student)
+    flags = [label for col, label in (('probation_flag', 'On probation'), ('financial_aid_flag', 'Financial aid'),
+                                       ('first_generation_flag', 'First generation')) if student.get(col) == 1]
+    factors = [factor for factor in str(student.get('risk_factors') or '').split(', ') if factor]
+    recommendations = [rec for rec in str(student.get('recommendations') or '').split('; ') if rec]
+    term_rows = ''.join(f"<tr><td>{esc(row.term)}</td><td>{row.gpa_term:.2f}</td><td>{row.cum_gpa:.2f}</td></tr>"
+                        for row in history.tail(RECENT_TERMS).itertuples())
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Advisor Packet {esc(student['student_id'])}</title>
+<style>{PACKET_STYLE}</style></head><body>
+<h1>{esc(student['student_id'])} · {esc(student['major'])}</h1>
+<p class="subtitle">Latest term {esc(student['term'])}{' · ' + esc(', '.join(flags)) if flags else ''}</p>
+<p class="risk">Predicted dropout risk: {student['pred_dropout_probability'] * 100:.1f}%</p>
+<table>{metric_rows}</table>
+<h2>GPA Trend</h2>
+<img src="../charts/{chart_file}" alt="GPA by term">
+<table><tr><th>Term</th><th>Term GPA</th><th>Cumulative GPA</th></tr>{term_rows}</table>
+<h2>Top Risk Factors</h2>
+{'<ul>' + ''.join(f'<li>{esc(factor)}</li>' for factor in factors) + '</ul>' if factors else '<p>None recorded.</p>'}
+<h2>Recommendations</h2>
+{'<ul>' + ''.join(f'<li>{esc(rec)}</li>' for rec in recommendations) + '</ul>' if recommendations else '<p>No specific actions.</p>'}
+</body></html>
+"""
+
+
+def render_batch(students, history_df):
+    """(file name, chart file name, packet HTML, chart PNG) for each student of one batch; runs in a worker"""
+    chart = new_chart()
+    histories = {student_id: rows for student_id, rows in history_df.groupby('student_id', sort=False)}
+    rendered = []
+    for student in students:
+        name = _safe_name(student['student_id'])
+        history = histories.get(student['student_id'], history_df.iloc[:0])
+        png = trend_chart(chart, history)
+        rendered.append((f'{name}.html', f'{name}.png', packet_html(student, history, f'{name}.png'), png))
+    return rendered
+
+
+def index_html(students, title):
+    rows = ''.join(
+        f"<tr><td><a href=\"packets/{_safe_name(student['student_id'])}.html\">{html.escape(str(student['student_id']))}</a></td>"
+        f"<td>{html.escape(str(student['major']))}</td><td>{student['pred_dropout_probability'] * 100:.1f}%</td></tr>"
+        for student in students)
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title><style>{PACKET_STYLE}</style></head><body>
+<h1>{html.escape(title)}</h1>
+<p class="subtitle">{len(students):,} students, highest predicted risk first. Generated {datetime.now():%B %d, %Y at %I:%M %p}.</p>
+<table><tr><th>Student ID</th><th>Major</th><th>Dropout Risk</th></tr>{rows}</table>
+</body></html>
+"""
+
+
+def build_packets(students_df, history_df, title="Advisor Packets", max_workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                  progress=None):
+    """ZIP bytes with one packet per row of students_df
+
+    students_df holds each student's latest row plus 'recommendations' ('; '-separated) and
+    'risk_factors' (', '-separated) text columns; history_df their term rows with HISTORY_COLUMNS.
+    progress(done, total) is called as batches finish.
+    """
+    students_df = students_df.sort_values('pred_dropout_probability', ascending=False, kind='stable')
+    students = students_df.to_dict(orient='records')
+    history_df = history_df[HISTORY_COLUMNS].sort_values(['student_id', 'term'], kind='stable')
+    batches = [students[start:start + batch_size] for start in range(0, len(students), batch_size)]
+    # Each batch ships only its own students' history
+    history_batches = [history_df[history_df['student_id'].isin([s['student_id'] for s in batch])] for batch in batches]
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        def add(rendered):
+            for packet_file, chart_file, packet, chart in rendered:
+                bundle.writestr(f'packets/{packet_file}', packet)
+                # PNGs are already compressed
+                bundle.writestr(f'charts/{chart_file}', chart, compress_type=zipfile.ZIP_STORED)
+
+        max_workers = min(len(batches), max_workers or os.cpu_count() or 1)
+        done = 0
+        if max_workers > 1:
+            # Spawned, not forked: the dashboard process runs server threads that a fork would copy mid-flight
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(render_batch, batch, history) for batch, history in zip(batches, history_batches)]
+                for future in as_completed(futures):
+                    add(future.result())
+                    done += 1
+                    if progress:
+                        progress(done, len(batches))
+        else:
+            for batch, history in zip(batches, history_batches):
+                add(render_batch(batch, history))
+                done += 1
+                if progress:
+                    progress(done, len(batches))
+        bundle.writestr('index.html', index_html(students, title))
+    return buffer.getvalue()
@@ -0,0 +1,294 @@
+"""Alert sweeps over the latest-term snapshot, with an index of notifications already sent.
+
+Usage: python alert_sweeps.py path/to/extract.csv [--rules alert_rules.json] [--index alert_index.db]
+
+Sweeps the extract once and prints what was queued; run it from cron after each
+data refresh. The dashboard runs the same sweep in the background whenever it
+first sees a new dataset version, and emails the queued alerts.
+"""
+import argparse
+import hashlib
+import json
+import operator
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from chunked_ingest import DEFAULT_CHUNKSIZE, keep_recent_terms
+from term_ingest import read_extract_chunks
+
+# -----------------------------
+# ALERT SWEEPS
+# -----------------------------
+# Each rule is one comparison on a latest-term column, evaluated over the
+# whole snapshot at once, with a window in days: a student is alerted at most
+# once per rule per window. Every alert raised is a row of an SQLite table
+# whose primary key is (student, rule, window start), so an alert already
+# raised in the current window is skipped by the insert itself, and queued
+# alerts stay there until they are delivered. A sweep only evaluates students
+# whose rule inputs changed: the index keeps a hash of each student's rule
+# columns, and a new snapshot is compared hash against hash first.
+
+DEFAULT_INDEX_FILE = 'alert_index.db'
+DEFAULT_RULES_FILE = 'alert_rules.json'
+MANUAL_RULE = 'manual'
+
+DEFAULT_RULES = [
+    {'id': 'high_dropout_risk', 'label': 'Predicted dropout probability above 40%',
+     'column': 'pred_dropout_probability', 'op': '>', 'value': 0.4, 'window_days': 30},
+    {'id': 'low_attendance', 'label': 'Attendance below 70%',
+     'column': 'attendance_rate', 'op': '<', 'value': 70, 'window_days': 30},
+    {'id': 'low_gpa', 'label': 'Cumulative GPA below 2.0',
+     'column': 'cum_gpa', 'op': '<', 'value': 2.0, 'window_days': 90},
+    {'id': 'probation', 'label': 'On academic probation',
+     'column': 'probation_flag', 'op': '==', 'value': 1, 'window_days': 120},
+]
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             '==': operator.eq, '!=': operator.ne}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    student_id TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    detail TEXT,
+    version TEXT,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    recipients TEXT,
+    sent_at TEXT,
+    error TEXT,
+    PRIMARY KEY (student_id, rule, window_start)
+);
+CREATE INDEX IF NOT EXISTS notifications_status ON notifications (status);
+CREATE TABLE IF NOT EXISTS student_state (student_id TEXT PRIMARY KEY, row_hash INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS sweeps (
+    version TEXT, swept_at TEXT, students INTEGER, changed INTEGER, matched INTEGER, queued INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def load_rules(path=DEFAULT_RULES_FILE):
+    """Rules from a JSON list in the DEFAULT_RULES format, or DEFAULT_RULES when the file does not exist"""
+    if not os.path.exists(path):
+        return DEFAULT_RULES
+    with open(path) as f:
+        rules = json.load(f)
+    for rule in rules:
+        missing = [key for key in ('id', 'label', 'column', 'op', 'value', 'window_days') if key not in rule]
+        if missing:
+            raise ValueError(f"{path}: rule {rule.get('id', '?')} is missing {', '.join(missing)}")
+        if rule['op'] not in OPERATORS:
+            raise ValueError(f"{path}: rule {rule['id']} has unknown operator {rule['op']!r}")
+        if rule['id'] == MANUAL_RULE:
+            raise ValueError(f"{path}: rule id {MANUAL_RULE!r} is reserved for emails sent by hand")
+    return rules
+
+
+def rule_columns(rules):
+    return sorted({rule['column'] for rule in rules})
+
+
+def window_start(now, window_days):
+    """First day of the window of window_days that now falls in, counted from the epoch"""
+    days = int(now.timestamp() // 86400)
+    return datetime.fromtimestamp((days - days % window_days) * 86400, tz=timezone.utc).date().isoformat()
+
+
+def evaluate_rules(frame, rules, now):
+    """(student_id, rule, window_start, detail) of every rule each row meets, one vectorized mask per rule"""
+    matches = []
+    for rule in rules:
+        hits = frame[OPERATORS[rule['op']](frame[rule['column']], rule['value']).to_numpy()]
+        matches.append(pd.DataFrame({
+            'student_id': hits['student_id'].astype(str).to_numpy(),
+            'rule': rule['id'],
+            'window_start': window_start(now, rule['window_days']),
+            'detail': (f"{rule['label']} ({rule['column']} = " + hits[rule['column']].round(2).astype(str) + ")").to_numpy(),
+        }))
+    return pd.concat(matches, ignore_index=True)
+
+
+def digest_body(alerts):
+    """One email listing a recipient's alerts, grouped by student"""
+    lines = [f"{alerts['student_id'].nunique()} students met an alert rule in the latest extract.", ""]
+    for student_id, rows in alerts.groupby('student_id', sort=True):
+        lines.append(f"Student ID: {student_id}")
+        lines.extend(f"  - {detail}" for detail in rows['detail'])
+    return "\n".join(lines)
+
+
+class AlertIndex:
+    """SQLite record of every alert raised, by (student, rule, window start), and the sweep state"""
+
+    def __init__(self, path=DEFAULT_INDEX_FILE):
+        self.path = path
+        # Sweeps run on a background thread while pages read the index
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def sweep(self, latest_df, rules, version=None, now=None, route=None):
+        """Queue the new alerts of the students whose rule inputs changed since the previous sweep
+
+        With route (as for deliver), alerts that would reach nobody are not queued. Their students are
+        evaluated again by the next sweep, in case someone can be reached by then.
+        """
+        now = now or datetime.now(timezone.utc)
+        columns = rule_columns(rules)
+        fingerprint = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+        state = pd.DataFrame({
+            'student_id': latest_df['student_id'].astype(str).to_numpy(),
+            'row_hash': pd.util.hash_pandas_object(latest_df[columns], index=False).to_numpy().view('int64'),
+        })
+        with self._lock, closing(self._connect()) as conn, conn:
+            stored_rules = conn.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+            if stored_rules is None or stored_rules[0] != fingerprint:
+                # Different rules: every student is evaluated again
+                conn.execute("DELETE FROM student_state")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('rules', ?)", (fingerprint,))
+            stored = pd.read_sql_query("SELECT student_id, row_hash FROM student_state", conn)
+            # Hashes use all 64 bits, so they are compared as integers, never through a float column
+            positions = pd.Index(stored['student_id']).get_indexer(state['student_id'])
+            changed = positions < 0
+            if len(stored):
+                changed |= stored['row_hash'].to_numpy()[positions] != state['row_hash'].to_numpy()
+
+            matches = evaluate_rules(latest_df[changed], rules, now)
+            unrouted = 0
+            if route is not None and len(matches):
+                routed = matches['student_id'].isin(route(matches)['student_id']).to_numpy()
+                unrouted = int((~routed).sum())
+                changed &= ~state['student_id'].isin(matches.loc[~routed, 'student_id']).to_numpy()
+                matches = matches[routed]
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO notifications (student_id, rule, window_start, detail, version, created_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+                [(*row, version, now.isoformat(timespec='seconds')) for row in matches.itertuples(index=False)])
+            queued = conn.total_changes - before
+            conn.executemany("INSERT OR REPLACE INTO student_state VALUES (?, ?)",
+                             state[changed].itertuples(index=False))
+            summary = {'version': version, 'swept_at': now.isoformat(timespec='seconds'), 'students': len(state),
+                       'changed': int(changed.sum()), 'matched': len(matches), 'queued': queued, 'unrouted': unrouted}
+            conn.execute("INSERT INTO sweeps VALUES (:version, :swept_at, :students, :changed, :matched, :queued)", summary)
+        return summary
+
+    def last_sweep(self):
+        with closing(self._connect()) as conn:
+            sweeps = pd.read_sql_query("SELECT * FROM sweeps ORDER BY rowid DESC LIMIT 1", conn)
+        return sweeps.iloc[0].to_dict() if len(sweeps) else None
+
+    def record_failure(self, version, attempt, error, now=None):
+        """Keep the latest failed sweep of a dataset version, until a sweep of any version succeeds"""
+        now = now or datetime.now(timezone.utc)
+        failure = {'version': version, 'attempt': attempt, 'failed_at': now.isoformat(timespec='seconds'),
+                   'error': error}
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_failure', ?)", (json.dumps(failure),))
+
+    def clear_failure(self):
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM meta WHERE key = 'last_failure'")
+
+    def last_failure(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_failure'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def status_counts(self):
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM notifications GROUP BY status").fetchall())
+
+    def queued(self):
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query("SELECT * FROM notifications WHERE status = 'queued' ORDER BY student_id, rule", conn)
+
+    def notifications(self, student_ids):
+        """Every alert raised for the given students, newest first"""
+        student_ids = [str(student_id) for student_id in student_ids]
+        frames = []
+        with closing(self._connect()) as conn:
+            # Bound parameters per statement are limited, so long ID lists are looked up in slices
+            for start in range(0, len(student_ids), 500):
+                ids = student_ids[start:start + 500]
+                frames.append(pd.read_sql_query(
+                    f"SELECT * FROM notifications WHERE student_id IN ({', '.join('?' * len(ids))})", conn, params=ids))
+        if not frames:
+            return pd.DataFrame(columns=['student_id', 'rule', 'window_start', 'detail', 'created_at', 'status'])
+        return pd.concat(frames, ignore_index=True).sort_values('created_at', ascending=False, kind='stable')
+
+    def record(self, student_id, recipient, detail, now=None):
+        """Log an email sent by hand, so it shows next to the automatic alerts"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO notifications (student_id, rule, window_start, detail, created_at, status, recipients, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, 'sent', ?, ?)",
+                (str(student_id), MANUAL_RULE, window_start(now, 1), detail, now.isoformat(timespec='seconds'),
+                 recipient, now.isoformat(timespec='seconds')))
+
+    def deliver(self, send, route):
+        """Email every recipient one digest of their queued alerts
+
+        route(alerts) returns the alerts with a 'recipient' column, one row per recipient; alerts with no
+        recipient, or whose email fails, stay queued for the next delivery.
+        """
+        queued = self.queued()
+        if queued.empty:
+            return 0
+        routed = route(queued)
+        delivered = 0
+        for recipient, alerts in routed.groupby('recipient', sort=True):
+            keys = list(alerts[['student_id', 'rule', 'window_start']].itertuples(index=False, name=None))
+            now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+            try:
+                send(recipient, f"Student alerts: {alerts['student_id'].nunique()} students", digest_body(alerts))
+            except Exception as e:
+                with self._lock, closing(self._connect()) as conn, conn:
+                    conn.executemany("UPDATE notifications SET error = ? WHERE student_id = ? AND rule = ? AND window_start = ?",
+                                     [(str(e), *key) for key in keys])
+                continue
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "UPDATE notifications SET status = 'sent', sent_at = ?, error = NULL, "
+                    "recipients = COALESCE(recipients || ', ', '') || ? WHERE student_id = ? AND rule = ? AND window_start = ?",
+                    [(now, recipient, *key) for key in keys])
+            delivered += len(keys)
+        return delivered
+
+
+def latest_snapshot(csv_path, columns, chunksize=DEFAULT_CHUNKSIZE):
+    """Each student's latest-term row of the given columns, in one chunked pass"""
+    latest = None
+    for chunk in read_extract_chunks(csv_path, chunksize, ['student_id', 'term'] + columns):
+        chunk_latest = keep_recent_terms(chunk, 1)
+        latest = chunk_latest if latest is None else keep_recent_terms(pd.concat([latest, chunk_latest]), 1)
+    return latest.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('extract')
+    parser.add_argument('--rules', default=DEFAULT_RULES_FILE)
+    parser.add_argument('--index', default=DEFAULT_INDEX_FILE)
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    stat = os.stat(args.extract)
+    summary = AlertIndex(args.index).sweep(latest_snapshot(args.extract, rule_columns(rules)), rules,
+                                           version=f"{stat.st_mtime_ns}-{stat.st_size}")
+    print(f"{summary['students']:,} students, {summary['changed']:,} changed since the last sweep: "
+          f"{summary['matched']:,} rule matches, {summary['queued']:,} new alerts queued")
+
+
+if __name__ == '__main__':
+    main()
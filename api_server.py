@@ -0,0 +1,276 @@
+"""Read-only JSON API over the dashboard data.
+
+Usage: python api_server.py [--host 127.0.0.1] [--port 8502]
+
+Run it from the directory holding the dataset. It uses the same
+DASHBOARD_BACKEND setting as the dashboard. It has no authentication and
+serves every student, so it only binds to loopback addresses.
+
+Endpoints:
+    GET /api/overview                     Overview metrics of the (filtered) cohort
+    GET /api/at-risk                      Latest-term rows above a dropout probability
+    GET /api/students/<student_id>/history  One student's term history
+
+Cohort filters are query parameters named after the dashboard's filter
+columns. Repeat a parameter for several values (?major=Biology&major=Business),
+and give ranges as low,high (?cum_gpa=0,2.5). /api/at-risk also takes
+min_probability (default: the dashboard's alert threshold), and limit and
+offset, which must not be negative.
+
+Every response carries an ETag derived from the dataset version. A poll that
+sends it back in If-None-Match gets an empty 304 until the extract is
+replaced. Nothing is loaded or computed to answer it.
+"""
+import argparse
+import ipaddress
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from chunked_ingest import scan_student_history, stream_extract
+from cohort_index import CATEGORICAL_FILTERS, FLAG_FILTERS, RANGE_FILTERS, CohortIndex
+from history_store import HistoryStore
+from data_store import DataStore, latest_snapshot
+from dashboard_data import (ALERT_DROPOUT_THRESHOLD, DATA_DIR, DATA_STORE_DIR, INGEST_CACHE_DIR, PARTITION_DIR,
+                            QUERY_BACKEND, QUERY_DB_FILE, extract_file, get_dataset_version, overview_metrics)
+from query_backend import BACKEND_ENGINES, open_backend
+from term_ingest import ingest_directory
+from term_partitions import TermPartitionStore
+
+logger = logging.getLogger(__name__)
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_filters(params):
+    """Cohort filters in the dashboard's {col: [values]} / {col: (low, high)} form"""
+    filters = {}
+    for col in CATEGORICAL_FILTERS + FLAG_FILTERS + RANGE_FILTERS:
+        if col not in params:
+            continue
+        values = params[col]
+        try:
+            if col in RANGE_FILTERS:
+                low, high = values[-1].split(',')
+                filters[col] = (float(low), float(high))
+            elif col in FLAG_FILTERS:
+                filters[col] = [int(value) for value in values]
+            else:
+                filters[col] = values
+        except ValueError:
+            raise APIError(400, f"Invalid value for {col}: {', '.join(values)}")
+    return filters
+
+
+def int_param(params, name, default):
+    if name not in params:
+        return default
+    try:
+        value = int(params.get(name, [default])[-1])
+    except ValueError:
+        raise APIError(400, f"{name} must be an integer")
+    if value < 0:
+        raise APIError(400, f"{name} must not be negative")
+    return value
+
+
+# -----------------------------
+# SNAPSHOT PER DATASET VERSION
+# -----------------------------
+class DatasetSnapshot:
+    """The snapshot, indexes and unfiltered aggregates of one dataset version; never modified once built"""
+
+    def __init__(self, version, backend=QUERY_BACKEND):
+        self.version = version
+        self.backend = backend
+        # SQL backends answer filters in the database; the others filter an in-memory snapshot
+        self.uses_sql = backend in BACKEND_ENGINES
+        if backend == 'memory' and DATA_DIR:
+            df = ingest_directory(DATA_DIR, INGEST_CACHE_DIR)[0]
+            self.latest = latest_snapshot(df)
+            self.history_store = HistoryStore(df)
+        elif backend == 'memory':
+            # The dashboards' typed store: parsed and grouped once per file version
+            store = DataStore(extract_file(), DATA_STORE_DIR)
+            self.latest = store.latest()
+            self.history_store = HistoryStore(store.records())
+        elif backend == 'chunked':
+            self.latest = stream_extract(extract_file())['latest']
+        elif backend == 'partitioned':
+            self.partition_store = TermPartitionStore(PARTITION_DIR)
+            self.latest = self.partition_store.read_snapshot('latest')
+        else:
+            self.query_backend = open_backend(extract_file(), QUERY_DB_FILE, version, backend)
+        if self.uses_sql:
+            self.full_overview = self._json_metrics(self.query_backend.overview_metrics())
+        else:
+            self.cohort_index = CohortIndex(self.latest)
+            self.full_overview = self._json_metrics(overview_metrics(self.latest))
+
+    @staticmethod
+    def _json_metrics(metrics):
+        return {key: float(value) if key == 'at_risk_share' else int(value) for key, value in metrics.items()}
+
+    def _cohort(self, filters):
+        if not filters:
+            return self.latest
+        return self.latest[self.cohort_index.to_mask(self.cohort_index.select(filters))]
+
+    def overview(self, filters):
+        if not filters:
+            return self.full_overview
+        if self.uses_sql:
+            return self._json_metrics(self.query_backend.overview_metrics(filters))
+        return self._json_metrics(overview_metrics(self._cohort(filters)))
+
+    def at_risk(self, filters, min_probability):
+        if self.uses_sql:
+            return self.query_backend.latest(filters, min_dropout_probability=min_probability)
+        cohort_df = self._cohort(filters)
+        return cohort_df[cohort_df['pred_dropout_probability'] > min_probability]
+
+    def student_history(self, student_id):
+        if self.backend == 'memory':
+            return self.history_store.student(student_id)
+        if self.backend == 'chunked':
+            return scan_student_history(extract_file(), student_id)
+        if self.backend == 'partitioned':
+            return self.partition_store.history([student_id])
+        return self.query_backend.student_history(student_id)
+
+
+class DashboardData:
+    """The current DatasetSnapshot, rebuilt when the dataset version changes"""
+
+    def __init__(self, backend=QUERY_BACKEND):
+        self.backend = backend
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def current(self, version):
+        # A request keeps the snapshot it started with. A rebuild is swapped in with one
+        # assignment, so no request ever sees the new snapshot with the old index.
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = DatasetSnapshot(version, self.backend)
+            return self.snapshot
+
+
+# -----------------------------
+# HTTP HANDLER
+# -----------------------------
+class APIHandler(BaseHTTPRequestHandler):
+    server_version = 'StudentDashboardAPI/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        version = get_dataset_version()
+        etag = f'"{version}"'
+        try:
+            # Path and parameters are checked first, so a bad request gets its 404 or 400, never a 304
+            answer = self.route(url.path, parse_qs(url.query))
+            # The ETag only depends on the dataset version, so a matching poll is
+            # answered from a single stat() of the extract
+            if_none_match = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+            if etag in if_none_match or '*' in if_none_match:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body, status = answer(self.server.data.current(version), version), 200
+        except APIError as e:
+            body, status = json.dumps({'error': str(e)}), e.status
+        except Exception:
+            logger.exception("Error answering %s", self.path)
+            body, status = json.dumps({'error': "Internal error"}), 500
+        self.send_json(status, body, etag if status == 200 else None)
+
+    def route(self, path, params):
+        """A function of (snapshot, version) answering the request; APIError for bad paths and parameters"""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts == ['api', 'overview']:
+            filters = parse_filters(params)
+            return lambda data, version: json.dumps({'dataset_version': version, **data.overview(filters)})
+        if parts == ['api', 'at-risk']:
+            filters = parse_filters(params)
+            try:
+                min_probability = float(params.get('min_probability', [ALERT_DROPOUT_THRESHOLD])[-1])
+            except ValueError:
+                raise APIError(400, "min_probability must be a number")
+            offset, limit = int_param(params, 'offset', 0), int_param(params, 'limit', None)
+
+            def at_risk(data, version):
+                at_risk_df = data.at_risk(filters, min_probability)
+                page = at_risk_df.iloc[offset:None if limit is None else offset + limit]
+                return (f'{{"dataset_version": "{version}", "total": {len(at_risk_df)}, '
+                        f'"students": {page.to_json(orient="records")}}}')
+            return at_risk
+        if len(parts) == 4 and parts[:2] == ['api', 'students'] and parts[3] == 'history':
+            student_id = parts[2]
+
+            def history(data, version):
+                history_df = data.student_history(student_id)
+                if history_df.empty:
+                    raise APIError(404, f"No record found for {student_id}")
+                return f'{{"dataset_version": "{version}", "terms": {history_df.to_json(orient="records")}}}'
+            return history
+        raise APIError(404, f"Unknown endpoint: {path}")
+
+    def send_json(self, status, body, etag=None):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if etag:
+            self.send_header('ETag', etag)
+            # Clients may keep the body but must revalidate before reusing it
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data):
+        super().__init__(address, APIHandler)
+        self.data = data
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help="a loopback address")
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+    # Every student is served to every caller, so the API must not be reachable from other machines
+    if not is_loopback(args.host):
+        parser.error(f"--host {args.host} is not a loopback address; the API has no authentication "
+                     "or roster scoping")
+
+    server = APIServer((args.host, args.port), DashboardData())
+    print(f"Serving the dashboard API on http://{args.host}:{server.server_address[1]}/api/ ({QUERY_BACKEND} backend)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Compare peak memory of the in-memory and chunked load paths.
+
+Usage: python bench_ingest.py path/to/extract.csv [chunksize]
+
+Each mode runs in its own subprocess so the reported peak RSS is not shared.
+"""
+import resource
+import subprocess
+import sys
+import time
+
+
+def run_mode(mode, csv_path, chunksize):
+    import pandas as pd
+    from chunked_ingest import stream_extract
+    from data_store import latest_snapshot
+
+    start = time.perf_counter()
+    if mode == 'memory':
+        df = pd.read_csv(csv_path)
+        latest_df = latest_snapshot(df)
+        rows = len(df)
+    else:
+        extract = stream_extract(csv_path, chunksize=chunksize)
+        latest_df = extract['latest']
+        rows = extract['aggregates'].records
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<8} rows={rows:>10,} students={len(latest_df):>8,} time={elapsed:7.2f}s peak_rss={peak_mb:8.1f} MB")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    csv_path = sys.argv[1]
+    chunksize = sys.argv[2] if len(sys.argv) > 2 else '200000'
+    for mode in ('memory', 'chunked'):
+        subprocess.run([sys.executable, __file__, '--run', mode, csv_path, chunksize], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run_mode(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main()
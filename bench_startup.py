@@ -0,0 +1,79 @@
+"""Measure dashboard startup: module import, login page and first dashboard page.
+
+Usage: python bench_startup.py [typing_seconds]
+
+Run it from the directory holding the dataset. Each measurement runs in its
+own subprocess so imports and caches start cold. The first dashboard page is
+timed after the login page has been shown for typing_seconds (default 5),
+once without and once with the background prewarm.
+"""
+import os
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'my_app.py')
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly.express', 'sklearn', 'joblib')
+
+
+def run_import():
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    start = time.perf_counter()
+    import my_app  # noqa: F401
+    elapsed = time.perf_counter() - start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"{'import':<18} time={elapsed:6.2f}s heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+
+def run_login():
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    AppTest.from_file(APP_PATH, default_timeout=300).run()
+    print(f"{'login page':<18} time={time.perf_counter() - start:6.2f}s")
+
+
+def run_first_page(typing_seconds):
+    from streamlit.testing.v1 import AppTest
+    from load_test import LOAD_TEST_PASSWORD, LOAD_TEST_USER
+
+    at = AppTest.from_file(APP_PATH, default_timeout=300).run()
+    time.sleep(typing_seconds)
+    at.text_input(key='login_username').input(LOAD_TEST_USER)
+    at.text_input(key='login_password').input(LOAD_TEST_PASSWORD)
+    start = time.perf_counter()
+    at = at.button[0].click().run()
+    elapsed = time.perf_counter() - start
+    if not at.session_state['logged_in']:
+        raise RuntimeError('Login failed')
+    label = 'overview, prewarm' if os.environ.get('DASHBOARD_PREWARM') == '1' else 'overview, cold'
+    print(f"{label:<18} time={elapsed:6.2f}s (after {typing_seconds:.0f}s on the login page)")
+
+
+def main():
+    from load_test import prepare_user_db
+
+    typing_seconds = sys.argv[1] if len(sys.argv) > 1 else '5'
+    user_db = prepare_user_db()
+    env = dict(os.environ, DASHBOARD_USER_DB=user_db)
+    try:
+        subprocess.run([sys.executable, __file__, '--run', 'import'], env=dict(env, DASHBOARD_PREWARM='0'), check=True)
+        subprocess.run([sys.executable, __file__, '--run', 'login'], env=dict(env, DASHBOARD_PREWARM='0'), check=True)
+        for prewarm in ('0', '1'):
+            subprocess.run([sys.executable, __file__, '--run', 'first-page', typing_seconds],
+                           env=dict(env, DASHBOARD_PREWARM=prewarm), check=True)
+    finally:
+        os.remove(user_db)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        mode = sys.argv[2]
+        if mode == 'import':
+            run_import()
+        elif mode == 'login':
+            run_login()
+        else:
+            run_first_page(float(sys.argv[3]))
+    else:
+        main()
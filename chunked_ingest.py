@@ -0,0 +1,75 @@
+import pandas as pd
+
+from cohort_sketches import CohortSketches
+from term_ingest import parse_term_file, read_extract_chunks
+
+# -----------------------------
+# OUT-OF-CORE CHUNKED INGEST
+# -----------------------------
+# For extracts larger than memory. The CSV is read in chunks and, in a single
+# pass, we keep only what the pages need: each student's two most recent
+# terms (latest snapshot plus the previous term for trajectory deltas), each
+# student's latest at-risk term, record counts per term and the per-cohort
+# quantile and distinct-count sketches. A student's latest term is their
+# literal last row, as in every other backend.
+# Peak memory is bounded by the number of students, not the number of rows.
+
+DEFAULT_CHUNKSIZE = 200_000
+
+
+class StreamingAggregates:
+    """Record counts, overall and per term, merged chunk by chunk"""
+
+    def __init__(self):
+        self.records = 0
+        self.term_counts = pd.Series(dtype='int64')
+
+    def update(self, chunk):
+        self.records += len(chunk)
+        self.term_counts = self.term_counts.add(chunk['term'].value_counts(), fill_value=0).astype('int64')
+
+
+def keep_recent_terms(frame, n_terms):
+    """Each student's n_terms most recent rows, whole and in student and term order"""
+    frame = frame.sort_values(['student_id', 'term'], kind='stable')
+    return frame.groupby('student_id', sort=False).tail(n_terms)
+
+
+def stream_extract(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Single pass over csv_path returning snapshots and aggregates, never the raw frame"""
+    aggregates = StreamingAggregates()
+    sketches = CohortSketches()
+    recent = None
+    at_risk = None
+    for chunk in read_extract_chunks(csv_path, chunksize):
+        aggregates.update(chunk)
+        sketches.update(chunk)
+        chunk_recent = keep_recent_terms(chunk, 2)
+        recent = chunk_recent if recent is None else keep_recent_terms(pd.concat([recent, chunk_recent]), 2)
+        chunk_at_risk = keep_recent_terms(chunk[chunk['pred_at_risk_flag'] == 1], 1)
+        at_risk = chunk_at_risk if at_risk is None else keep_recent_terms(pd.concat([at_risk, chunk_at_risk]), 1)
+
+    if recent is None:
+        # A header-only extract: empty snapshots with the extract's columns and dtypes
+        recent = at_risk = parse_term_file(csv_path)
+    is_latest = ~recent['student_id'].duplicated(keep='last')
+    return {
+        'latest': recent[is_latest.to_numpy()].reset_index(drop=True),
+        # Latest and previous term per student, enough for term-over-term deltas
+        'recent': recent.reset_index(drop=True),
+        'at_risk_latest': at_risk.reset_index(drop=True),
+        'aggregates': aggregates,
+        'sketches': sketches,
+    }
+
+
+def scan_student_history(csv_path, student_id, chunksize=DEFAULT_CHUNKSIZE):
+    """One student's rows, found by scanning the extract chunk by chunk"""
+    return scan_students_history(csv_path, [student_id], chunksize)
+
+
+def scan_students_history(csv_path, student_ids, chunksize=DEFAULT_CHUNKSIZE):
+    """Rows of several students in one pass over the extract, in student and term order"""
+    matches = [chunk[chunk['student_id'].isin(student_ids)]
+               for chunk in read_extract_chunks(csv_path, chunksize)]
+    return pd.concat(matches).sort_values(['student_id', 'term'], kind='stable')
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# COHORT BITMAP INDEX
+# -----------------------------
+# Built once per dataset version over the latest-term snapshot (one row per
+# student). Every categorical value owns a packed bitmap, every range column
+# a sorted copy of its values, so a cohort is answered with bitwise AND/OR
+# over small uint8 arrays instead of successive boolean masks and copies.
+
+CATEGORICAL_FILTERS = ['major', 'residence', 'gender', 'enrollment_status', 'term']
+FLAG_FILTERS = ['pred_at_risk_flag', 'probation_flag', 'financial_aid_flag',
+                'first_generation_flag', 'late_registration']
+RANGE_FILTERS = ['cum_gpa', 'attendance_rate', 'pred_dropout_probability']
+
+
+class CohortIndex:
+    """Packed bitmaps per categorical value plus sorted arrays for ranges"""
+
+    def __init__(self, latest_df, categorical_cols=CATEGORICAL_FILTERS + FLAG_FILTERS,
+                 range_cols=RANGE_FILTERS):
+        self.n_rows = len(latest_df)
+        self.bitmaps = {}
+        self.ranges = {}
+        for col in categorical_cols:
+            if col not in latest_df:
+                continue
+            codes, uniques = pd.factorize(latest_df[col], sort=True)
+            self.bitmaps[col] = {value: self._pack(codes == code) for code, value in enumerate(uniques)}
+        for col in range_cols:
+            if col not in latest_df:
+                continue
+            values = latest_df[col].to_numpy(dtype='float64')
+            order = np.argsort(values, kind='stable')
+            # NaNs sort last and are excluded from every range
+            valid = int((~np.isnan(values)).sum())
+            self.ranges[col] = (values[order][:valid], order[:valid])
+
+    def _pack(self, mask):
+        return np.packbits(mask)
+
+    def all(self):
+        return self._pack(np.ones(self.n_rows, dtype=bool))
+
+    def none(self):
+        return self._pack(np.zeros(self.n_rows, dtype=bool))
+
+    def values(self, col):
+        return list(self.bitmaps.get(col, {}))
+
+    def bounds(self, col):
+        sorted_values, _ = self.ranges[col]
+        if not len(sorted_values):
+            return 0.0, 0.0
+        return float(sorted_values[0]), float(sorted_values[-1])
+
+    def isin(self, col, values):
+        bits = self.none()
+        for value in values:
+            if value in self.bitmaps[col]:
+                bits |= self.bitmaps[col][value]
+        return bits
+
+    def between(self, col, low=None, high=None):
+        sorted_values, order = self.ranges[col]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        end = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[order[start:end]] = True
+        return self._pack(mask)
+
+    def select(self, filters):
+        """AND together {col: [values]} and {col: (low, high)} predicates"""
+        bits = self.all()
+        for col, predicate in filters.items():
+            if col in self.ranges:
+                bits &= self.between(col, *predicate)
+            elif predicate:
+                bits &= self.isin(col, predicate)
+        return bits
+
+    def to_mask(self, bits):
+        return np.unpackbits(bits, count=self.n_rows).astype(bool)
+
+    def count(self, bits):
+        return int(np.unpackbits(bits, count=self.n_rows).sum())
+
+
+def filter_key(filters):
+    """Hashable, order-independent form of a filters dict"""
+    key = []
+    for col, predicate in filters.items():
+        if not predicate:
+            continue
+        if col in RANGE_FILTERS:
+            key.append((col, tuple(predicate)))
+        else:
+            key.append((col, tuple(sorted(map(str, predicate)))))
+    return tuple(sorted(key))
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+from cohort_stats import COHORT_GROUP_COLUMNS
+
+# -----------------------------
+# MERGEABLE COHORT SKETCHES
+# -----------------------------
+# Built at ingest over every term record, one cell per (major, term,
+# residence). Each cell keeps a KLL quantile sketch per metric and a
+# HyperLogLog of its student IDs. Both merge without loss of their
+# guarantees, so any union of cells (Biology and Chemistry, last four
+# terms, on campus) is answered by merging the cells' sketches, never by
+# rescanning records. Chunks are folded in the same way, so the chunked
+# ingest pass builds them without holding the extract.
+#
+# Error bounds, checked against exact values on the sample extracts:
+#   KLL, k=200        quantile rank within about +/-1.7% of the records
+#                     (99% confidence), whatever the cohort size
+#   HyperLogLog, p=12 distinct students within 1.6% (one standard error),
+#                     3.3% at 95%; exact-ish below a few thousand students
+#                     thanks to the linear-counting correction
+
+SKETCH_COLUMNS = ['cum_gpa', 'gpa_term', 'attendance_rate', 'assignments_on_time_pct', 'lms_logins',
+                  'pred_dropout_probability']
+SKETCH_INPUT_COLUMNS = ['student_id'] + COHORT_GROUP_COLUMNS + SKETCH_COLUMNS
+DEFAULT_K = 200
+DEFAULT_PRECISION = 12
+
+
+class KLLSketch:
+    """KLL quantile sketch: levels of sorted compactors, items at level h weigh 2**h"""
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind so the total weight stays exactly n
+                leftover, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.n += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        if not self.n:
+            return [float('nan')] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side='left')
+        return items[order][np.minimum(positions, len(items) - 1)].tolist()
+
+
+def _bit_length(values):
+    """Bit length of each uint64, by binary search over shifts"""
+    length = np.zeros(len(values), dtype='int64')
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length += high * shift
+        values = np.where(high, values >> np.uint64(shift), values)
+    return length + (values > 0)
+
+
+class HyperLogLog:
+    """Distinct counts with 2**precision one-byte registers"""
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8')
+
+    def update(self, values):
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype('int64')
+        remainder = hashes & np.uint64((1 << width) - 1)
+        # Position of the first 1 bit in the remaining bits
+        rank = (width - _bit_length(remainder) + 1).astype('uint8')
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype('float64'))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class CohortSketches:
+    """Per-cell KLL sketches of each metric and a HyperLogLog of student IDs, mergeable by cell and by chunk"""
+
+    def __init__(self, columns=SKETCH_COLUMNS, group_cols=COHORT_GROUP_COLUMNS, k=DEFAULT_K,
+                 precision=DEFAULT_PRECISION):
+        self.columns = list(columns)
+        self.group_cols = list(group_cols)
+        self.k = k
+        self.precision = precision
+        self.cells = {}
+
+    def _new_cell(self):
+        cell = {col: KLLSketch(self.k) for col in self.columns}
+        cell['students'] = HyperLogLog(self.precision)
+        cell['records'] = 0
+        return cell
+
+    def update(self, frame):
+        """Fold a chunk of term records into the cells"""
+        # Cell keys are strings, so terms and codes read from any backend land in the same cell
+        cells = frame[self.group_cols].astype(str).groupby(self.group_cols, sort=False).indices
+        values = {col: frame[col].to_numpy(dtype='float64') for col in self.columns}
+        student_ids = frame['student_id'].to_numpy()
+        for key, rows in cells.items():
+            cell = self.cells.setdefault(key, self._new_cell())
+            for col in self.columns:
+                cell[col].update(values[col][rows])
+            cell['students'].update(student_ids[rows])
+            cell['records'] += len(rows)
+        return self
+
+    def merge(self, other):
+        for key, other_cell in other.cells.items():
+            cell = self.cells.setdefault(key, self._new_cell())
+            for col in self.columns:
+                cell[col].merge(other_cell[col])
+            cell['students'].merge(other_cell['students'])
+            cell['records'] += other_cell['records']
+        return self
+
+    def keys(self):
+        return pd.DataFrame(list(self.cells), columns=self.group_cols)
+
+    def cohort(self, selections=None):
+        """Merged sketches of the cells matching {column: [values]}; every cell when nothing is selected"""
+        wanted = [(self.group_cols.index(col), {str(value) for value in values})
+                  for col, values in (selections or {}).items() if values]
+        merged = self._new_cell()
+        for key, cell in self.cells.items():
+            if all(key[i] in values for i, values in wanted):
+                for col in self.columns:
+                    merged[col].merge(cell[col])
+                merged['students'].merge(cell['students'])
+                merged['records'] += cell['records']
+        return merged
+
+    def summary(self, selections=None, qs=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """Approximate quantiles per metric, distinct students and records of a cohort of cells"""
+        merged = self.cohort(selections)
+        table = pd.DataFrame([merged[col].quantiles(qs) for col in self.columns], index=self.columns, columns=list(qs))
+        return table, merged['students'].count(), merged['records']
+
+
+def exact_summary(records, selections=None, columns=SKETCH_COLUMNS, qs=(0.1, 0.25, 0.5, 0.75, 0.9)):
+    """The same summary computed from the records, for validating the sketches"""
+    mask = np.ones(len(records), dtype=bool)
+    for col, values in (selections or {}).items():
+        if values:
+            mask &= records[col].astype(str).isin([str(value) for value in values]).to_numpy()
+    cohort = records[mask]
+    table = pd.DataFrame([cohort[col].quantile(list(qs), interpolation='lower').tolist() for col in columns],
+                         index=columns, columns=list(qs))
+    return table, cohort['student_id'].nunique(), len(cohort)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# COHORT SUFFICIENT STATISTICS
+# -----------------------------
+# Per-group pairwise sufficient statistics for the correlation heatmap.
+# For features i, j and the rows of a group where both are present:
+#   n[i, j]     count
+#   sums[i, j]  sum of x_i
+#   sumsq[i, j] sum of x_i ** 2
+#   cross[i, j] sum of x_i * x_j
+# Keeping them pairwise matches the pairwise-complete behaviour of
+# DataFrame.corr(), and because every statistic is a plain sum, any cohort
+# (or union of cohorts) is assembled by adding the rows of its groups.
+
+COHORT_GROUP_COLUMNS = ['major', 'term', 'residence']
+
+
+def build_cohort_stats(latest_df, numeric_cols, group_cols=COHORT_GROUP_COLUMNS):
+    """Precompute per-group sufficient statistics for numeric_cols"""
+    values = latest_df[numeric_cols].to_numpy(dtype='float64')
+    present = ~np.isnan(values)
+    # Shift by the column means so the one-pass formulas stay well conditioned
+    values = np.where(present, values - np.nanmean(values, axis=0), 0.0)
+    present = present.astype('float64')
+
+    codes, keys = pd.MultiIndex.from_frame(latest_df[group_cols].astype(str)).factorize()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    starts = np.concatenate(([0], bounds)) if len(order) else bounds
+    ends = np.concatenate((bounds, [len(order)])) if len(order) else bounds
+
+    n_groups, n_features = len(keys), len(numeric_cols)
+    shape = (n_groups, n_features, n_features)
+    size = ends - starts
+    n, sums, sumsq, cross = (np.zeros(shape) for _ in range(4))
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        rows = order[start:end]
+        x, m = values[rows], present[rows]
+        n[g] = m.T @ m
+        sums[g] = x.T @ m
+        sumsq[g] = (x * x).T @ m
+        cross[g] = x.T @ x
+
+    return {
+        'columns': list(numeric_cols),
+        'keys': keys.to_frame(index=False, name=group_cols),
+        'size': size,
+        'n': n,
+        'sums': sums,
+        'sumsq': sumsq,
+        'cross': cross,
+    }
+
+
+def cohort_mask(stats, selections):
+    """Boolean mask over groups matching {column: [values]} selections"""
+    keys = stats['keys']
+    mask = np.ones(len(keys), dtype=bool)
+    for col, values in selections.items():
+        if values:
+            mask &= keys[col].isin([str(v) for v in values]).to_numpy()
+    return mask
+
+
+def cohort_correlation(stats, selections=None):
+    """Correlation matrix for the union of groups matching the selections"""
+    mask = cohort_mask(stats, selections or {})
+    n = stats['n'][mask].sum(axis=0)
+    sums = stats['sums'][mask].sum(axis=0)
+    sumsq = stats['sumsq'][mask].sum(axis=0)
+    cross = stats['cross'][mask].sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = sums / n
+        mean_y = sums.T / n
+        cov = cross / n - mean_x * mean_y
+        var_x = sumsq / n - mean_x ** 2
+        var_y = sumsq.T / n - mean_y ** 2
+        corr = cov / np.sqrt(var_x * var_y)
+    corr[n < 2] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+
+    columns = stats['columns']
+    return pd.DataFrame(corr, index=columns, columns=columns), int(stats['size'][mask].sum())
@@ -0,0 +1,68 @@
+"""Where the dashboard data lives, which version of it is current, and the Overview figures.
+
+Shared by my_app.py and api_server.py. It imports no Streamlit, so the API
+process loads only what it serves. Every setting comes from the environment,
+read once at import.
+"""
+import os
+import time
+
+from data_store import DEFAULT_DATA_FILE, DEFAULT_STORE_DIR as DEFAULT_DATA_STORE
+from retraining import current_extract
+from term_ingest import directory_version, term_files
+from term_partitions import DEFAULT_STORE_DIR, manifest_path
+
+# Either naming works in every backend: at_risk_flag/dropout_probability are read as the pred_ columns
+DATA_FILE = os.environ.get('DASHBOARD_DATA_FILE', DEFAULT_DATA_FILE)
+# 'memory' keeps the extract in pandas, 'chunked' streams it and keeps only per-student snapshots,
+# 'partitioned' reads the snapshots of a term-partitioned store and older terms on demand,
+# 'sqlite' or 'duckdb' query a local database file instead
+QUERY_BACKEND = os.environ.get('DASHBOARD_BACKEND', 'memory')
+# A directory of per-term extracts, ingested in parallel by the memory backend instead of DATA_FILE
+DATA_DIR = os.environ.get('DASHBOARD_DATA_DIR') if QUERY_BACKEND == 'memory' else None
+INGEST_CACHE_DIR = os.environ.get('DASHBOARD_INGEST_CACHE', 'ingest_cache')
+# Typed records and snapshot of DATA_FILE, shared with streamlit_app.py
+DATA_STORE_DIR = os.environ.get('DASHBOARD_DATA_STORE', DEFAULT_DATA_STORE)
+# Backends that hold only per-student snapshots and load full histories on demand
+SNAPSHOT_BACKENDS = ('chunked', 'partitioned')
+PARTITION_DIR = os.environ.get('DASHBOARD_PARTITIONS', DEFAULT_STORE_DIR)
+QUERY_DB_FILE = os.environ.get('DASHBOARD_DB', 'hsu_dashboard.db')
+ALERT_DROPOUT_THRESHOLD = 0.4
+
+
+def extract_file():
+    # DATA_FILE, or its newest rescored copy from the retraining page
+    return current_extract(DATA_FILE)
+
+
+def dataset_path():
+    # The partitioned store rewrites its manifest whenever a term is archived
+    if QUERY_BACKEND == 'partitioned':
+        return manifest_path(PARTITION_DIR)
+    return DATA_DIR or extract_file()
+
+
+def get_dataset_version():
+    # Changes whenever the extract is replaced, so every derived cache keyed
+    # on it is rebuilt exactly once per dataset version
+    if DATA_DIR:
+        return directory_version(DATA_DIR)
+    stat = os.stat(dataset_path())
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def dataset_mtime():
+    if DATA_DIR:
+        return max((os.stat(path).st_mtime for path in term_files(DATA_DIR)), default=time.time())
+    return os.stat(dataset_path()).st_mtime
+
+
+def overview_metrics(latest_df):
+    return {
+        'total_students': latest_df['student_id'].nunique(),
+        'at_risk_students': latest_df['pred_at_risk_flag'].sum(),
+        'at_risk_share': latest_df['pred_at_risk_flag'].mean() if len(latest_df) else 0.0,
+        'low_attendance': (latest_df['attendance_rate'] < 80).sum(),
+        'low_gpa': (latest_df['cum_gpa'] < 2.0).sum(),
+        'on_probation': latest_df['probation_flag'].sum(),
+    }
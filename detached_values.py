@@ -0,0 +1,86 @@
+import threading
+import time
+import weakref
+
+# -----------------------------
+# VALUES BUILT OFF THE SCRIPT RUN
+# -----------------------------
+# st.cache_resource neither reads nor stores outside a script run, so the
+# dashboard's background threads (prewarm, alert sweeps), which run without
+# one, cannot fill it. They build through a DetachedValues instead. The first
+# session lookup of the same key takes the value over rather than building it
+# again, and a value no session takes within max_age seconds is dropped.
+# Values the sessions built are referenced weakly, so a background thread
+# reuses them instead of loading a second copy. The shared instance lives in
+# this module because my_app.py is executed afresh on every rerun.
+
+DEFAULT_MAX_AGE_SECONDS = 600
+
+
+class DetachedValues:
+    """Thread-safe handoff of values between background threads and session cache builds"""
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE_SECONDS, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self._values = {}
+        self._building = {}
+        self._session_values = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def take(self, key, build):
+        """For a session's cache miss: the value a background thread built, or is building, else build()"""
+        with self._lock:
+            pending = self._building.get(key)
+        if pending is not None:
+            pending.wait()
+        with self._lock:
+            value, _ = self._values.pop(key, (None, None))
+        if value is None:
+            value = build()
+        try:
+            self._session_values[key] = value
+        except TypeError:
+            pass  # not weakly referenceable; a background thread builds its own
+        return value
+
+    def get_or_build(self, key, build):
+        """For a background thread: a value a session or another thread already has, else build() and keep it"""
+        with self._lock:
+            self._drop_expired()
+            value = self._session_values.get(key)
+            if value is None:
+                value, _ = self._values.get(key, (None, None))
+            if value is not None:
+                return value
+            pending = self._building.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._building[key] = threading.Event()
+        if not owner:
+            # Another background thread is building it; take its value, or build here if that build failed
+            pending.wait()
+            with self._lock:
+                value, _ = self._values.get(key, (None, None))
+            return value if value is not None else build()
+        try:
+            value = build()
+            with self._lock:
+                self._values[key] = (value, self.clock())
+            return value
+        finally:
+            with self._lock:
+                del self._building[key]
+            pending.set()
+
+    def _drop_expired(self):
+        expired = self.clock() - self.max_age
+        for key in [key for key, (_, built_at) in self._values.items() if built_at < expired]:
+            del self._values[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values)
+
+
+DETACHED_VALUES = DetachedValues()
@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# -----------------------------
+# SHARED FILTER RESULT CACHE
+# -----------------------------
+# Professors keep asking for the same few filter combinations. The rows a
+# combination selects are kept once per process as an int32 array of row
+# positions (not a frame), keyed by dataset version and a normalized filter
+# tuple, so the same request from any session is a dictionary lookup. The
+# least recently used results are evicted once the arrays exceed a byte cap.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FilterResultCache:
+    """Thread-safe LRU of row-position arrays under a total byte cap, with hit-rate counters"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return positions
+
+    def put(self, key, positions):
+        positions = np.asarray(positions, dtype='int32')
+        # Shared between sessions, so nobody may modify it in place
+        positions.flags.writeable = False
+        if positions.nbytes > self.max_bytes:
+            return positions
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = positions
+            self._bytes += positions.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return positions
+
+    def get_or_compute(self, key, compute):
+        """Cached positions for key, computing and storing them on a miss"""
+        positions = self.get(key)
+        if positions is None:
+            # Computed outside the lock; two sessions missing together both compute, and the result is the same
+            positions = self.put(key, compute())
+        return positions
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# PER-STUDENT HISTORY STORE
+# -----------------------------
+# CSR layout over the shared extract: one permutation that orders the rows by
+# (student_id, term) and an offsets array marking where each student's terms
+# start. A student's history is then one contiguous slice of the permutation,
+# and N students cost N slices instead of N scans of the whole table. The
+# extract itself is never copied; rows are gathered with a single take().
+
+
+class HistoryStore:
+    """Term-sorted row order plus CSR offsets per student"""
+
+    def __init__(self, df):
+        self.df = df
+        ids = df['student_id'].to_numpy()
+        self.order = np.lexsort((df['term'].to_numpy(), ids))
+        sorted_ids = ids[self.order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]][:len(ids)])
+        self.student_ids = pd.Index(sorted_ids[starts])
+        # Student i owns order[offsets[i]:offsets[i + 1]]
+        self.offsets = np.r_[starts, len(ids)].astype('int64')
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def locate(self, student_ids):
+        """Store slot of each id, -1 for ids not in the extract"""
+        return self.student_ids.get_indexer(pd.Index(student_ids))
+
+    def rows(self, student_ids):
+        """Positions in df of every term of the given students, grouped by student in term order"""
+        slots = self.locate(student_ids)
+        slots = slots[slots >= 0]
+        starts, ends = self.offsets[slots], self.offsets[slots + 1]
+        lengths = ends - starts
+        # Concatenated aranges for all slices without a Python loop
+        shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.order[np.arange(lengths.sum()) + shift]
+
+    def history(self, student_ids):
+        return self.df.take(self.rows(student_ids))
+
+    def student(self, student_id):
+        slot = self.locate([student_id])[0]
+        if slot < 0:
+            return self.df.iloc[:0]
+        return self.df.take(self.order[self.offsets[slot]:self.offsets[slot + 1]])
@@ -0,0 +1,232 @@
+"""Concurrent-session load test for my_app.py.
+
+Usage: python load_test.py --sessions 20 --iterations 3 [--workdir DIR] [--app my_app.py]
+
+Each simulated professor runs in its own thread with Streamlit's AppTest,
+so sessions share the process-wide caches exactly as they would behind one
+`streamlit run`. A session logs in, visits every page, changes cohort and
+table filters, searches for students and sends one alert email to a local
+stand-in SMTP server. Reports p50/p95/p99 rerun latency, throughput and the
+process peak RSS. Run it from (or point --workdir at) a directory holding
+the dataset; the email secrets must be configured but may hold dummy values.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import resource
+import socketserver
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+LOAD_TEST_USER = 'loadtest'
+LOAD_TEST_PASSWORD = 'loadtest-password'
+
+
+# -----------------------------
+# LOCAL SMTP STAND-IN
+# -----------------------------
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        self.reply('220 localhost load-test SMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-localhost\r\n250 AUTH PLAIN LOGIN\r\n')
+            elif command.startswith('HELO') or command.startswith('MAIL') or command.startswith('RCPT') \
+                    or command.startswith('RSET') or command.startswith('NOOP'):
+                self.reply('250 OK')
+            elif command.startswith('AUTH'):
+                self.reply('235 Authentication successful')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 OK queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.messages = 0
+
+
+# -----------------------------
+# SIMULATED SESSION
+# -----------------------------
+def timed_run(element, latencies):
+    start = time.perf_counter()
+    app = element.run()
+    latencies.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return app
+
+
+def simulate_session(app_path, iterations, seed, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    latencies = []
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    timed_run(at, latencies)
+
+    at.text_input(key='login_username').input(LOAD_TEST_USER)
+    at.text_input(key='login_password').input(LOAD_TEST_PASSWORD)
+    at = timed_run(at.button[0].click(), latencies)
+    if not at.session_state['logged_in']:
+        raise RuntimeError('Login failed')
+
+    pages = at.sidebar.radio[0].options
+    for _ in range(iterations):
+        for page in pages:
+            at = timed_run(at.sidebar.radio[0].set_value(page), latencies)
+
+            if page == 'At-Risk Students Data':
+                at = timed_run(at.slider[0].set_value(round(rng.uniform(1.5, 4.0), 1)), latencies)
+            elif page == 'At-Risk Students':
+                send_buttons = [b for b in at.button if str(b.key).startswith('send_')]
+                if send_buttons:
+                    student_id = send_buttons[0].key[len('send_'):]
+                    at.text_input(key=f'email_{student_id}').input('advisor@localhost')
+                    at = timed_run(at.button(key=f'send_{student_id}').click(), latencies)
+            elif page == 'Student Search':
+                at.text_input[0].input(f"HSU{rng.randint(100000, 100999)}")
+                at = timed_run(at, latencies)
+
+        majors = at.multiselect(key='cohort_major').options
+        chosen = rng.sample(majors, k=min(2, len(majors))) if majors else []
+        at = timed_run(at.multiselect(key='cohort_major').set_value(chosen), latencies)
+        at = timed_run(at.multiselect(key='cohort_major').set_value([]), latencies)
+    return latencies
+
+
+# -----------------------------
+# DRIVER
+# -----------------------------
+def install_shared_runtime():
+    """Give all sessions one mock runtime.
+
+    AppTest installs a fresh mock Runtime, pages cache and script cache before
+    each run and clears them afterwards. That breaks as soon as sessions run
+    in parallel threads and would also hide cache_data sharing, so the real
+    runtime slot gets one shared instance and AppTest's per-run swaps are
+    redirected elsewhere.
+    """
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type('RuntimeSlot', (), {'_instance': None})
+    # Same for the pages cache AppTest clears and restores around each run
+    app_test.source_util = types.SimpleNamespace(_pages_cache_lock=threading.Lock(), _cached_pages=None)
+    # One compiled-script cache like the server's; concurrent compile() of the
+    # same script from many threads is not reliable on every Python version
+    script_cache = local_script_runner.ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+    # AppTest patches config.get_option around each run; overlapping patches
+    # from several threads restore each other's originals, so set it once
+    config.get_option = build_mock_config_get_option({'global.appTest': True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+
+def prepare_user_db():
+    handle, path = tempfile.mkstemp(prefix='loadtest_users_', suffix='.json')
+    with os.fdopen(handle, 'w') as f:
+        json.dump({LOAD_TEST_USER: hashlib.sha256(LOAD_TEST_PASSWORD.encode()).hexdigest()}, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--app', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'my_app.py'))
+    parser.add_argument('--workdir', default='.')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    app_path = os.path.abspath(args.app)
+    os.chdir(args.workdir)
+
+    smtp = SMTPStandIn()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    user_db = prepare_user_db()
+    os.environ.update({
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(smtp.server_address[1]),
+        'SMTP_USE_TLS': '0',
+        'DASHBOARD_USER_DB': user_db,
+    })
+
+    install_shared_runtime()
+    latencies, failures = [], []
+    try:
+        # One serial session first: imports every module and fills the shared caches,
+        # as on a server that has already served its first professor
+        cold = simulate_session(app_path, 1, -1, args.timeout)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [pool.submit(simulate_session, app_path, args.iterations, seed, args.timeout)
+                       for seed in range(args.sessions)]
+            for future in futures:
+                try:
+                    latencies.extend(future.result())
+                except Exception as e:
+                    failures.append(str(e))
+    finally:
+        smtp.shutdown()
+        os.remove(user_db)
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"No reruns completed; failures: {failures}")
+        return
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Warm-up session: {len(cold)} reruns, slowest {max(cold) * 1000:.0f} ms")
+    print(f"Sessions:        {args.sessions} ({len(failures)} failed)")
+    print(f"Reruns:          {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} reruns/s)")
+    print(f"Rerun latency:   p50 {p50:.0f} ms | p95 {p95:.0f} ms | p99 {p99:.0f} ms")
+    print(f"Emails accepted: {smtp.messages}")
+    print(f"Peak RSS:        {peak_rss_mb:.1f} MB")
+    for failure in failures[:5]:
+        print(f"Failure: {failure}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# PER-SESSION MEMORY ACCOUNTING
+# -----------------------------
+# Shared caches are counted once per process; what multiplies with concurrent
+# professors is what each session keeps in st.session_state and what each
+# rerun materialises. Pages record the frames they build with track(), and
+# the dashboard compares both totals against a configurable budget.
+
+RERUN_LEDGER_KEY = '_rerun_memory'
+
+
+def deep_sizeof(obj, _seen=None, sample=None):
+    """Approximate bytes held by obj, following containers
+
+    With sample, the strings of object columns are sized from that many evenly
+    spaced values instead of all of them, which is far cheaper on large frames.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if sample and isinstance(obj, pd.DataFrame):
+        # Held in a list so no temporary Series is freed and its id reused while seen holds it
+        columns = [obj[col] for col in obj.columns]
+        return sum(deep_sizeof(column, seen, sample) for column in columns) + deep_sizeof(obj.index, seen, sample)
+    if sample and isinstance(obj, (pd.Series, pd.Index)) and obj.dtype == object and len(obj) > sample:
+        values = obj.to_numpy()
+        sampled = values[np.linspace(0, len(values) - 1, sample).astype('int64')]
+        return int(values.nbytes + len(values) * np.mean([sys.getsizeof(value) for value in sampled]))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen, sample) + deep_sizeof(v, seen, sample) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen, sample) for item in obj)
+    elif sample and hasattr(obj, '__dict__') and not isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+        # Cached helper objects (stores, indexes) hold their frames as attributes
+        size += deep_sizeof(vars(obj), seen, sample)
+    return size
+
+
+def session_state_bytes(session_state):
+    """Bytes per session_state key, excluding the rerun ledger itself"""
+    return {key: deep_sizeof(session_state[key]) for key in session_state.keys() if key != RERUN_LEDGER_KEY}
+
+
+def start_rerun(session_state):
+    session_state[RERUN_LEDGER_KEY] = {}
+
+
+def track(session_state, label, obj):
+    """Record obj as materialised by this rerun and return it unchanged"""
+    ledger = session_state.get(RERUN_LEDGER_KEY)
+    if ledger is not None:
+        ledger[label] = ledger.get(label, 0) + deep_sizeof(obj)
+    return obj
+
+
+def untrack(session_state, *labels):
+    """Forget labels a fragment is about to record again, so its partial reruns are not counted twice"""
+    ledger = session_state.get(RERUN_LEDGER_KEY)
+    if ledger is not None:
+        for label in labels:
+            ledger.pop(label, None)
+
+
+def rerun_bytes(session_state):
+    return dict(session_state.get(RERUN_LEDGER_KEY, {}))
+
+
+def format_bytes(n_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if n_bytes < 1024:
+            return f"{n_bytes:.0f} {unit}" if unit == 'B' else f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} GB"
@@ -0,0 +1,171 @@
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------------
+# PROMETHEUS METRICS
+# -----------------------------
+# A small process-wide registry of counters, gauges and histograms, rendered
+# in the Prometheus text exposition format (version 0.0.4). Sessions record
+# into it from any thread; gauges that are cheaper to read than to keep up to
+# date (dataset age, filter cache size) are computed by collector callbacks
+# when the metrics are rendered. The text is served from a local /metrics
+# endpoint or written to a file for node_exporter's textfile collector.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; data loads on large extracts take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _declare(self, name, kind, help_text, buckets=None):
+        with self._lock:
+            self._metrics.setdefault(name, {'kind': kind, 'help': help_text, 'buckets': buckets, 'series': {}})
+        return name
+
+    def counter(self, name, help_text):
+        return self._declare(name, 'counter', help_text)
+
+    def gauge(self, name, help_text):
+        return self._declare(name, 'gauge', help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._declare(name, 'histogram', help_text, tuple(buckets))
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            series = self._metrics[name]['series']
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._metrics[name]['series'][_label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            metric = self._metrics[name]
+            key = _label_key(labels)
+            if key not in metric['series']:
+                metric['series'][key] = {'buckets': [0] * len(metric['buckets']), 'sum': 0.0, 'count': 0}
+            series = metric['series'][key]
+            for i, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the block in seconds, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def collector(self, func):
+        """Register func(registry), called before every render to set gauges that are computed on demand"""
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    def render(self):
+        for func in list(self._collectors):
+            try:
+                func(self)
+            except Exception:
+                # A failing collector must not take the other metrics down with it
+                pass
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['kind']}")
+                for key, value in sorted(metric['series'].items()):
+                    if metric['kind'] != 'histogram':
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                        continue
+                    for bound, count in zip(metric['buckets'], value['buckets']):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Write the metrics for node_exporter's textfile collector; scrapers never see a partial file"""
+        # Every rerun of every session writes, so each write gets its own temporary file
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            try:
+                f.write(self.render())
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        # mkstemp files are private to their owner; node_exporter usually runs as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+
+# One registry per process, shared by every session and rerun
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the dashboard's log
+        pass
+
+
+def serve_metrics(registry, host='127.0.0.1', port=9464):
+    """Serve GET /metrics on a daemon thread and return the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -1,25 +1,55 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timezone
+import functools
 import hashlib
+import inspect
 import json
+import logging
 import os
-import joblib
-from sklearn.preprocessing import StandardScaler
+import threading
+import time
+from cohort_stats import COHORT_GROUP_COLUMNS, build_cohort_stats, cohort_correlation
+from cohort_index import CATEGORICAL_FILTERS, FLAG_FILTERS, RANGE_FILTERS, CohortIndex, filter_key
+from trajectory import TRAJECTORY_COLUMNS, build_trajectories, rapid_decline
+from query_backend import open_backend
+from chunked_ingest import DEFAULT_CHUNKSIZE, stream_extract, scan_students_history
+from history_store import HistoryStore
+from term_partitions import TermPartitionStore
+from term_ingest import ingest_directory, parse_term_file, read_extract_chunks
+from data_store import DataStore, latest_snapshot
+from roster_partitions import DEFAULT_ROSTER_FILE, RosterPartitionStore, file_version, load_rosters
+from risk_attribution import FACTOR_COLUMNS
+from retraining import CANDIDATE_MODELS, DEFAULT_FOLDS, RetrainingWorker, model_info
+from retention import RETENTION_COLUMNS, build_retention
+from cohort_sketches import SKETCH_INPUT_COLUMNS, CohortSketches, exact_summary
+from advisor_packets import build_packets
+from alert_sweeps import DEFAULT_INDEX_FILE as DEFAULT_ALERT_INDEX, DEFAULT_RULES_FILE, AlertIndex, load_rules, rule_columns
+from snapshot_diff import DIFF_COLUMNS, MIN_PROBABILITY_DELTA, SnapshotHistory, change_lists
+from filter_cache import FilterResultCache
+from detached_values import DETACHED_VALUES
+from memory_budget import deep_sizeof, start_rerun, track, untrack, session_state_bytes, rerun_bytes, format_bytes
+from metrics import REGISTRY, serve_metrics
+from dashboard_data import (ALERT_DROPOUT_THRESHOLD, DATA_DIR, DATA_FILE, DATA_STORE_DIR, INGEST_CACHE_DIR, PARTITION_DIR,
+                            QUERY_BACKEND, QUERY_DB_FILE, SNAPSHOT_BACKENDS, dataset_mtime, dataset_path, extract_file,
+                            get_dataset_version, overview_metrics)
+
+logger = logging.getLogger(__name__)
 
 # -----------------------------
 # CONFIG
 # -----------------------------
-SENDER_EMAIL = st.secrets["SENDER_EMAIL"]
-EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
+# Email credentials come from st.secrets and are read only when an email is sent
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', '1') == '1'
 
 # -----------------------------
 # USER AUTHENTICATION
 # -----------------------------
-USER_DB_FILE = "users.json"
+USER_DB_FILE = os.environ.get('DASHBOARD_USER_DB', "users.json")
 
 def load_users():
     if os.path.exists(USER_DB_FILE):
@@ -34,17 +64,26 @@ def save_users(users):
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+# An entry is either the password hash or {'password': hash, 'email': ..., 'role': 'admin'}
+def password_hash(entry):
+    return entry['password'] if isinstance(entry, dict) else entry
+
+def user_role(username):
+    entry = load_users().get(username)
+    return entry.get('role', 'professor') if isinstance(entry, dict) else 'professor'
+
 def verify_login(username, password):
     users = load_users()
     if username in users:
-        return users[username] == hash_password(password)
+        return password_hash(users[username]) == hash_password(password)
     return False
 
 def register_user(username, password, email):
     users = load_users()
     if username in users:
         return False, "Username already exists"
-    users[username] = hash_password(password)
+    # The email is where alert sweeps send this professor's roster alerts
+    users[username] = {'password': hash_password(password), 'email': email}
     save_users(users)
     return True, "Registration successful"
 
@@ -64,7 +103,7 @@ def login_page():
                     st.session_state['logged_in'] = True
                     st.session_state['username'] = login_username
                     st.success("Login successful!")
-                    st.experimental_rerun()
+                    st.rerun()
                 else:
                     st.error("Invalid username or password")
             else:
@@ -93,81 +132,686 @@ def login_page():
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-@st.cache_data
-def load_data():
-    df = pd.read_csv('hsu_complete_dataset_with_predictions.csv')
-    return df
+# Data file, backend and store settings are in dashboard_data.py, shared with the API
+# Compact latest-term snapshots of recent dataset versions, for the What's New page
+SNAPSHOT_HISTORY_DIR = os.environ.get('DASHBOARD_SNAPSHOT_HISTORY', 'snapshot_history')
+WHATS_NEW_PROBABILITY_DELTA = 0.15
+# Professor username -> student ID pairs; while the file exists, professors see only their roster and admins everything
+ROSTER_FILE = os.environ.get('DASHBOARD_ROSTERS', DEFAULT_ROSTER_FILE)
+ROSTER_PARTITION_DIR = os.environ.get('DASHBOARD_ROSTER_PARTITIONS', 'roster_partitions')
+# Alert rules are swept over each new dataset version in the background; queued alerts are emailed to roster owners
+ALERT_SWEEPS = os.environ.get('DASHBOARD_ALERT_SWEEPS', '1') == '1'
+ALERT_RULES_FILE = os.environ.get('DASHBOARD_ALERT_RULES', DEFAULT_RULES_FILE)
+ALERT_INDEX_FILE = os.environ.get('DASHBOARD_ALERT_INDEX', DEFAULT_ALERT_INDEX)
+# Also receives every alert, e.g. the advising office
+ALERT_EMAIL = os.environ.get('DASHBOARD_ALERT_EMAIL')
+# A failed sweep of the current dataset version runs again once this long has passed
+ALERT_SWEEP_RETRY_SECONDS = int(os.environ.get('DASHBOARD_ALERT_RETRY_SECONDS', 600))
+TABLE_PAGE_SIZE = 100
+CASELOAD_MAX_STUDENTS = 100
+# Packets are about 25 KB each and the ZIP is held in the session until downloaded
+PACKET_MAX_STUDENTS = int(os.environ.get('DASHBOARD_PACKET_MAX_STUDENTS', 5000))
+# Warn when one session holds more than this in session_state plus what a rerun materialises
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get('DASHBOARD_SESSION_BUDGET_MB', 25))
+# Labeled records the retraining page fits on, the model it writes and its fit cache
+TRAINING_FILE = os.environ.get('DASHBOARD_TRAINING_FILE', 'HSU_Student_Success_Data.csv')
+MODEL_FILE = os.environ.get('DASHBOARD_MODEL', 'dropout_model.joblib')
+MODEL_CACHE_DIR = os.environ.get('DASHBOARD_MODEL_CACHE', 'model_cache')
+# Row positions of recent filter results, shared by every session
+FILTER_CACHE_MB = float(os.environ.get('DASHBOARD_FILTER_CACHE_MB', 64))
+# Load the dataset in the background while the first professor is still on the login page
+PREWARM_ON_LOGIN = os.environ.get('DASHBOARD_PREWARM', '1') == '1'
+# Prometheus metrics: served on 127.0.0.1:<port>/metrics when a port is set, written to a file when a path is set
+METRICS_PORT = int(os.environ.get('DASHBOARD_METRICS_PORT', 0))
+METRICS_FILE = os.environ.get('DASHBOARD_METRICS_FILE')
+
+# -----------------------------
+# METRICS
+# -----------------------------
+DATA_LOAD_SECONDS = REGISTRY.histogram('dashboard_data_load_seconds', "Time to load the dataset, per cache")
+SNAPSHOT_BUILD_SECONDS = REGISTRY.histogram('dashboard_snapshot_build_seconds', "Time to build a snapshot or index, per cache")
+CACHE_BUILD_SECONDS = REGISTRY.histogram('dashboard_cache_build_seconds', "Time to build any other cached result, per cache")
+CACHE_HITS = REGISTRY.counter('dashboard_cache_hits_total', "Shared cache lookups answered from the cache")
+CACHE_MISSES = REGISTRY.counter('dashboard_cache_misses_total', "Shared cache lookups that built the result")
+CACHE_ENTRY_BYTES = REGISTRY.gauge('dashboard_cache_entry_bytes', "Approximate size of the most recently built entry, per cache")
+FILTER_CACHE_ENTRIES = REGISTRY.gauge('dashboard_filter_cache_entries', "Filter results held in the shared filter cache")
+FILTER_CACHE_BYTES = REGISTRY.gauge('dashboard_filter_cache_bytes', "Bytes held in the shared filter cache")
+FILTER_CACHE_LOOKUPS = REGISTRY.gauge('dashboard_filter_cache_lookups', "Shared filter cache lookups and evictions since start, by result")
+DATASET_AGE_SECONDS = REGISTRY.gauge('dashboard_dataset_age_seconds', "Seconds since the dataset was last modified")
+EMAIL_SEND_SECONDS = REGISTRY.histogram('dashboard_email_send_seconds', "Time to send one email, by result")
+EMAILS_IN_FLIGHT = REGISTRY.gauge('dashboard_emails_in_flight', "Emails being sent right now")
+RETRAINING_QUEUE_DEPTH = REGISTRY.gauge('dashboard_retraining_queue_depth', "Retraining jobs queued or running")
+PAGE_RENDER_SECONDS = REGISTRY.histogram('dashboard_page_render_seconds', "Time to render one page, per page")
+
+_cache_lookup = threading.local()
+
+def tracked_cache(metric=CACHE_BUILD_SECONDS, **cache_args):
+    # st.cache_resource that counts hits and misses and times and sizes every build. Outside a
+    # script run, where cache_resource cannot store, builds go through DETACHED_VALUES instead.
+    def decorate(func):
+        name = func.__name__.removeprefix('get_')
+        signature = inspect.signature(func)
+
+        def detached_key(args, kwargs):
+            # The arguments cache_resource hashes; it leaves out the underscore-prefixed ones
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return (name,) + tuple((arg, value) for arg, value in bound.arguments.items() if not arg.startswith('_'))
+
+        def compute(*args, **kwargs):
+            _cache_lookup.missed = True
+            with REGISTRY.time(metric, cache=name):
+                value = func(*args, **kwargs)
+            REGISTRY.set(CACHE_ENTRY_BYTES, deep_sizeof(value, sample=1000), cache=name)
+            return value
+
+        @functools.wraps(func)
+        def build(*args, **kwargs):
+            return DETACHED_VALUES.take(detached_key(args, kwargs), lambda: compute(*args, **kwargs))
+
+        cached = st.cache_resource(**cache_args)(build)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            # Saved and restored, so a nested lookup inside a build does not hide the outer miss
+            outer = getattr(_cache_lookup, 'missed', False)
+            _cache_lookup.missed = False
+            try:
+                if get_script_run_ctx(suppress_warning=True) is None:
+                    value = DETACHED_VALUES.get_or_build(detached_key(args, kwargs), lambda: compute(*args, **kwargs))
+                else:
+                    value = cached(*args, **kwargs)
+                REGISTRY.inc(CACHE_MISSES if _cache_lookup.missed else CACHE_HITS, cache=name)
+                return value
+            finally:
+                _cache_lookup.missed = outer
+
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+def collect_dataset_age(registry):
+    registry.set(DATASET_AGE_SECONDS, time.time() - dataset_mtime())
+
+@st.cache_resource
+def start_metrics_export():
+    # Once per process; the registry lives in the metrics module, so it outlives reruns
+    REGISTRY.collector(collect_dataset_age)
+    return serve_metrics(REGISTRY, port=METRICS_PORT) if METRICS_PORT else None
+
+# A shared resource rather than cache_data, which would hand every rerun its own unpickled copy.
+# Pages must treat the frame as read-only.
+@tracked_cache(DATA_LOAD_SECONDS)
+def load_data(version):
+    if DATA_DIR:
+        # Unchanged term files are read back from the ingest cache instead of parsed again
+        df, _ = ingest_directory(DATA_DIR, INGEST_CACHE_DIR)
+        return df
+    # Parsed once per file version into the typed store that streamlit_app.py reads too
+    return DataStore(extract_file(), DATA_STORE_DIR).records()
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_latest_snapshot(version, _df):
+    return latest_snapshot(_df)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_memory_snapshot(version):
+    # The whole extract's snapshot; a single file's was stored with its records when it was parsed
+    if DATA_DIR:
+        return get_latest_snapshot(version, load_data(version))
+    return DataStore(extract_file(), DATA_STORE_DIR).latest()
+
+@tracked_cache(DATA_LOAD_SECONDS)
+def get_partition_store(version):
+    return TermPartitionStore(PARTITION_DIR)
+
+@tracked_cache(DATA_LOAD_SECONDS)
+def get_streamed_extract(version):
+    if QUERY_BACKEND == 'partitioned':
+        return get_partition_store(version).snapshot()
+    return stream_extract(extract_file())
+
+def load_students_history(version, student_ids):
+    if QUERY_BACKEND == 'partitioned':
+        return get_partition_store(version).history(student_ids)
+    return scan_students_history(extract_file(), student_ids)
+
+@tracked_cache(DATA_LOAD_SECONDS)
+def get_query_backend(version):
+    return open_backend(extract_file(), QUERY_DB_FILE, version, QUERY_BACKEND)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_at_risk_snapshot(version, _df):
+    # Each student's most recent term that was predicted at risk
+    return latest_snapshot(_df[_df['pred_at_risk_flag'] == 1])
+
+@tracked_cache()
+def get_full_overview_metrics(version):
+    # Overview figures for the unfiltered cohort, the first page every session opens
+    if QUERY_BACKEND == 'memory':
+        return overview_metrics(get_memory_snapshot(version))
+    if QUERY_BACKEND in SNAPSHOT_BACKENDS:
+        return overview_metrics(get_streamed_extract(version)['latest'])
+    return get_query_backend(version).overview_metrics()
+
+def load_latest_snapshot(version, columns):
+    # The institution's latest-term rows, with at least the given columns
+    if QUERY_BACKEND == 'memory':
+        return get_memory_snapshot(version)
+    if QUERY_BACKEND in SNAPSHOT_BACKENDS:
+        return get_streamed_extract(version)['latest']
+    return get_query_backend(version).latest(columns=columns)
+
+@tracked_cache()
+def get_version_diff(version):
+    # Recorded and diffed once per dataset version, the first time it is loaded,
+    # so the What's New page only reads the stored result
+    latest_df = load_latest_snapshot(version, DIFF_COLUMNS)
+    history = SnapshotHistory(SNAPSHOT_HISTORY_DIR)
+    history.record(version, latest_df)
+    previous_version = history.previous_version(version)
+    return {
+        'previous_recorded_at': history.recorded_at(previous_version) if previous_version else None,
+        'diff': history.load_diff(version),
+    }
+
+def load_record_columns(version, columns, roster=None):
+    # A few columns of every term record, from the session's roster partition or whichever backend is active
+    if roster is not None:
+        return get_roster_records(version, roster)[columns]
+    if QUERY_BACKEND == 'memory':
+        return load_data(version)[columns]
+    if QUERY_BACKEND == 'partitioned':
+        return get_partition_store(version).read_columns(columns)
+    if QUERY_BACKEND == 'chunked':
+        return parse_term_file(extract_file(), columns)
+    return get_query_backend(version).records(columns)
+
+@tracked_cache()
+def get_retention_records(version, roster=None):
+    # Only the columns the retention matrix needs, for every term record
+    return load_record_columns(version, RETENTION_COLUMNS, roster)
+
+@tracked_cache()
+def get_retention(version, roster=None):
+    return build_retention(get_retention_records(version, roster))
+
+def cohort_retention(version, cohort_ids=None, roster=None):
+    # The unfiltered matrices are built once per dataset version; a cohort is a few pivots over the cached records
+    if cohort_ids is None:
+        return get_retention(version, roster)
+    records = get_retention_records(version, roster)
+    return build_retention(records[records['student_id'].isin(cohort_ids)])
+
+@tracked_cache()
+def get_cohort_sketches(version, roster=None):
+    # Built once per dataset version; the chunked backend builds them in its single ingest pass
+    if QUERY_BACKEND == 'chunked' and roster is None:
+        return get_streamed_extract(version)['sketches']
+    return CohortSketches().update(load_record_columns(version, SKETCH_INPUT_COLUMNS, roster))
+
+@tracked_cache()
+def get_sketch_records(version, roster=None):
+    # Loaded only when someone asks for exact percentiles
+    return load_record_columns(version, SKETCH_INPUT_COLUMNS, roster)
+
+# Select numeric columns for correlation
+CORRELATION_COLUMNS = ['age', 'credits_attempted', 'course_drop_count', 'gpa_term', 'cum_gpa',
+                       'lms_logins', 'attendance_rate', 'assignments_on_time_pct', 'discussion_posts',
+                       'library_visits', 'work_hours_per_week', 'advisor_meetings', 'tutoring_sessions',
+                       'pred_dropout_probability', 'pred_at_risk_flag']
+
+@tracked_cache(max_entries=32)
+def get_cohort_stats(version, cohort_key, _latest_df):
+    return build_cohort_stats(_latest_df, CORRELATION_COLUMNS)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_history_store(version, _df):
+    return HistoryStore(_df)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_trajectories(version, _df):
+    return build_trajectories(_df)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_backend_trajectories(version):
+    return get_query_backend(version).latest_trajectories()
+
+# -----------------------------
+# ROSTER SCOPE
+# -----------------------------
+def session_roster(username):
+    # (username, roster file version) for a professor; None for the full view: admins, or everyone without a roster file
+    if not os.path.exists(ROSTER_FILE) or user_role(username) == 'admin':
+        return None
+    return (username, file_version(ROSTER_FILE))
+
+def roster_scope(version, roster):
+    # Cache key for the snapshots built from one roster's records
+    return version if roster is None else f"{version}/roster/{roster[0]}/{roster[1]}"
+
+def record_chunks(version):
+    # Every term record of the active backend, a chunk at a time
+    if QUERY_BACKEND == 'memory':
+        df = load_data(version)
+        for start in range(0, len(df), DEFAULT_CHUNKSIZE):
+            yield df.iloc[start:start + DEFAULT_CHUNKSIZE]
+    elif QUERY_BACKEND == 'partitioned':
+        store = get_partition_store(version)
+        for term in store.terms:
+            yield store.read_term(term)
+    else:
+        # The query databases are built from the same extract
+        yield from read_extract_chunks(extract_file(), DEFAULT_CHUNKSIZE)
+
+@tracked_cache(DATA_LOAD_SECONDS)
+def get_roster_store(version, rosters_version):
+    # Partitioned once per dataset and roster version; after a restart the partitions on disk are reused
+    store = RosterPartitionStore(ROSTER_PARTITION_DIR)
+    if not store.is_current(version, rosters_version):
+        store.build(record_chunks(version), load_rosters(ROSTER_FILE), version, rosters_version)
+    return store
+
+@tracked_cache(DATA_LOAD_SECONDS)
+def get_roster_records(version, roster):
+    # Every term record of one roster, shared by all of that professor's sessions
+    username, rosters_version = roster
+    return get_roster_store(version, rosters_version).read(username)
+
+# -----------------------------
+# GLOBAL COHORT FILTERS
+# -----------------------------
+COHORT_FILTER_LABELS = {
+    'major': 'Major', 'residence': 'Residence', 'gender': 'Gender',
+    'enrollment_status': 'Enrollment Status', 'term': 'Latest Term',
+    'pred_at_risk_flag': 'Predicted At Risk', 'probation_flag': 'On Probation',
+    'financial_aid_flag': 'Financial Aid', 'first_generation_flag': 'First Generation',
+    'late_registration': 'Late Registration', 'cum_gpa': 'Cumulative GPA',
+    'attendance_rate': 'Attendance Rate (%)', 'pred_dropout_probability': 'Predicted Dropout Probability'
+}
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_cohort_index(version, _latest_df):
+    return CohortIndex(_latest_df)
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_student_index(version, _latest_df):
+    return pd.Index(_latest_df['student_id'])
+
+@tracked_cache(SNAPSHOT_BUILD_SECONDS)
+def get_snapshot_positions(version, name, _frame, _latest_df):
+    # Snapshot row of each row in _frame, so a snapshot mask maps onto it with one gather
+    return pd.Index(_latest_df['student_id']).get_indexer(_frame['student_id'])
+
+def cohort_filter_bar(cohort_index):
+    filters = {}
+    with st.expander("🎯 Cohort Filters"):
+        for col in CATEGORICAL_FILTERS:
+            filters[col] = st.multiselect(COHORT_FILTER_LABELS[col], options=cohort_index.values(col), key=f"cohort_{col}")
+        for col in FLAG_FILTERS:
+            choice = st.selectbox(COHORT_FILTER_LABELS[col], ["Any", "Yes", "No"], key=f"cohort_{col}")
+            if choice != "Any":
+                filters[col] = [1 if choice == "Yes" else 0]
+        for col in RANGE_FILTERS:
+            low, high = cohort_index.bounds(col)
+            if low >= high:
+                continue
+            selected = st.slider(COHORT_FILTER_LABELS[col], low, high, (low, high), key=f"cohort_{col}")
+            if selected != (low, high):
+                filters[col] = selected
+    return {col: predicate for col, predicate in filters.items() if predicate}
+
+@st.cache_resource
+def get_filter_cache():
+    cache = FilterResultCache(int(FILTER_CACHE_MB * 1024 ** 2))
+
+    @REGISTRY.collector
+    def collect_filter_cache(registry):
+        stats = cache.stats()
+        registry.set(FILTER_CACHE_ENTRIES, stats['entries'])
+        registry.set(FILTER_CACHE_BYTES, stats['bytes'])
+        for result in ('hits', 'misses', 'evictions'):
+            registry.set(FILTER_CACHE_LOOKUPS, stats[result], result=result)
+
+    return cache
+
+def apply_cohort_filters(version, latest_df, cohort_index, cohort_filters):
+    # Returns the cohort snapshot and its mask over the shared snapshot (None when unfiltered)
+    if not cohort_filters:
+        return latest_df, None
+    positions = get_filter_cache().get_or_compute(
+        (version, 'cohort', filter_key(cohort_filters)),
+        lambda: np.flatnonzero(cohort_index.to_mask(cohort_index.select(cohort_filters))))
+    mask = np.zeros(len(latest_df), dtype=bool)
+    mask[positions] = True
+    return track(st.session_state, 'cohort snapshot', latest_df.take(positions)), mask
+
+def cohort_positions(version, name, frame, latest_df, mask):
+    # Row positions of frame belonging to the cohort, without copying frame
+    if mask is None:
+        return None
+    snapshot_positions = get_snapshot_positions(version, name, frame, latest_df)
+    return np.flatnonzero(mask[snapshot_positions])
+
+def lookup_latest(version, latest_df, cohort_mask, student_ids):
+    # One hash join of the IDs against the snapshot index, kept in the order given
+    positions = get_student_index(version, latest_df).get_indexer(student_ids)
+    positions = positions[positions >= 0]
+    if cohort_mask is not None:
+        positions = positions[cohort_mask[positions]]
+    return latest_df.take(positions)
+
+def display_memory_usage():
+    state_bytes = sum(session_state_bytes(st.session_state).values())
+    materialized = rerun_bytes(st.session_state)
+    total_mb = (state_bytes + sum(materialized.values())) / 1024 ** 2
+    with st.expander("🧠 Session Memory"):
+        st.write(f"Session state: {format_bytes(state_bytes)}")
+        st.write(f"This rerun: {format_bytes(sum(materialized.values()))}")
+        for label, n_bytes in materialized.items():
+            st.caption(f"{label}: {format_bytes(n_bytes)}")
+        stats = get_filter_cache().stats()
+        st.write(f"Shared filter cache: {stats['entries']} results, {format_bytes(stats['bytes'])}")
+        st.caption(f"Hit rate {stats['hit_rate']:.0%} ({stats['hits']:,} hits, {stats['misses']:,} misses, "
+                   f"{stats['evictions']:,} evictions)")
+    if total_mb > SESSION_MEMORY_BUDGET_MB:
+        st.warning(f"Session memory {total_mb:.1f} MB exceeds the {SESSION_MEMORY_BUDGET_MB:.0f} MB budget")
+
+# -----------------------------
+# PREWARM
+# -----------------------------
+def prewarm(version):
+    # Fills the shared caches the first dashboard page needs
+    try:
+        get_full_overview_metrics(version)
+        get_version_diff(version)
+        if os.path.exists(ROSTER_FILE):
+            get_roster_store(version, file_version(ROSTER_FILE))
+        if QUERY_BACKEND == 'memory':
+            get_cohort_index(version, get_memory_snapshot(version))
+        elif QUERY_BACKEND in SNAPSHOT_BACKENDS:
+            get_cohort_index(version, get_streamed_extract(version)['latest'])
+        else:
+            backend = get_query_backend(version)
+            for col in CATEGORICAL_FILTERS:
+                backend.values(col)
+            for col in RANGE_FILTERS:
+                backend.bounds(col)
+    except Exception:
+        # Nothing is kept on failure; the page load builds the value again and reports the error
+        logger.exception("Prewarming dataset version %s failed", version)
+
+def start_detached(target, *args):
+    # A plain thread without the session's script context: the tracked caches it fills are
+    # handed to the first session that looks them up, and it never writes to the page
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def start_prewarm(version):
+    # Cached so the thread starts once per dataset version, not once per login rerun
+    return start_detached(prewarm, version)
 
 # -----------------------------
 # EMAIL FUNCTION
 # -----------------------------
-def send_email(receiver_email, subject, body):
+def smtp_send(receiver_email, subject, body):
+    # Raises on failure; the alert sweeps call this off the page, where st.error has nowhere to go
     import smtplib
     from email.mime.text import MIMEText
     from email.mime.multipart import MIMEMultipart
 
+    start = time.perf_counter()
+    REGISTRY.inc(EMAILS_IN_FLIGHT)
     try:
+        sender_email = st.secrets["SENDER_EMAIL"]
         msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
+        msg['From'] = sender_email
         msg['To'] = receiver_email
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain'))
 
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(SENDER_EMAIL, EMAIL_PASSWORD)
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        if SMTP_USE_TLS:
+            server.starttls()
+        server.login(sender_email, st.secrets["EMAIL_PASSWORD"])
         server.send_message(msg)
         server.quit()
+        REGISTRY.observe(EMAIL_SEND_SECONDS, time.perf_counter() - start, result='sent')
+    except Exception:
+        REGISTRY.observe(EMAIL_SEND_SECONDS, time.perf_counter() - start, result='failed')
+        raise
+    finally:
+        REGISTRY.inc(EMAILS_IN_FLIGHT, -1)
+
+def send_email(receiver_email, subject, body):
+    try:
+        smtp_send(receiver_email, subject, body)
         return True
     except Exception as e:
         st.error(f"Failed to send email: {str(e)}")
         return False
 
+# -----------------------------
+# ALERT SWEEPS
+# -----------------------------
+@tracked_cache()
+def get_alert_index():
+    # Tracked, so the sweep thread shares the sessions' index instead of opening its own
+    return AlertIndex(ALERT_INDEX_FILE)
+
+def alert_routes_configured():
+    # Without a roster file or DASHBOARD_ALERT_EMAIL no alert has a recipient, and sweeps would only fill the queue
+    return bool(ALERT_EMAIL) or os.path.exists(ROSTER_FILE)
+
+def route_alerts(alerts):
+    # Each alert goes to the professors whose roster holds the student, and to DASHBOARD_ALERT_EMAIL when set
+    routed = []
+    if os.path.exists(ROSTER_FILE):
+        emails = {username: entry.get('email') for username, entry in load_users().items() if isinstance(entry, dict)}
+        owners = alerts.merge(load_rosters(ROSTER_FILE), on='student_id')
+        routed.append(owners.assign(recipient=owners.pop('username').map(emails)))
+    if ALERT_EMAIL:
+        routed.append(alerts.assign(recipient=ALERT_EMAIL))
+    if not routed:
+        return alerts.assign(recipient=None).iloc[:0]
+    return pd.concat(routed, ignore_index=True).dropna(subset=['recipient'])
+
+def alert_sweep(version, attempt):
+    # Runs off the request path, where an exception reaches no page: it is logged and kept in the
+    # index, so the At-Risk page shows it and alert_sweep_attempt() schedules the retry
+    index = get_alert_index()
+    try:
+        rules = load_rules(ALERT_RULES_FILE)
+        latest_df = load_latest_snapshot(version, ['student_id'] + rule_columns(rules))
+        index.sweep(latest_df, rules, version, route=route_alerts)
+        index.deliver(smtp_send, route_alerts)
+        index.clear_failure()
+    except Exception as e:
+        logger.exception("Alert sweep of dataset version %s failed (attempt %d)", version, attempt + 1)
+        try:
+            index.record_failure(version, attempt, f"{type(e).__name__}: {e}")
+        except Exception:
+            logger.exception("Could not record the failed alert sweep in %s", ALERT_INDEX_FILE)
+
+def alert_sweep_attempt(version):
+    # 0 for a new version; one more once the retry delay has passed since this version's last failure
+    failure = get_alert_index().last_failure()
+    if failure is None or failure['version'] != version:
+        return 0
+    failed_for = (datetime.now(timezone.utc) - datetime.fromisoformat(failure['failed_at'])).total_seconds()
+    return failure['attempt'] + (failed_for >= ALERT_SWEEP_RETRY_SECONDS)
+
+@st.cache_resource
+def start_alert_sweep(version, attempt):
+    # Cached, so each attempt at a version starts once across sessions and reruns
+    return start_detached(alert_sweep, version, attempt)
+
 # -----------------------------
 # RECOMMENDATION GENERATOR
 # -----------------------------
+# Each rule works on one student row or on whole columns at once
+RECOMMENDATION_RULES = [
+    ("Schedule tutoring for core courses", lambda s: s['cum_gpa'] < 2.5),
+    ("Send attendance warning", lambda s: s['attendance_rate'] < 80),
+    ("Assign mentor for assignment completion", lambda s: s['assignments_on_time_pct'] < 75),
+    ("Advise on course selection strategy", lambda s: s['course_drop_count'] > 0),
+    ("Discuss probation status with advisor", lambda s: s['probation_flag'] == 1),
+]
+
 def generate_recommendation(student):
-    recs = []
-    if student['cum_gpa'] < 2.5:
-        recs.append("Schedule tutoring for core courses")
-    if student['attendance_rate'] < 80:
-        recs.append("Send attendance warning")
-    if student['assignments_on_time_pct'] < 75:
-        recs.append("Assign mentor for assignment completion")
-    if student['course_drop_count'] > 0:
-        recs.append("Advise on course selection strategy")
-    if student['probation_flag'] == 1:
-        recs.append("Discuss probation status with advisor")
-    return recs
+    return [rec for rec, applies in RECOMMENDATION_RULES if applies(student)]
+
+def recommendation_column(df):
+    # One boolean column per rule, then joined per row
+    applies = [(rec, np.asarray(rule(df))) for rec, rule in RECOMMENDATION_RULES]
+    return ["; ".join(rec for rec, mask in applies if mask[row]) for row in range(len(df))]
+
+# -----------------------------
+# MODEL RISK FACTORS
+# -----------------------------
+# The pred_factor_* columns are written next to the predictions by risk_attribution.py;
+# extracts without them simply show no factors
+FACTOR_LABELS = {
+    'gpa_term': 'Term GPA', 'lms_logins': 'LMS Logins', 'course_drop_count': 'Course Drops',
+    'assignments_on_time_pct': 'Assignments On Time', 'credits_attempted': 'Credits Attempted',
+    'work_hours_per_week': 'Work Hours', 'outstanding_balance': 'Outstanding Balance'
+}
+
+def factor_label(col):
+    return FACTOR_LABELS.get(col) or COHORT_FILTER_LABELS.get(col) or col.replace('_', ' ').title()
+
+def risk_factors(student):
+    return [factor_label(student[col]) for col in FACTOR_COLUMNS if col in student.index and pd.notna(student[col])]
+
+def risk_factor_column(df):
+    labels = [df[col].map(factor_label, na_action='ignore').fillna('') for col in FACTOR_COLUMNS]
+    # Factors are ranked, so missing ones only leave separators at the end
+    return labels[0].str.cat(labels[1:], sep=', ').str.replace(r'(, )+$', '', regex=True)
+
+def has_risk_factors(df):
+    return FACTOR_COLUMNS[0] in df.columns
 
 # -----------------------------
 # OVERVIEW PAGE
 # -----------------------------
-def display_overview(df):
+def display_overview(metrics):
     st.subheader("📊 Overview Metrics")
-    latest_df = df.sort_values('term').groupby('student_id').last().reset_index()
     col1, col2, col3, col4, col5 = st.columns(5)
-    col1.metric("Total Students", f"{latest_df['student_id'].nunique():,}")
-    col2.metric("At-Risk Students", f"{latest_df['pred_at_risk_flag'].sum():,}", 
-                delta=f"{latest_df['pred_at_risk_flag'].mean()*100:.1f}%", delta_color="inverse")
-    col3.metric("Low Attendance (<80%)", f"{(latest_df['attendance_rate']<80).sum():,}")
-    col4.metric("Low GPA (<2.0)", f"{(latest_df['cum_gpa']<2.0).sum():,}")
-    col5.metric("On Probation", f"{latest_df['probation_flag'].sum():,}")
+    col1.metric("Total Students", f"{metrics['total_students']:,}")
+    col2.metric("At-Risk Students", f"{metrics['at_risk_students']:,}", 
+                delta=f"{metrics['at_risk_share']*100:.1f}%", delta_color="inverse")
+    col3.metric("Low Attendance (<80%)", f"{metrics['low_attendance']:,}")
+    col4.metric("Low GPA (<2.0)", f"{metrics['low_gpa']:,}")
+    col5.metric("On Probation", f"{metrics['on_probation']:,}")
+
+# -----------------------------
+# WHAT'S NEW PAGE
+# -----------------------------
+def display_whats_new(version_diff, cohort_ids=None):
+    st.subheader("🆕 What's New")
+    diff = version_diff['diff']
+    if diff is None:
+        st.info("This is the first extract the dashboard has loaded. Changes will appear here once the next one arrives.")
+        return
+    st.markdown(f"Changes since the previous extract, loaded {version_diff['previous_recorded_at'].replace('T', ' at ')}.")
+    if cohort_ids is not None:
+        # Removed students have no current row to filter on, so they are always listed
+        diff = diff[diff['student_id'].isin(cohort_ids) | (diff['status'] == 'removed')]
+
+    probability_delta = st.slider("Dropout probability moved by at least", MIN_PROBABILITY_DELTA, 1.0,
+                                  WHATS_NEW_PROBABILITY_DELTA, 0.05)
+    lists = change_lists(diff, probability_delta)
+
+    labels = {'newly_at_risk': "Newly At Risk", 'recovered': "Recovered", 'probability_moved': "Probability Moved",
+              'new': "New Students", 'removed': "Removed Students"}
+    for col, (name, label) in zip(st.columns(len(labels)), labels.items()):
+        col.metric(label, f"{len(lists[name]):,}")
+
+    changed_columns = {
+        'student_id': 'Student ID', 'major': 'Major', 'term': 'Latest Term',
+        'pred_dropout_probability_previous': 'Previous Dropout Probability',
+        'pred_dropout_probability': 'Dropout Probability', 'probability_delta': 'Change',
+        'cum_gpa': 'Cumulative GPA', 'attendance_rate': 'Attendance Rate'
+    }
+    for tab, (name, label) in zip(st.tabs(list(labels.values())), labels.items()):
+        with tab:
+            if name == 'removed':
+                table = lists[name][['student_id', 'major_previous', 'term_previous', 'pred_dropout_probability_previous']]
+                table = table.rename(columns={'student_id': 'Student ID', 'major_previous': 'Major',
+                                              'term_previous': 'Last Term', 'pred_dropout_probability_previous': 'Last Dropout Probability'})
+            else:
+                table = lists[name][list(changed_columns)].rename(columns=changed_columns)
+            st.dataframe(table.round(3), use_container_width=True, hide_index=True)
+
+# -----------------------------
+# RETENTION PAGE
+# -----------------------------
+RETENTION_BREAKDOWN_LABELS = {'overall': 'All Students', 'major': 'Major', 'first_generation_flag': 'First Generation'}
+
+def display_retention(retention):
+    import plotly.express as px
+
+    st.subheader("🔁 Cohort Retention")
+    st.markdown("Share of each entering cohort still enrolled in each later term. "
+                "Students who withdrew in a term, or have no record for it, count as not enrolled.")
+    if retention['overall'].empty:
+        st.info("No students match the current cohort filters.")
+        return
+
+    breakdown = st.radio("Break down by", list(RETENTION_BREAKDOWN_LABELS),
+                         format_func=RETENTION_BREAKDOWN_LABELS.get, horizontal=True, key="retention_breakdown")
+    matrix = retention[breakdown]
+    if breakdown != 'overall':
+        groups = matrix[breakdown].unique().tolist()
+        group = st.selectbox(RETENTION_BREAKDOWN_LABELS[breakdown], groups,
+                             format_func=(lambda flag: 'Yes' if flag == 1 else 'No') if breakdown == 'first_generation_flag' else str,
+                             key=f"retention_{breakdown}")
+        matrix = matrix[matrix[breakdown] == group].drop(columns=breakdown)
+
+    shares = matrix.set_index('entering_term').drop(columns='cohort_size')
+    shares.columns = [f"Term +{offset}" for offset in shares.columns]
+    fig = px.imshow(shares * 100, text_auto='.0f', aspect='auto', color_continuous_scale='Blues', zmin=0, zmax=100,
+                    labels={'x': 'Terms After Entry', 'y': 'Entering Term', 'color': 'Enrolled (%)'})
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"The first term in the extract, {shares.index[0]}, also holds students who entered before it. "
+               "Empty cells are terms the extract does not reach yet.")
+
+    table = (shares * 100).round(1)
+    table.insert(0, 'Cohort Size', matrix['cohort_size'].to_numpy())
+    st.dataframe(table.rename_axis('Entering Term'), use_container_width=True)
 
 # -----------------------------
 # AT-RISK STUDENTS PAGE
 # -----------------------------
-def display_at_risk(df):
+def display_at_risk(alert_df):
     st.subheader("🚨 At-Risk Students")
-    latest_df = df.sort_values('term').groupby('student_id').last().reset_index()
-    alert_df = latest_df[latest_df['pred_dropout_probability'] > 0.4]
 
     st.warning(f"Found {len(alert_df)} students with high predicted dropout probability")
+    alert_index = get_alert_index()
+    last_sweep = alert_index.last_sweep()
+    failure = alert_index.last_failure()
+    if failure:
+        st.error(f"Alert sweep failed at {failure['failed_at']} ({failure['attempt'] + 1} attempts): {failure['error']}. "
+                 f"It runs again {ALERT_SWEEP_RETRY_SECONDS:,} seconds after each failure; see the dashboard log for details.")
+    if last_sweep:
+        waiting = alert_index.status_counts().get('queued', 0)
+        st.caption(f"Last alert sweep {last_sweep['swept_at']}: {last_sweep['changed']:,} students changed, "
+                   f"{last_sweep['queued']:,} new alerts; {waiting:,} alerts waiting to be emailed")
+    # One lookup for every listed student; rows are newest first
+    notifications = alert_index.notifications(alert_df['student_id']).groupby('student_id', sort=False)
 
     for idx, student in alert_df.iterrows():
         col1, col2 = st.columns([2,3])
         with col1:
             st.write(f"**ID:** {student['student_id']} | **Major:** {student['major']} | GPA: {student['cum_gpa']:.2f} | Attendance: {student['attendance_rate']:.1f}% | Dropout: {student['pred_dropout_probability']*100:.1f}%")
+            factors = risk_factors(student)
+            if factors:
+                st.write(f"**Top risk factors:** {', '.join(factors)}")
+            if str(student['student_id']) in notifications.groups:
+                last = notifications.get_group(str(student['student_id'])).iloc[0]
+                st.caption(f"Last alert: {last['detail']} ({last['status']} {last['sent_at'] or last['created_at']})")
         with col2:
             recs = generate_recommendation(student)
             if recs:
@@ -179,8 +823,12 @@ def display_at_risk(df):
             receiver_email = st.text_input(f"Enter email for {student['student_id']}", key=f"email_{student['student_id']}")
             if st.button(f"Send Email to {student['student_id']}", key=f"send_{student['student_id']}"):
                 if receiver_email:
-                    body = f"Student ID: {student['student_id']}\nMajor: {student['major']}\nGPA: {student['cum_gpa']:.2f}\nAttendance: {student['attendance_rate']:.1f}%\nPredicted Dropout Risk: {student['pred_dropout_probability']*100:.1f}%\n\nRecommendations:\n" + "\n".join(recs)
+                    body = f"Student ID: {student['student_id']}\nMajor: {student['major']}\nGPA: {student['cum_gpa']:.2f}\nAttendance: {student['attendance_rate']:.1f}%\nPredicted Dropout Risk: {student['pred_dropout_probability']*100:.1f}%\n"
+                    if factors:
+                        body += f"Top Risk Factors: {', '.join(factors)}\n"
+                    body += "\nRecommendations:\n" + "\n".join(recs)
                     if send_email(receiver_email, "Student Recommendations", body):
+                        alert_index.record(student['student_id'], receiver_email, "Recommendations emailed by hand")
                         st.success(f"Email sent to {receiver_email}")
                 else:
                     st.warning("Please enter an email address")
@@ -188,26 +836,49 @@ def display_at_risk(df):
 # -----------------------------
 # AT-RISK STUDENTS DATA PAGE
 # -----------------------------
-def display_at_risk_students_data(df):
+@tracked_cache(max_entries=8)
+def get_at_risk_csv(key, _at_risk_df, _rows):
+    # key is the page's cache_key plus its filters: built once per filter result, not on every fragment rerun
+    return _at_risk_df.iloc[_rows].to_csv(index=False)
+
+# A fragment: moving a filter reruns only this function, not the sidebar, the data loads
+# and the cohort filters above it
+@st.fragment
+def display_at_risk_students_data(at_risk_df, positions=None, cache_key=None):
+    # cache_key identifies at_risk_df and positions (dataset version and cohort); with it,
+    # the filtered rows are shared with every session asking for the same filters
     st.subheader("📋 At-Risk Students Data")
-    at_risk_df = df[df['pred_at_risk_flag'] == 1].copy()
-    at_risk_df = at_risk_df.sort_values('term').groupby('student_id').last().reset_index()
+    untrack(st.session_state, 'at-risk table page', 'at-risk CSV export')
+    # Filters narrow an array of row positions; only the page on screen is materialised
+    rows = np.arange(len(at_risk_df)) if positions is None else positions
+    majors = at_risk_df['major'].to_numpy()
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        major_filter = st.multiselect("Filter by Major", options=sorted(at_risk_df['major'].unique()), default=None)
+        major_filter = st.multiselect("Filter by Major", options=sorted(pd.unique(majors[rows])), default=None)
     with col2:
         gpa_filter = st.slider("Maximum GPA", 0.0, 4.0, 4.0, 0.1)
     with col3:
         attendance_filter = st.slider("Maximum Attendance %", 0, 100, 100, 5)
 
-    filtered_df = at_risk_df.copy()
-    if major_filter:
-        filtered_df = filtered_df[filtered_df['major'].isin(major_filter)]
-    filtered_df = filtered_df[filtered_df['cum_gpa'] <= gpa_filter]
-    filtered_df = filtered_df[filtered_df['attendance_rate'] <= attendance_filter]
+    def filtered_rows():
+        keep = at_risk_df['cum_gpa'].to_numpy()[rows] <= gpa_filter
+        keep &= at_risk_df['attendance_rate'].to_numpy()[rows] <= attendance_filter
+        if major_filter:
+            keep &= np.isin(majors[rows], major_filter)
+        return rows[keep]
 
-    st.write(f"**Showing {len(filtered_df)} at-risk students**")
+    filters = (tuple(sorted(major_filter)), float(gpa_filter), float(attendance_filter))
+    if cache_key is None:
+        rows = filtered_rows()
+    else:
+        rows = get_filter_cache().get_or_compute(cache_key + filters, filtered_rows)
+
+    st.write(f"**Showing {len(rows)} at-risk students**")
+
+    n_pages = max(1, -(-len(rows) // TABLE_PAGE_SIZE))
+    page_number = st.number_input(f"Page (of {n_pages})", 1, n_pages, 1) if n_pages > 1 else 1
+    page_rows = rows[(page_number - 1) * TABLE_PAGE_SIZE:page_number * TABLE_PAGE_SIZE]
 
     display_columns = [
         'student_id', 'major', 'term', 'cum_gpa', 'attendance_rate', 
@@ -215,7 +886,7 @@ def display_at_risk_students_data(df):
         'pred_dropout_probability'
     ]
 
-    display_df = filtered_df[display_columns].copy()
+    display_df = track(st.session_state, 'at-risk table page', at_risk_df.iloc[page_rows][display_columns])
     display_df['pred_dropout_probability'] = display_df['pred_dropout_probability'].apply(lambda x: f"{x*100:.1f}%")
     display_df['attendance_rate'] = display_df['attendance_rate'].apply(lambda x: f"{x:.1f}%")
     display_df['assignments_on_time_pct'] = display_df['assignments_on_time_pct'].apply(lambda x: f"{x:.1f}%")
@@ -224,10 +895,17 @@ def display_at_risk_students_data(df):
         'Student ID', 'Major', 'Term', 'Cumulative GPA', 'Attendance Rate',
         'Assignments On Time', 'Course Drops', 'On Probation', 'Dropout Risk'
     ]
+    if has_risk_factors(at_risk_df):
+        display_df['Top Risk Factors'] = risk_factor_column(at_risk_df.iloc[page_rows]).to_numpy()
 
     st.dataframe(display_df, use_container_width=True, height=400)
 
-    csv = filtered_df.to_csv(index=False)
+    # Paging and other reruns with the same filters reuse the export
+    if cache_key is None:
+        csv = at_risk_df.iloc[rows].to_csv(index=False)
+    else:
+        csv = get_at_risk_csv(cache_key + filters, at_risk_df, rows)
+    csv = track(st.session_state, 'at-risk CSV export', csv)
     st.download_button(
         label="📥 Download At-Risk Students Data",
         data=csv,
@@ -238,10 +916,18 @@ def display_at_risk_students_data(df):
 # -----------------------------
 # ANALYTICS PAGE
 # -----------------------------
-def display_analytics(df):
+# Cohort filters that select whole sketch cells; the bar's term filter is each student's latest term, not a record's
+SKETCH_CELL_FILTERS = ['major', 'residence']
+PERCENTILE_LABELS = {
+    'cum_gpa': 'Cumulative GPA', 'gpa_term': 'Term GPA', 'attendance_rate': 'Attendance Rate (%)',
+    'assignments_on_time_pct': 'Assignments On Time (%)', 'lms_logins': 'LMS Logins',
+    'pred_dropout_probability': 'Predicted Dropout Probability'
+}
+
+def display_analytics(latest_df, version, cohort_filters, roster=None):
+    import plotly.express as px
+
     st.subheader("📈 Analytics")
-    # Get latest data for each student
-    latest_df = df.sort_values('term').groupby('student_id').last().reset_index()
     
     # Create two columns for charts
     col1, col2 = st.columns(2)
@@ -668,33 +1354,118 @@ def display_analytics(df):
     # 18. Correlation Heatmap
     st.markdown("#### Feature Correlation Analysis")
     
-    # Select numeric columns for correlation
-    numeric_cols = ['age', 'credits_attempted', 'course_drop_count', 'gpa_term', 'cum_gpa',
-                   'lms_logins', 'attendance_rate', 'assignments_on_time_pct', 'discussion_posts',
-                   'library_visits', 'work_hours_per_week', 'advisor_meetings', 'tutoring_sessions',
-                   'pred_dropout_probability', 'pred_at_risk_flag']
+    # Assembled from cached per-cohort sums, so changing the cohort is instant
+    cohort_stats = get_cohort_stats(roster_scope(version, roster), filter_key(cohort_filters), latest_df)
+    cohort_keys = cohort_stats['keys']
+    cohort_cols = st.columns(len(COHORT_GROUP_COLUMNS))
+    selections = {}
+    for col, group_col in zip(cohort_cols, COHORT_GROUP_COLUMNS):
+        with col:
+            selections[group_col] = st.multiselect(f"Cohort {group_col.title()}",
+                                                   options=sorted(cohort_keys[group_col].unique()),
+                                                   key=f"corr_{group_col}")
     
-    corr_matrix = latest_df[numeric_cols].corr()
+    corr_matrix, cohort_size = cohort_correlation(cohort_stats, selections)
+    st.caption(f"Correlations over {cohort_size:,} students")
     
     fig33 = px.imshow(corr_matrix,
                      labels=dict(color="Correlation"),
-                     x=numeric_cols,
-                     y=numeric_cols,
+                     x=CORRELATION_COLUMNS,
+                     y=CORRELATION_COLUMNS,
                      color_continuous_scale='RdBu_r',
+                     zmin=-1, zmax=1,
                      aspect="auto",
                      title='Correlation Heatmap of Key Features')
     fig33.update_xaxes(tickangle=45)
     st.plotly_chart(fig33, use_container_width=True)
 
+    # 19. Cohort Percentiles
+    st.markdown("#### Cohort Percentiles")
+    # The filter bar's majors and residences are sketch cells. Its other filters pick students by their
+    # latest term, which no cell can split, so such cohorts are summarised exactly from their records.
+    bar_cells = {col: cohort_filters[col] for col in SKETCH_CELL_FILTERS if col in cohort_filters}
+    student_filters = [COHORT_FILTER_LABELS[col] for col in cohort_filters if col not in bar_cells]
+    sketches = get_cohort_sketches(version, roster)
+    sketch_keys = sketches.keys()
+    percentile_cols = st.columns(len(COHORT_GROUP_COLUMNS))
+    percentile_selections = {}
+    for col, group_col in zip(percentile_cols, COHORT_GROUP_COLUMNS):
+        options = sorted(sketch_keys[group_col].unique())
+        if group_col in bar_cells:
+            options = [value for value in options if value in set(map(str, bar_cells[group_col]))]
+        with col:
+            chosen = st.multiselect(f"Cohort {group_col.title()}", options=options, key=f"percentile_{group_col}")
+        percentile_selections[group_col] = chosen or bar_cells.get(group_col, [])
+    exact = st.toggle("Exact (scans every record)", key="percentile_exact")
+
+    if student_filters:
+        st.caption(f"Over every term record of the filtered cohort's students ({', '.join(student_filters)}), "
+                   "computed exactly: sketches are kept per major, term and residence only.")
+        cohort_records = get_sketch_records(version, roster)
+        cohort_records = cohort_records[cohort_records['student_id'].isin(latest_df['student_id'])]
+        table, students, records = exact_summary(cohort_records, percentile_selections)
+        exact = True
+    elif exact:
+        st.caption("Over every term record of the chosen majors, terms and residences, computed exactly.")
+        table, students, records = exact_summary(get_sketch_records(version, roster), percentile_selections)
+    else:
+        st.caption("Over every term record of the chosen majors, terms and residences, within the cohort filters' "
+                   "majors and residences. Merged from per-cohort sketches, so percentiles are within about 1.7% "
+                   "of rank and distinct students within about 3% of the exact figures.")
+        table, students, records = sketches.summary(percentile_selections)
+    if not records:
+        st.info("No records in the chosen cohorts.")
+        return
+    st.caption(f"{'' if exact else '≈ '}{students:,} distinct students over {records:,} term records")
+    table = table.rename(index=PERCENTILE_LABELS)
+    table.columns = [f"P{round(q * 100)}" for q in table.columns]
+    st.dataframe(table.round(2), use_container_width=True)
+
+
+# -----------------------------
+# RAPID DECLINE PAGE
+# -----------------------------
+def display_rapid_decline(trajectories, latest_df):
+    st.subheader("📉 Rapid Decline")
+    st.markdown("Students whose latest term dropped sharply from the previous one across several indicators.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        min_signals = st.slider("Minimum declining indicators", 1, len(TRAJECTORY_COLUMNS), 2)
+    with col2:
+        exclude_flagged = st.checkbox("Only students not yet predicted at risk", value=True)
+
+    declining_df = rapid_decline(trajectories, latest_df, min_signals=min_signals, exclude_flagged=exclude_flagged)
+    st.write(f"**Showing {len(declining_df)} declining students**")
+
+    display_columns = ['student_id', 'major', 'term', 'decline_signals'] + \
+        [f'{col}_delta' for col in TRAJECTORY_COLUMNS] + ['pred_dropout_probability']
+    display_df = declining_df[display_columns].copy()
+    display_df['pred_dropout_probability'] = display_df['pred_dropout_probability'].apply(lambda x: f"{x*100:.1f}%")
+    display_df.columns = [
+        'Student ID', 'Major', 'Term', 'Declining Indicators', 'Term GPA Change', 'Cumulative GPA Change',
+        'Attendance Change', 'LMS Logins Change', 'Assignments On Time Change', 'Dropout Risk'
+    ]
+    st.dataframe(display_df.round(2), use_container_width=True, height=400)
+
+    csv = declining_df.to_csv(index=False)
+    st.download_button(
+        label="📥 Download Rapid Decline List",
+        data=csv,
+        file_name=f"rapid_decline_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv"
+    )
 
 # -----------------------------
 # STUDENT SEARCH PAGE
 # -----------------------------
-def display_student_search(df):
+def display_student_search(find_student, lookup_students):
+    import plotly.graph_objects as go
+
     st.subheader("🔍 Student Search")
     search_id = st.text_input("Enter Student ID")
     if search_id:
-        student_data = df[df['student_id']==search_id]
+        student_data = find_student(search_id)
         if not student_data.empty:
             latest_record = student_data.sort_values('term').iloc[-1]
             st.metric("Major", latest_record['major'])
@@ -702,6 +1473,9 @@ def display_student_search(df):
             st.metric("Attendance", f"{latest_record['attendance_rate']:.1f}%")
             risk_status = "🚨 AT RISK" if latest_record['pred_at_risk_flag']==1 else "✅ Not At Risk"
             st.metric("Risk Status", risk_status)
+            factors = risk_factors(latest_record)
+            if factors:
+                st.write(f"**Top risk factors:** {', '.join(factors)}")
             
             st.markdown("#### Term-by-Term GPA Trend")
             fig = go.Figure()
@@ -710,39 +1484,399 @@ def display_student_search(df):
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No record found")
+
+    st.markdown("---")
+    display_roster_lookup(lookup_students)
+
+def display_roster_lookup(lookup_students):
+    st.subheader("📋 Roster Lookup")
+    st.markdown("Paste student IDs or upload a course roster to check a whole class at once.")
+    col1, col2 = st.columns(2)
+    with col1:
+        student_ids = parse_student_ids(st.text_area("Student IDs (comma or newline separated)", key="roster_ids"))
+    with col2:
+        roster_file = st.file_uploader("Course roster (CSV)", type="csv", key="roster_file")
+    if roster_file is not None:
+        roster_df = pd.read_csv(roster_file, dtype=str)
+        id_columns = [i for i, col in enumerate(roster_df.columns) if 'id' in col.lower()]
+        id_column = st.selectbox("Student ID column", roster_df.columns, index=id_columns[0] if id_columns else 0)
+        student_ids = list(dict.fromkeys(student_ids + roster_df[id_column].dropna().str.strip().tolist()))
+    if not student_ids:
+        return
+
+    roster = track(st.session_state, 'roster lookup', lookup_students(student_ids))
+    found = set(roster['student_id'])
+    missing = [student_id for student_id in student_ids if student_id not in found]
+    st.write(f"**Found {len(roster)} of {len(student_ids)} students**")
+    if missing:
+        st.warning(f"No record found for {len(missing)} IDs: {', '.join(missing)}")
+    if roster.empty:
+        return
+
+    roster_df = roster[['student_id', 'major', 'term', 'cum_gpa', 'attendance_rate', 'pred_dropout_probability']].copy()
+    roster_df['risk_status'] = np.where(roster['pred_at_risk_flag'] == 1, "🚨 AT RISK", "✅ Not At Risk")
+    if has_risk_factors(roster):
+        roster_df['risk_factors'] = risk_factor_column(roster)
+    roster_df['recommendations'] = recommendation_column(roster)
+    st.dataframe(roster_df.rename(columns={
+        'student_id': 'Student ID', 'major': 'Major', 'term': 'Latest Term', 'cum_gpa': 'Cumulative GPA',
+        'attendance_rate': 'Attendance Rate', 'pred_dropout_probability': 'Dropout Probability',
+        'risk_status': 'Risk Status', 'risk_factors': 'Top Risk Factors', 'recommendations': 'Recommendations'
+    }), use_container_width=True)
+
+    st.download_button(
+        label="📥 Download Roster Lookup",
+        data=roster_df.to_csv(index=False),
+        file_name=f"roster_lookup_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv"
+    )
+# -----------------------------
+# CASELOAD COMPARISON PAGE
+# -----------------------------
+CASELOAD_TRAJECTORIES = {'gpa_term': 'Term GPA', 'cum_gpa': 'Cumulative GPA', 'attendance_rate': 'Attendance Rate (%)'}
+
+def parse_student_ids(text):
+    # Comma, space or newline separated, duplicates dropped, first occurrence kept
+    return list(dict.fromkeys(token for token in text.replace(',', ' ').split()))
+
+def display_caseload_comparison(find_students):
+    import plotly.express as px
+
+    st.subheader("👥 Caseload Comparison")
+    st.markdown("Overlay the term-by-term trajectories of the students you advise.")
+    student_ids = parse_student_ids(st.text_area("Student IDs (comma or newline separated)", key="caseload_ids"))
+    if not student_ids:
+        st.info("Enter the student IDs of your caseload to compare them")
+        return
+    if len(student_ids) > CASELOAD_MAX_STUDENTS:
+        st.warning(f"Comparing the first {CASELOAD_MAX_STUDENTS} of {len(student_ids)} students")
+        student_ids = student_ids[:CASELOAD_MAX_STUDENTS]
+
+    history_df = track(st.session_state, 'caseload history', find_students(student_ids))
+    found = set(history_df['student_id'])
+    missing = [student_id for student_id in student_ids if student_id not in found]
+    if missing:
+        st.warning(f"No record found for: {', '.join(missing)}")
+    if history_df.empty:
+        return
+
+    terms = sorted(history_df['term'].unique())
+    for col, label in CASELOAD_TRAJECTORIES.items():
+        st.markdown(f"#### {label}")
+        fig = px.line(history_df, x='term', y=col, color='student_id', markers=True,
+                      category_orders={'term': terms},
+                      labels={'term': 'Term', col: label, 'student_id': 'Student ID'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Rows come grouped by student in term order, so the last row per student is the latest term
+    latest_df = history_df[~history_df['student_id'].duplicated(keep='last').to_numpy()]
+    summary_df = latest_df[['student_id', 'major', 'term', 'cum_gpa', 'attendance_rate', 'pred_dropout_probability']].copy()
+    summary_df['pred_dropout_probability'] = summary_df['pred_dropout_probability'].apply(lambda x: f"{x*100:.1f}%")
+    summary_df.columns = ['Student ID', 'Major', 'Latest Term', 'Cumulative GPA', 'Attendance Rate', 'Dropout Risk']
+    st.dataframe(summary_df, use_container_width=True)
+
+# -----------------------------
+# ADVISOR PACKETS PAGE
+# -----------------------------
+def display_advisor_packets(cohort_df, find_students):
+    st.subheader("🗂️ Advisor Packets")
+    st.markdown("One printable page per student, with latest metrics, GPA trend, risk factors and recommendations, "
+                "for every student of the current cohort above a predicted dropout probability.")
+    min_probability = st.slider("Minimum predicted dropout probability", 0.0, 1.0, ALERT_DROPOUT_THRESHOLD, 0.05,
+                                key="packet_min_probability")
+    selected = cohort_df[cohort_df['pred_dropout_probability'] > min_probability]
+    if len(selected) > PACKET_MAX_STUDENTS:
+        st.warning(f"Building packets for the {PACKET_MAX_STUDENTS:,} highest-risk of {len(selected):,} students")
+        selected = selected.nlargest(PACKET_MAX_STUDENTS, 'pred_dropout_probability')
+    st.write(f"**{len(selected):,} students selected**")
+
+    if st.button("Build Packets", disabled=selected.empty):
+        students = selected.copy()
+        students['recommendations'] = recommendation_column(students)
+        students['risk_factors'] = risk_factor_column(students).to_numpy() if has_risk_factors(students) else ''
+        history_df = find_students(students['student_id'].tolist())
+        progress = st.progress(0.0, text="Rendering packets")
+        data = build_packets(students, history_df, title=f"Advisor Packets {datetime.now():%Y-%m-%d}",
+                             progress=lambda done, total: progress.progress(done / total, text=f"Rendered {done} of {total} batches"))
+        progress.empty()
+        st.session_state['advisor_packets'] = {'data': data, 'students': len(students),
+                                               'built_at': datetime.now().strftime('%Y%m%d_%H%M')}
+
+    packets = st.session_state.get('advisor_packets')
+    if packets:
+        st.success(f"{packets['students']:,} packets ready ({format_bytes(len(packets['data']))})")
+        st.download_button(
+            label="📥 Download Advisor Packets",
+            data=packets['data'],
+            file_name=f"advisor_packets_{packets['built_at']}.zip",
+            mime="application/zip"
+        )
+
+# -----------------------------
+# MODEL RETRAINING PAGE
+# -----------------------------
+@st.cache_resource
+def get_retraining_worker():
+    # One worker per process, so concurrent sessions queue behind a single job
+    worker = RetrainingWorker()
+    REGISTRY.collector(lambda registry: registry.set(
+        RETRAINING_QUEUE_DEPTH, sum(job['state'] in ('queued', 'running') for job in worker.jobs)))
+    return worker
+
+def display_model_retraining(worker):
+    st.subheader("🧠 Model Retraining")
+    info = model_info(MODEL_FILE)
+    if info:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Current Model", info['model'])
+        col2.metric("Cross-Validated ROC AUC", f"{info['cv_auc']:.3f}")
+        col3.metric("Training Records", f"{info['training_records']:,}")
+        st.caption(f"Trained {info['trained_at'].replace('T', ' at ')} on {info['training_file']}")
+    else:
+        st.info("No retrained model yet. The dashboard shows the predictions that came with the extract.")
+
+    if not os.path.exists(TRAINING_FILE):
+        st.warning(f"Labeled training file {TRAINING_FILE} not found. Set DASHBOARD_TRAINING_FILE to retrain.")
+        return
+
+    candidates = st.multiselect("Candidate models", list(CANDIDATE_MODELS), default=list(CANDIDATE_MODELS))
+    folds = st.number_input("Cross-validation folds", 2, 10, DEFAULT_FOLDS)
+    # The partitioned store and term directories are built from the extract, so rescoring the CSV alone would not reach them
+    can_rescore = QUERY_BACKEND != 'partitioned' and not DATA_DIR
+    rescore = st.checkbox("Rescore the dashboard extract with the winning model", value=False, disabled=not can_rescore,
+                          help="Writes a rescored copy next to the extract, which the dashboard then loads"
+                          if can_rescore else "Rescore the term data from the command line")
+    if st.button("Start Retraining", disabled=worker.busy() or not candidates):
+        worker.submit(rescore_path=DATA_FILE if rescore else None, training_path=TRAINING_FILE,
+                      candidates=candidates, folds=int(folds), model_path=MODEL_FILE, cache_dir=MODEL_CACHE_DIR)
+        st.rerun()
+
+    display_retraining_status(worker)
+
+@st.fragment(run_every=2)
+def display_retraining_status(worker):
+    # Polls the worker without rerunning the rest of the page
+    job = worker.latest()
+    if job is None:
+        return
+    if job['state'] in ('queued', 'running'):
+        st.info(f"Job {job['id']} {job['state']}: {job['message']}")
+    elif job['state'] == 'failed':
+        st.error(f"Job {job['id']} failed: {job['error']}")
+    else:
+        st.success(f"Job {job['id']} finished at {job['finished_at'].replace('T', ' ')}: "
+                   f"{job['result']['model']} written to {MODEL_FILE}")
+        if job['rescored_path']:
+            st.caption(f"Rescored extract: {job['rescored_path']}")
+        scores = pd.DataFrame(job['result']['scores'])
+        st.dataframe(scores.rename(columns={'model': 'Model', 'mean_auc': 'Mean ROC AUC', 'std_auc': 'Std',
+                                            'cached': 'From Cache'}).round(4),
+                     use_container_width=True, hide_index=True)
+
+# -----------------------------
+# PAGE DISPATCH
+# -----------------------------
+def display_memory_pages(page, version, roster=None):
+    # A roster session holds only its roster partition, and keys every snapshot and filter result by it
+    scope = roster_scope(version, roster)
+    if roster is None:
+        df = load_data(version)
+        latest_df = get_memory_snapshot(version)
+    else:
+        df = get_roster_records(version, roster)
+        if df.empty:
+            display_header()
+            st.info("No students on your roster appear in the current extract.")
+            return
+        latest_df = get_latest_snapshot(scope, df)
+    cohort_index = get_cohort_index(scope, latest_df)
+    with st.sidebar:
+        cohort_filters = cohort_filter_bar(cohort_index)
+    cohort_df, cohort_mask = apply_cohort_filters(scope, latest_df, cohort_index, cohort_filters)
+    if roster is not None:
+        st.sidebar.caption(f"Your roster: {len(latest_df):,} students")
+    if cohort_filters:
+        st.sidebar.caption(f"Cohort: {len(cohort_df):,} students")
+    # Pages that read institution-wide results narrow them to the roster's students
+    scoped = bool(cohort_filters) or roster is not None
+
+    history_store = get_history_store(scope, df)
+
+    def find_students(student_ids):
+        student_data = history_store.history(student_ids)
+        return student_data[student_data['student_id'].isin(cohort_df['student_id'])] if cohort_filters else student_data
+
+    def find_student(student_id):
+        student_data = history_store.student(student_id)
+        return student_data[student_data['student_id'].isin(cohort_df['student_id'])] if cohort_filters else student_data
+
+    display_header()
+    if page=="Overview":
+        display_overview(overview_metrics(cohort_df) if scoped else get_full_overview_metrics(version))
+    elif page=="What's New":
+        display_whats_new(get_version_diff(version), cohort_df['student_id'] if scoped else None)
+    elif page=="Retention":
+        display_retention(cohort_retention(version, cohort_df['student_id'] if cohort_filters else None, roster))
+    elif page=="At-Risk Students":
+        display_at_risk(cohort_df[cohort_df['pred_dropout_probability'] > ALERT_DROPOUT_THRESHOLD])
+    elif page=="At-Risk Students Data":
+        at_risk_df = get_at_risk_snapshot(scope, df)
+        display_at_risk_students_data(at_risk_df, cohort_positions(scope, 'at_risk', at_risk_df, latest_df, cohort_mask),
+                                      (scope, 'at_risk', filter_key(cohort_filters)))
+    elif page=="Analytics":
+        display_analytics(cohort_df, version, cohort_filters, roster)
+    elif page=="Rapid Decline":
+        display_rapid_decline(get_trajectories(scope, df), cohort_df)
+    elif page=="Student Search":
+        display_student_search(find_student, lambda student_ids: lookup_latest(scope, latest_df, cohort_mask, student_ids))
+    elif page=="Caseload Comparison":
+        display_caseload_comparison(find_students)
+    elif page=="Advisor Packets":
+        display_advisor_packets(cohort_df, find_students)
+
+def display_streamed_pages(page, version):
+    # Only per-student snapshots are held, from the chunked pass or the partitioned store;
+    # full histories are loaded on demand
+    extract = get_streamed_extract(version)
+    latest_df = extract['latest']
+    cohort_index = get_cohort_index(version, latest_df)
+    with st.sidebar:
+        cohort_filters = cohort_filter_bar(cohort_index)
+    cohort_df, cohort_mask = apply_cohort_filters(version, latest_df, cohort_index, cohort_filters)
+    if cohort_filters:
+        st.sidebar.caption(f"Cohort: {len(cohort_df):,} students")
+
+    def find_students(student_ids):
+        student_data = load_students_history(version, student_ids)
+        return student_data[student_data['student_id'].isin(cohort_df['student_id'])] if cohort_filters else student_data
+
+    def find_student(student_id):
+        student_data = load_students_history(version, [student_id])
+        return student_data[student_data['student_id'].isin(cohort_df['student_id'])] if cohort_filters else student_data
+
+    display_header()
+    if page=="Overview":
+        display_overview(overview_metrics(cohort_df) if cohort_filters else get_full_overview_metrics(version))
+        if QUERY_BACKEND == 'partitioned':
+            term_counts = get_partition_store(version).term_counts()
+            st.caption(f"Latest-term snapshot of {term_counts.sum():,} records across {len(term_counts)} term partitions")
+        else:
+            aggregates = extract['aggregates']
+            st.caption(f"Streamed {aggregates.records:,} records across {len(aggregates.term_counts)} terms")
+    elif page=="What's New":
+        display_whats_new(get_version_diff(version), cohort_df['student_id'] if cohort_filters else None)
+    elif page=="Retention":
+        display_retention(cohort_retention(version, cohort_df['student_id'] if cohort_filters else None))
+    elif page=="At-Risk Students":
+        display_at_risk(cohort_df[cohort_df['pred_dropout_probability'] > ALERT_DROPOUT_THRESHOLD])
+    elif page=="At-Risk Students Data":
+        at_risk_df = extract['at_risk_latest']
+        display_at_risk_students_data(at_risk_df, cohort_positions(version, 'at_risk', at_risk_df, latest_df, cohort_mask),
+                                      (version, 'at_risk', filter_key(cohort_filters)))
+    elif page=="Analytics":
+        display_analytics(cohort_df, version, cohort_filters)
+    elif page=="Rapid Decline":
+        display_rapid_decline(get_trajectories(version, extract['recent']), cohort_df)
+    elif page=="Student Search":
+        display_student_search(find_student, lambda student_ids: lookup_latest(version, latest_df, cohort_mask, student_ids))
+    elif page=="Caseload Comparison":
+        display_caseload_comparison(find_students)
+    elif page=="Advisor Packets":
+        display_advisor_packets(cohort_df, find_students)
+
+def display_backend_pages(page, version):
+    # Same pages, but filters, latest-term selection and aggregates run in the database
+    backend = get_query_backend(version)
+    with st.sidebar:
+        cohort_filters = cohort_filter_bar(backend)
+
+    display_header()
+    if page=="Overview":
+        display_overview(backend.overview_metrics(cohort_filters) if cohort_filters else get_full_overview_metrics(version))
+    elif page=="What's New":
+        cohort_ids = backend.latest(cohort_filters, columns=['student_id'])['student_id'] if cohort_filters else None
+        display_whats_new(get_version_diff(version), cohort_ids)
+    elif page=="Retention":
+        cohort_ids = backend.latest(cohort_filters, columns=['student_id'])['student_id'] if cohort_filters else None
+        display_retention(cohort_retention(version, cohort_ids))
+    elif page=="At-Risk Students":
+        display_at_risk(backend.latest(cohort_filters, min_dropout_probability=ALERT_DROPOUT_THRESHOLD))
+    elif page=="At-Risk Students Data":
+        display_at_risk_students_data(backend.at_risk_latest(cohort_filters), cache_key=(version, 'at_risk', filter_key(cohort_filters)))
+    elif page=="Analytics":
+        display_analytics(backend.latest(cohort_filters), version, cohort_filters)
+    elif page=="Rapid Decline":
+        latest_df = backend.latest(cohort_filters, columns=['student_id', 'major', 'pred_dropout_probability', 'pred_at_risk_flag'])
+        display_rapid_decline(get_backend_trajectories(version), latest_df)
+    elif page=="Student Search":
+        display_student_search(lambda student_id: backend.student_history(student_id, cohort_filters),
+                               lambda student_ids: backend.latest(dict(cohort_filters, student_id=student_ids)))
+    elif page=="Caseload Comparison":
+        display_caseload_comparison(lambda student_ids: backend.students_history(student_ids, cohort_filters))
+    elif page=="Advisor Packets":
+        display_advisor_packets(backend.latest(cohort_filters),
+                                lambda student_ids: backend.students_history(student_ids, cohort_filters))
+
+def display_header():
+    st.title("📊 Student Risk Monitoring Dashboard")
+    st.markdown(f"*Last Updated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}*")
+    st.markdown("---")
+
 # -----------------------------
 # MAIN APP
 # -----------------------------
 def main():
+    start_metrics_export()
+    if ALERT_SWEEPS and alert_routes_configured() and os.path.exists(dataset_path()):
+        version = get_dataset_version()
+        start_alert_sweep(version, alert_sweep_attempt(version))
     if 'logged_in' not in st.session_state:
         st.session_state['logged_in'] = False
 
     if not st.session_state['logged_in']:
+        if PREWARM_ON_LOGIN and os.path.exists(dataset_path()):
+            start_prewarm(get_dataset_version())
         login_page()
     else:
         with st.sidebar:
             st.title("🎓 Dashboard Navigation")
             st.write(f"**Logged in as:** {st.session_state['username']}")
-            page = st.radio("Select Page", ["Overview","At-Risk Students","At-Risk Students Data","Analytics","Student Search"])
+            pages = ["Overview","What's New","Retention","At-Risk Students","At-Risk Students Data","Analytics","Rapid Decline","Student Search","Caseload Comparison","Advisor Packets"]
+            # Retraining replaces every professor's predictions, so only admins get the page
+            if user_role(st.session_state['username']) == 'admin':
+                pages.append("Model Retraining")
+            page = st.radio("Select Page", pages)
             if st.button("Logout"):
                 st.session_state['logged_in'] = False
-                st.experimental_rerun()
-
-        df = load_data()
-        st.title("📊 Student Risk Monitoring Dashboard")
-        st.markdown(f"*Last Updated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}*")
-        st.markdown("---")
-
-        if page=="Overview":
-            display_overview(df)
-        elif page=="At-Risk Students":
-            display_at_risk(df)
-        elif page=="At-Risk Students Data":
-            display_at_risk_students_data(df)
-        elif page=="Analytics":
-            display_analytics(df)
-        elif page=="Student Search":
-            display_student_search(df)
+                st.rerun()
+
+        start_rerun(st.session_state)
+        version = get_dataset_version()
+        roster = session_roster(st.session_state['username'])
+        with REGISTRY.time(PAGE_RENDER_SECONDS, page=page):
+            if page == "Model Retraining":
+                # Needs no dataset cache, so it stays usable while a new extract is being scored
+                display_header()
+                display_model_retraining(get_retraining_worker())
+            elif roster is not None:
+                # A roster partition is small whatever the backend, so it is served from memory
+                display_memory_pages(page, version, roster)
+            elif QUERY_BACKEND == 'memory':
+                display_memory_pages(page, version)
+            elif QUERY_BACKEND in SNAPSHOT_BACKENDS:
+                display_streamed_pages(page, version)
+            else:
+                display_backend_pages(page, version)
+
+        with st.sidebar:
+            display_memory_usage()
+
+    if METRICS_FILE:
+        try:
+            REGISTRY.write_textfile(METRICS_FILE)
+        except Exception:
+            # A metrics file that cannot be written must not take the page down
+            logger.exception("Could not write metrics to %s", METRICS_FILE)
 
 
 if __name__=="__main__":
@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+
+import pandas as pd
+
+from cohort_index import RANGE_FILTERS
+from term_ingest import read_extract_chunks, source_columns
+from trajectory import TRAJECTORY_COLUMNS
+
+# -----------------------------
+# EMBEDDED QUERY BACKEND
+# -----------------------------
+# Optional alternative to holding the whole extract in every process. The CSV
+# is loaded once into a local database file (SQLite from the standard library,
+# or DuckDB when installed); cohort filters, latest-term selection and the
+# Overview aggregates run as SQL and only the small result frames come back.
+
+BACKEND_ENGINES = ('sqlite', 'duckdb')
+
+
+def latest_rows_sql(where=''):
+    """Row IDs of each student's most recent record in records{where}
+
+    Exactly one per student: of several rows in the same latest term, the
+    later one in the file, as keep_recent_terms takes it in pandas.
+    """
+    return f"""
+        SELECT row_id FROM (
+            SELECT rowid AS row_id,
+                   ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY term DESC, rowid DESC) AS term_rank
+            FROM records{where}) ranked
+        WHERE term_rank = 1"""
+
+
+LATEST_TABLE_SQL = f"CREATE TABLE latest AS SELECT * FROM records WHERE rowid IN ({latest_rows_sql()})"
+
+
+def _connect(db_path, engine, read_only=True):
+    if engine == 'duckdb':
+        import duckdb
+        return duckdb.connect(db_path, read_only=read_only)
+    return sqlite3.connect(db_path)
+
+
+def build_database(csv_path, db_path, version, engine='sqlite', chunksize=100_000):
+    """Load the extract into a fresh database file and swap it into place"""
+    # The dashboard and the API may build at once; each build writes its own temporary file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(db_path)),
+                                    prefix=os.path.basename(db_path) + '.', suffix='.tmp')
+    os.close(fd)
+    if engine == 'duckdb':
+        # DuckDB will not open an empty file as a database; the unique name is what matters
+        os.remove(tmp_path)
+
+    try:
+        with closing(_connect(tmp_path, engine, read_only=False)) as conn:
+            if engine == 'duckdb':
+                conn.execute("CREATE TABLE records AS SELECT * FROM read_csv_auto(?, types={'student_id': 'VARCHAR'})",
+                             [csv_path])
+                # The extract's names, whichever naming the file uses, as read_extract_chunks gives the other engine
+                header = [row[0] for row in conn.execute("DESCRIBE records").fetchall()]
+                for col, source in source_columns(header).items():
+                    if source != col:
+                        conn.execute(f'ALTER TABLE records RENAME COLUMN "{source}" TO "{col}"')
+            else:
+                for chunk in read_extract_chunks(csv_path, chunksize):
+                    chunk.to_sql('records', conn, if_exists='append', index=False)
+            conn.execute(LATEST_TABLE_SQL)
+            conn.execute("CREATE INDEX idx_records_student ON records (student_id, term)")
+            conn.execute("CREATE INDEX idx_latest_student ON latest (student_id)")
+            conn.execute("CREATE TABLE dataset_meta (version TEXT)")
+            conn.execute("INSERT INTO dataset_meta VALUES (?)", [version])
+            conn.commit()
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stored_version(db_path, engine='sqlite'):
+    if not os.path.exists(db_path):
+        return None
+    try:
+        with closing(_connect(db_path, engine)) as conn:
+            return conn.execute("SELECT version FROM dataset_meta").fetchone()[0]
+    except Exception:
+        return None
+
+
+def open_backend(csv_path, db_path, version, engine='sqlite'):
+    """Return a backend for db_path, rebuilding it if it holds another dataset version"""
+    if engine not in BACKEND_ENGINES:
+        raise ValueError(f"Unknown query backend: {engine}")
+    if stored_version(db_path, engine) != version:
+        build_database(csv_path, db_path, version, engine)
+    return QueryBackend(db_path, engine)
+
+
+class QueryBackend:
+    """Pushes page filters, groupbys and latest-term selection down to SQL"""
+
+    def __init__(self, db_path, engine='sqlite'):
+        self.db_path = db_path
+        self.engine = engine
+        self.columns = list(self.query("SELECT * FROM latest LIMIT 0").columns)
+        self._values = {}
+        self._bounds = {}
+
+    def query(self, sql, params=()):
+        with closing(_connect(self.db_path, self.engine)) as conn:
+            if self.engine == 'duckdb':
+                return conn.execute(sql, list(params)).df()
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    def _column(self, col):
+        # Column names cannot be bound as parameters, so only known ones are accepted
+        if col not in self.columns:
+            raise ValueError(f"Unknown column: {col}")
+        return col
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for col, predicate in (filters or {}).items():
+            name = self._column(col)
+            if col in RANGE_FILTERS:
+                clauses.append(f"{name} BETWEEN ? AND ?")
+                params.extend(predicate)
+            elif predicate:
+                clauses.append(f"{name} IN ({', '.join('?' * len(predicate))})")
+                params.extend(predicate)
+        return clauses, params
+
+    def _select_columns(self, columns):
+        if columns is None:
+            return '*'
+        return ', '.join(self._column(col) for col in columns)
+
+    # Filter bar support, same interface as CohortIndex
+    def values(self, col):
+        if col not in self._values:
+            name = self._column(col)
+            result = self.query(f"SELECT DISTINCT {name} FROM latest WHERE {name} IS NOT NULL ORDER BY {name}")
+            self._values[col] = result[col].tolist()
+        return self._values[col]
+
+    def bounds(self, col):
+        if col not in self._bounds:
+            name = self._column(col)
+            result = self.query(f"SELECT MIN({name}) AS low, MAX({name}) AS high FROM latest")
+            low, high = result.iloc[0]
+            self._bounds[col] = (float(low or 0.0), float(high or 0.0))
+        return self._bounds[col]
+
+    def latest(self, filters=None, columns=None, min_dropout_probability=None):
+        """Latest-term rows of the filtered cohort, in student order"""
+        clauses, params = self._where(filters)
+        if min_dropout_probability is not None:
+            clauses.append("pred_dropout_probability > ?")
+            params.append(min_dropout_probability)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.query(f"SELECT {self._select_columns(columns)} FROM latest{where} ORDER BY student_id", params)
+
+    def overview_metrics(self, filters=None):
+        clauses, params = self._where(filters)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        result = self.query(f"""
+            SELECT COUNT(DISTINCT student_id) AS total_students,
+                   COALESCE(SUM(pred_at_risk_flag), 0) AS at_risk_students,
+                   COALESCE(AVG(pred_at_risk_flag), 0) AS at_risk_share,
+                   COALESCE(SUM(CASE WHEN attendance_rate < 80 THEN 1 ELSE 0 END), 0) AS low_attendance,
+                   COALESCE(SUM(CASE WHEN cum_gpa < 2.0 THEN 1 ELSE 0 END), 0) AS low_gpa,
+                   COALESCE(SUM(probation_flag), 0) AS on_probation
+            FROM latest{where}""", params)
+        metrics = {col: int(result[col].iloc[0]) for col in result.columns}
+        metrics['at_risk_share'] = float(result['at_risk_share'].iloc[0])
+        return metrics
+
+    def at_risk_latest(self, filters=None):
+        """Each cohort student's most recent term predicted at risk, in student order"""
+        clauses, params = self._where(filters)
+        cohort = f" AND student_id IN (SELECT student_id FROM latest WHERE {' AND '.join(clauses)})" if clauses else ''
+        # Row positions into this result are cached and shared between sessions, so its order must not vary
+        return self.query(f"""
+            SELECT * FROM records WHERE rowid IN ({latest_rows_sql(f" WHERE pred_at_risk_flag = 1{cohort}")})
+            ORDER BY student_id""", params)
+
+    def student_history(self, student_id, filters=None):
+        clauses, params = self._where(filters)
+        cohort = f" AND student_id IN (SELECT student_id FROM latest WHERE {' AND '.join(clauses)})" if clauses else ''
+        return self.query(f"SELECT * FROM records WHERE student_id = ?{cohort} ORDER BY term",
+                          [student_id] + params)
+
+    def students_history(self, student_ids, filters=None):
+        """Rows of several students in one indexed query"""
+        student_ids = list(student_ids)
+        if not student_ids:
+            return self.query("SELECT * FROM records LIMIT 0")
+        clauses, params = self._where(filters)
+        cohort = f" AND student_id IN (SELECT student_id FROM latest WHERE {' AND '.join(clauses)})" if clauses else ''
+        return self.query(f"""
+            SELECT * FROM records WHERE student_id IN ({', '.join('?' * len(student_ids))}){cohort}
+            ORDER BY student_id, term""", student_ids + params)
+
+    def records(self, columns):
+        """Selected columns of every term record"""
+        return self.query(f"SELECT {self._select_columns(columns)} FROM records")
+
+    def latest_trajectories(self, columns=TRAJECTORY_COLUMNS):
+        """Latest-term deltas per student, computed with LAG window functions"""
+        deltas = ', '.join(
+            f"{self._column(col)} - LAG({col}) OVER (PARTITION BY student_id ORDER BY term) AS {col}_delta"
+            for col in columns
+        )
+        result = self.query(f"""
+            SELECT * FROM (
+                SELECT student_id, term, {', '.join(columns)}, {deltas},
+                       ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY term DESC) AS term_rank
+                FROM records
+            ) WHERE term_rank = 1""")
+        return result.drop(columns='term_rank').assign(is_latest=True)
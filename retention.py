@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# COHORT RETENTION
+# -----------------------------
+# Students are grouped by the term they first appear in (their entering
+# cohort). Terms become integer codes in term order, so "k terms after entry"
+# is a plain subtraction. Each matrix is one pivot of distinct enrolled
+# (student, offset) pairs over [breakdown, entering term] x offset, divided by
+# the cohort sizes. Cells after the last term in the extract are left empty.
+
+RETENTION_COLUMNS = ['student_id', 'term', 'enrollment_status', 'major', 'first_generation_flag']
+RETENTION_BREAKDOWNS = ['major', 'first_generation_flag']
+# Term rows with these statuses do not count as enrolled
+NOT_ENROLLED_STATUSES = ['Withdrawn']
+
+
+def build_retention(records, breakdowns=RETENTION_BREAKDOWNS):
+    """Share of each entering cohort enrolled k terms later, overall and per breakdown column"""
+    records = records[RETENTION_COLUMNS[:3] + breakdowns]
+    term_codes, terms = pd.factorize(records['term'], sort=True)
+    student_codes, _ = pd.factorize(records['student_id'])
+    entry_codes = pd.Series(term_codes).groupby(student_codes).transform('min').to_numpy()
+    offsets = term_codes - entry_codes
+
+    # Breakdown attributes as of the entering term, one row per student
+    entering = records[offsets == 0].assign(student=student_codes[offsets == 0], entry=entry_codes[offsets == 0])
+    students = entering.drop_duplicates('student')[['student', 'entry'] + breakdowns]
+
+    enrolled = ~records['enrollment_status'].isin(NOT_ENROLLED_STATUSES).to_numpy()
+    kept = pd.DataFrame({'student': student_codes[enrolled], 'offset': offsets[enrolled]}).drop_duplicates()
+    kept = kept.merge(students, on='student')
+
+    # Offsets a cohort has not reached yet because the extract ends first
+    unobserved = (np.arange(len(terms))[:, None] + np.arange(len(terms))[None, :]) >= len(terms)
+
+    matrices = {}
+    for breakdown in [None] + breakdowns:
+        keys = ([breakdown] if breakdown else []) + ['entry']
+        counts = kept.pivot_table(index=keys, columns='offset', values='student', aggfunc='count', fill_value=0)
+        counts = counts.reindex(columns=range(len(terms)), fill_value=0)
+        sizes = students.groupby(keys).size()
+        shares = counts.div(sizes, axis=0)
+        entry_index = shares.index.get_level_values('entry')
+        shares = shares.mask(unobserved[entry_index])
+        shares.insert(0, 'cohort_size', sizes.reindex(shares.index).to_numpy())
+        shares = shares.reset_index()
+        shares['entry'] = np.asarray(terms)[shares['entry']]
+        matrices[breakdown or 'overall'] = shares.rename(columns={'entry': 'entering_term'})
+    return matrices
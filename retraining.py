@@ -0,0 +1,297 @@
+"""Retrain the dropout model on the labeled student records.
+
+Usage: python retraining.py [labeled.csv] [--folds 5] [--jobs -1] [--model dropout_model.joblib]
+
+Every candidate model is a StandardScaler + classifier pipeline. Candidates
+are cross-validated with student-grouped folds, all folds of all candidates
+in parallel, and the best mean ROC AUC is refitted on every labeled record
+and written to the model file for the dashboard to score with.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from risk_attribution import annotate_extract
+
+# -----------------------------
+# MODEL RETRAINING
+# -----------------------------
+# Fitting is the slow part, so every fitted result is cached on disk, keyed
+# by a hash of the training data and the candidate's hyperparameters:
+#   <key>.json    cross-validation scores of one candidate
+#   <key>.joblib  one candidate refitted on all the data
+# Asking again for the same data and candidates only reads the cache. The
+# dashboard runs jobs on a single background thread; the folds themselves run
+# in joblib worker processes, so sessions are never blocked by a fit.
+
+TRAINING_FILE = 'HSU_Student_Success_Data.csv'
+LABEL_COLUMN = 'at_risk_flag'
+MODEL_FEATURES = ['age', 'first_generation_flag', 'credits_attempted', 'course_drop_count', 'gpa_term', 'cum_gpa',
+                  'lms_logins', 'attendance_rate', 'assignments_on_time_pct', 'discussion_posts', 'library_visits',
+                  'work_hours_per_week', 'advisor_meetings', 'tutoring_sessions', 'probation_flag',
+                  'financial_aid_flag', 'late_registration', 'outstanding_balance']
+DEFAULT_MODEL_FILE = 'dropout_model.joblib'
+DEFAULT_CACHE_DIR = 'model_cache'
+DEFAULT_FOLDS = 5
+# Rescored extracts are written next to the extract as <name>.rescored-<timestamp>.csv, never over it
+RESCORED_KEEP = 2
+
+# Candidate name -> (classifier, hyperparameters)
+CANDIDATE_MODELS = {
+    'Logistic regression (C=0.1)': ('logistic_regression', {'C': 0.1}),
+    'Logistic regression (C=1)': ('logistic_regression', {'C': 1.0}),
+    'Random forest': ('random_forest', {'n_estimators': 200, 'max_depth': 8, 'min_samples_leaf': 5}),
+    'Gradient boosting': ('gradient_boosting', {'n_estimators': 150, 'max_depth': 3, 'learning_rate': 0.1}),
+}
+
+
+def build_pipeline(classifier, params):
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    classifiers = {
+        'logistic_regression': lambda: LogisticRegression(max_iter=1000, **params),
+        # One core per fit; the folds already use all of them
+        'random_forest': lambda: RandomForestClassifier(random_state=0, n_jobs=1, **params),
+        'gradient_boosting': lambda: GradientBoostingClassifier(random_state=0, **params),
+    }
+    if classifier not in classifiers:
+        raise ValueError(f"Unknown classifier: {classifier}")
+    return Pipeline([('scaler', StandardScaler()), ('classifier', classifiers[classifier]())])
+
+
+def load_training_data(path=TRAINING_FILE):
+    """Labeled records with the model features, oldest term first"""
+    frame = pd.read_csv(path, usecols=['student_id', 'term'] + MODEL_FEATURES + [LABEL_COLUMN])
+    frame = frame.dropna(subset=[LABEL_COLUMN])
+    return frame.sort_values(['term', 'student_id'], kind='stable').reset_index(drop=True)
+
+
+def data_hash(frame):
+    hashes = pd.util.hash_pandas_object(frame[MODEL_FEATURES + [LABEL_COLUMN]], index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:24]
+
+
+class ModelCache:
+    """Cross-validation scores and fitted pipelines on disk, by cache key"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, f'{key}.{ext}')
+
+    def scores(self, key):
+        path = self._path(key, 'json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def put_scores(self, key, scores):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(key, 'json.tmp'), 'w') as f:
+            json.dump(scores, f)
+        os.replace(self._path(key, 'json.tmp'), self._path(key, 'json'))
+
+    def model(self, key):
+        import joblib
+        path = self._path(key, 'joblib')
+        return joblib.load(path) if os.path.exists(path) else None
+
+    def put_model(self, key, model):
+        import joblib
+        os.makedirs(self.root, exist_ok=True)
+        joblib.dump(model, self._path(key, 'joblib.tmp'))
+        os.replace(self._path(key, 'joblib.tmp'), self._path(key, 'joblib'))
+
+
+def fold_score(classifier, params, features, labels, train, test):
+    from sklearn.metrics import roc_auc_score
+
+    pipeline = build_pipeline(classifier, params).fit(features.iloc[train], labels[train])
+    return roc_auc_score(labels[test], pipeline.predict_proba(features.iloc[test])[:, -1])
+
+
+def cross_validate(frame, candidates, folds=DEFAULT_FOLDS, n_jobs=-1, cache=None, progress=print):
+    """Mean and spread of the fold ROC AUCs of each candidate, fitting only uncached ones"""
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedGroupKFold
+
+    cache = cache or ModelCache()
+    dataset = data_hash(frame)
+    keys = {name: cache_key(dataset, *CANDIDATE_MODELS[name], folds) for name in candidates}
+    pending = [name for name in candidates if cache.scores(keys[name]) is None]
+
+    if pending:
+        features, labels = frame[MODEL_FEATURES], frame[LABEL_COLUMN].to_numpy()
+        # A student's terms stay in one fold, so no fold is scored on students it was trained on
+        splits = list(StratifiedGroupKFold(folds, shuffle=True, random_state=0)
+                      .split(features, labels, frame['student_id']))
+        progress(f"Cross-validating {len(pending)} candidates x {folds} folds ({len(candidates) - len(pending)} cached)")
+        tasks = [(name, train, test) for name in pending for train, test in splits]
+        fold_scores = Parallel(n_jobs=n_jobs)(
+            delayed(fold_score)(*CANDIDATE_MODELS[name], features, labels, train, test) for name, train, test in tasks
+        )
+        for i, name in enumerate(pending):
+            scores = fold_scores[i * folds:(i + 1) * folds]
+            cache.put_scores(keys[name], {'mean_auc': float(np.mean(scores)), 'std_auc': float(np.std(scores))})
+
+    rows = [{'model': name, **cache.scores(keys[name]), 'cached': name not in pending} for name in candidates]
+    return pd.DataFrame(rows).sort_values('mean_auc', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def model_info(model_path=DEFAULT_MODEL_FILE):
+    """Metadata written next to the current model, or None before the first retraining"""
+    path = os.path.splitext(model_path)[0] + '.json'
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def retrain(training_path=TRAINING_FILE, candidates=None, folds=DEFAULT_FOLDS, n_jobs=-1,
+            model_path=DEFAULT_MODEL_FILE, cache_dir=DEFAULT_CACHE_DIR, progress=print):
+    """Cross-validate the candidates, refit the best on all labeled records and write it to model_path"""
+    import joblib
+
+    candidates = list(candidates or CANDIDATE_MODELS)
+    cache = ModelCache(cache_dir)
+    progress(f"Loading labeled records from {training_path}")
+    frame = load_training_data(training_path)
+    scores = cross_validate(frame, candidates, folds, n_jobs, cache, progress)
+
+    winner = scores['model'].iloc[0]
+    dataset = data_hash(frame)
+    key = cache_key(dataset, *CANDIDATE_MODELS[winner])
+    model = cache.model(key)
+    if model is None:
+        progress(f"Fitting {winner} on {len(frame):,} records")
+        model = build_pipeline(*CANDIDATE_MODELS[winner]).fit(frame[MODEL_FEATURES], frame[LABEL_COLUMN])
+        cache.put_model(key, model)
+
+    joblib.dump(model, model_path + '.tmp')
+    os.replace(model_path + '.tmp', model_path)
+    info = {
+        'model': winner,
+        'params': CANDIDATE_MODELS[winner][1],
+        'cv_auc': float(scores['mean_auc'].iloc[0]),
+        'folds': folds,
+        'training_file': training_path,
+        'training_records': len(frame),
+        'data_hash': dataset,
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'scores': scores.to_dict(orient='records'),
+    }
+    with open(os.path.splitext(model_path)[0] + '.json', 'w') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+# -----------------------------
+# RESCORED EXTRACTS
+# -----------------------------
+def _rescored_files(extract_path):
+    stem, ext = os.path.splitext(extract_path)
+    # Timestamps sort in the order the files were written
+    return sorted(glob.glob(f"{glob.escape(stem)}.rescored-*{ext}"))
+
+
+def rescored_path(extract_path):
+    stem, ext = os.path.splitext(extract_path)
+    return f"{stem}.rescored-{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+
+
+def current_extract(extract_path):
+    """The newest rescored copy of extract_path, or the extract itself when it was replaced after that rescore"""
+    rescored = _rescored_files(extract_path)
+    if rescored and (not os.path.exists(extract_path)
+                     or os.stat(rescored[-1]).st_mtime_ns >= os.stat(extract_path).st_mtime_ns):
+        return rescored[-1]
+    return extract_path
+
+
+def prune_rescored(extract_path, keep=RESCORED_KEEP):
+    # The previous copy stays, as a session may still be reading it
+    for path in _rescored_files(extract_path)[:-keep]:
+        os.remove(path)
+
+
+# -----------------------------
+# BACKGROUND WORKER
+# -----------------------------
+class RetrainingWorker:
+    """Runs retraining jobs one at a time on a background thread"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retraining')
+        self._lock = threading.Lock()
+        self.jobs = []
+
+    def submit(self, rescore_path=None, **retrain_args):
+        """Queue a retraining job; with rescore_path, a rescored copy of that extract is written afterwards"""
+        job = {'id': len(self.jobs) + 1, 'state': 'queued', 'message': "Waiting for the worker",
+               'submitted_at': datetime.now().isoformat(timespec='seconds'), 'result': None, 'error': None,
+               'rescored_path': None}
+        with self._lock:
+            self.jobs.append(job)
+        self._executor.submit(self._run, job, rescore_path, retrain_args)
+        return job
+
+    def _run(self, job, rescore_path, retrain_args):
+        job['state'] = 'running'
+        try:
+            job['result'] = retrain(progress=lambda message: job.update(message=message), **retrain_args)
+            if rescore_path:
+                # The loaders switch to the new copy once it is complete; the extract itself is left as delivered
+                source, out_path = current_extract(rescore_path), rescored_path(rescore_path)
+                job['message'] = f"Rescoring {source} into {out_path}"
+                annotate_extract(retrain_args.get('model_path', DEFAULT_MODEL_FILE), source, out_path, rescore=True)
+                prune_rescored(rescore_path)
+                job['rescored_path'] = out_path
+            job['message'] = "Done"
+            job['state'] = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            job['state'] = 'failed'
+        job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+    def latest(self):
+        with self._lock:
+            return self.jobs[-1] if self.jobs else None
+
+    def busy(self):
+        job = self.latest()
+        return job is not None and job['state'] in ('queued', 'running')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('training_file', nargs='?', default=TRAINING_FILE)
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--model', default=DEFAULT_MODEL_FILE)
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    info = retrain(args.training_file, folds=args.folds, n_jobs=args.jobs, model_path=args.model, cache_dir=args.cache)
+    print(pd.DataFrame(info['scores']).to_string(index=False))
+    print(f"Wrote {info['model']} (CV ROC AUC {info['cv_auc']:.3f}) to {args.model}")
+
+
+if __name__ == '__main__':
+    main()
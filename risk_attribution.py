@@ -0,0 +1,191 @@
+"""Top risk factors of every student, from a saved dropout model.
+
+Usage: python risk_attribution.py [--rescore] model.joblib path/to/extract.csv [out.csv]
+
+The model is a scikit-learn estimator or pipeline saved with joblib and
+fitted on a DataFrame, so it knows its input columns (feature_names_in_).
+Linear models and decision tree ensembles are supported. The extract is read
+in chunks and written back with the pred_factor_* columns added, in place
+unless out.csv is given. With --rescore the pred_dropout_probability and
+pred_at_risk_flag columns are recomputed with the same model first.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from chunked_ingest import DEFAULT_CHUNKSIZE
+from term_ingest import CONTRIBUTION_COLUMNS, EXTRACT_SCHEMA, FACTOR_COLUMNS, FACTOR_COUNT, OPTIONAL_SCHEMA, source_columns
+
+# -----------------------------
+# BATCH RISK ATTRIBUTION
+# -----------------------------
+# Each feature's contribution to a student's dropout score is computed for a
+# whole chunk at once:
+#   linear models  coef * (x - mean of x), in the model's input space
+#   tree ensembles the change in predicted risk at every split on the
+#                  feature along the student's path, summed over trees.
+#                  Each tree becomes a sparse (node x feature) matrix of
+#                  those changes, so a chunk costs one decision_path() and
+#                  one sparse product per tree.
+# Only the top risk-raising features are kept, as a few compact columns
+# stored next to the predictions, so pages never explain on a click.
+
+# pred_at_risk_flag is set when the predicted dropout probability reaches this
+AT_RISK_PROBABILITY = 0.5
+
+
+def load_model(path):
+    import joblib
+    return joblib.load(path)
+
+
+class RiskAttributor:
+    """Per-feature contributions of a fitted linear model or tree ensemble to the positive class"""
+
+    def __init__(self, model, baseline=None):
+        if not hasattr(model, 'feature_names_in_'):
+            raise ValueError("The model must be fitted on a DataFrame so its input columns are known")
+        self.features = np.asarray(model.feature_names_in_, dtype=object)
+        if hasattr(model, 'steps'):
+            self.preprocess = [step for _, step in model.steps[:-1] if step not in (None, 'passthrough')]
+            self.estimator = model.steps[-1][1]
+        else:
+            self.preprocess, self.estimator = [], model
+        # Linear contributions are measured from this point of the model's input space
+        self.baseline = baseline
+
+        estimator = self.estimator
+        if hasattr(estimator, 'coef_'):
+            self.kind = 'linear'
+            self.coef = np.asarray(estimator.coef_, dtype='float64').reshape(-1, len(self.features))[-1]
+            return
+        if hasattr(estimator, 'tree_'):
+            trees, scale = [estimator], 1.0
+        elif hasattr(estimator, 'estimators_') and hasattr(estimator, 'learning_rate'):
+            # Gradient boosting: one regression tree per stage, adding to the log-odds
+            trees, scale = np.asarray(estimator.estimators_)[:, -1], estimator.learning_rate
+        elif hasattr(estimator, 'estimators_'):
+            # Random forest / extra trees: the average of the trees
+            trees, scale = estimator.estimators_, 1.0 / len(estimator.estimators_)
+        else:
+            raise ValueError(f"Risk attribution does not support {type(estimator).__name__} models")
+        self.kind = 'trees'
+        self.trees = [(tree.tree_, self._tree_matrix(tree.tree_, scale)) for tree in trees]
+
+    def _tree_matrix(self, tree, scale):
+        """Sparse (node x feature) matrix of the change in predicted risk when entering each node"""
+        from scipy import sparse
+
+        values = tree.value[:, 0, :]
+        if values.shape[1] > 1:
+            # Classifier trees: share of the positive class at each node
+            values = values[:, -1] / values.sum(axis=1)
+        else:
+            values = values[:, 0]
+        parents = np.full(tree.node_count, -1)
+        internal = np.flatnonzero(tree.children_left >= 0)
+        parents[tree.children_left[internal]] = internal
+        parents[tree.children_right[internal]] = internal
+        children = np.flatnonzero(parents >= 0)
+        deltas = (values[children] - values[parents[children]]) * scale
+        return sparse.csr_matrix((deltas, (children, tree.feature[parents[children]])),
+                                 shape=(tree.node_count, len(self.features)))
+
+    def _model_inputs(self, frame):
+        inputs = frame[list(self.features)]
+        for step in self.preprocess:
+            inputs = step.transform(inputs)
+        inputs = np.asarray(inputs, dtype='float64')
+        if inputs.shape[1] != len(self.features):
+            raise ValueError("Risk attribution needs one model input per extract column")
+        return inputs
+
+    def input_means(self, frame):
+        """Column means of the model inputs, the linear baseline"""
+        return self._model_inputs(frame).mean(axis=0)
+
+    def contributions(self, frame):
+        """(rows x features) contributions to the dropout score"""
+        inputs = self._model_inputs(frame)
+        if self.kind == 'linear':
+            baseline = self.baseline if self.baseline is not None else inputs.mean(axis=0)
+            return (inputs - baseline) * self.coef
+        inputs = np.ascontiguousarray(inputs, dtype='float32')
+        total = np.zeros(inputs.shape)
+        for tree, matrix in self.trees:
+            total += (tree.decision_path(inputs) @ matrix).toarray()
+        return total
+
+    def top_factors(self, frame, count=FACTOR_COUNT):
+        """The count features that raise each student's risk most, and by how much"""
+        contributions = self.contributions(frame)
+        top = np.argsort(-contributions, axis=1, kind='stable')[:, :count]
+        weights = np.take_along_axis(contributions, top, axis=1)
+        raises = weights > 0
+        factors = {}
+        for rank in range(count):
+            factors[FACTOR_COLUMNS[rank]] = np.where(raises[:, rank], self.features[top[:, rank]], None)
+            factors[CONTRIBUTION_COLUMNS[rank]] = np.where(raises[:, rank], weights[:, rank], np.nan).round(4)
+        return pd.DataFrame(factors, index=frame.index)
+
+
+def score(model, frame):
+    """pred_dropout_probability and pred_at_risk_flag of every row"""
+    probability = model.predict_proba(frame[list(model.feature_names_in_)])[:, -1]
+    return pd.DataFrame({
+        'pred_dropout_probability': probability.round(3),
+        'pred_at_risk_flag': (probability >= AT_RISK_PROBABILITY).astype(int),
+    }, index=frame.index)
+
+
+def extract_dtypes(csv_path):
+    """Schema dtype of each file column; integers are nullable, so a blank never turns a chunk's column to float"""
+    schema = {**EXTRACT_SCHEMA, **OPTIONAL_SCHEMA}
+    sources = source_columns(pd.read_csv(csv_path, nrows=0).columns)
+    return {source: 'Int64' if schema[col] == 'int64' else schema[col] for col, source in sources.items() if col in schema}
+
+
+def annotate_extract(model_path, csv_path, out_path=None, chunksize=DEFAULT_CHUNKSIZE, rescore=False):
+    """Write the extract back with the top risk factor columns (and fresh predictions), one chunk at a time"""
+    model = load_model(model_path)
+    attributor = RiskAttributor(model)
+    if attributor.kind == 'linear':
+        # One pass over the model's columns, so every chunk shares the same baseline
+        inputs = pd.read_csv(csv_path, usecols=list(attributor.features))
+        attributor.baseline = attributor.input_means(inputs)
+        del inputs
+
+    out_path = out_path or csv_path
+    tmp_path = out_path + '.tmp'
+    rows = 0
+    # The file is written back, so every chunk is read with the same dtypes and IDs stay text
+    for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize, dtype=extract_dtypes(csv_path))):
+        chunk = chunk.drop(columns=FACTOR_COLUMNS + CONTRIBUTION_COLUMNS, errors='ignore')
+        features = chunk[list(attributor.features)].astype('float64')
+        if rescore:
+            chunk = chunk.drop(columns=['pred_dropout_probability', 'pred_at_risk_flag'], errors='ignore')
+            chunk = pd.concat([chunk, score(model, features)], axis=1)
+        chunk = pd.concat([chunk, attributor.top_factors(features)], axis=1)
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    os.replace(tmp_path, out_path)
+    return rows
+
+
+def main():
+    args = sys.argv[1:]
+    rescore = '--rescore' in args
+    args = [arg for arg in args if arg != '--rescore']
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+    out_path = args[2] if len(args) > 2 else None
+    rows = annotate_extract(args[0], args[1], out_path, rescore=rescore)
+    scored = "Scored and added" if rescore else "Added"
+    print(f"{scored} top {FACTOR_COUNT} risk factors to {rows:,} records in {out_path or args[1]}")
+
+
+if __name__ == '__main__':
+    main()
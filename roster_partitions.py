@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from term_ingest import EXTRACT_SCHEMA, parse_term_file
+
+# -----------------------------
+# ROSTER PARTITIONS
+# -----------------------------
+# Each professor's students are written to a partition of their own, one CSV
+# holding every term record of the students on their roster. A professor's
+# session reads only that file, so its snapshots, filters and aggregates
+# follow the roster size rather than the institution's. The partitions are
+# built in one pass over the records, a chunk at a time: each chunk is joined
+# to the roster table once and its rows appended to the partitions they fall
+# in. A student on several rosters is written to each. The store is rebuilt
+# when either the dataset or the roster file changes. Partitions are read
+# back through the extract schema, so a roster session gets the same
+# columns and dtypes as the full view.
+
+DEFAULT_ROSTER_FILE = 'rosters.csv'
+DEFAULT_STORE_DIR = 'roster_partitions'
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_version(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def load_rosters(path=DEFAULT_ROSTER_FILE):
+    """Distinct (username, student_id) pairs of a roster CSV with those two columns"""
+    rosters = pd.read_csv(path, usecols=['username', 'student_id'], dtype=str)
+    return rosters.dropna().drop_duplicates(ignore_index=True)
+
+
+def _partition_file(username):
+    # Usernames are free text; the file name must not be
+    return hashlib.sha256(username.encode()).hexdigest()[:16] + '.csv'
+
+
+class RosterPartitionStore:
+    """One CSV of term records per professor roster, rebuilt per dataset and roster version"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        path = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'version': None, 'rosters_version': None, 'directory': None, 'partitions': {}}
+
+    def is_current(self, version, rosters_version):
+        return self.manifest['version'] == version and self.manifest['rosters_version'] == rosters_version
+
+    def build(self, chunks, rosters, version, rosters_version):
+        """Partition an iterable of record chunks by roster"""
+        # A fresh directory per build; the manifest switches to it only once every file is complete
+        directory = 'partitions-' + hashlib.sha256(f"{version}/{rosters_version}".encode()).hexdigest()[:12]
+        build_dir = os.path.join(self.root, directory)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+        partitions = {username: {'file': _partition_file(username), 'records': 0, 'students': 0}
+                      for username in rosters['username'].unique()}
+        columns = None
+        for chunk in chunks:
+            columns = list(chunk.columns)
+            # Roster IDs are text; chunks read without a schema may hold numeric IDs.
+            # Rows of students on several rosters come out once per roster.
+            matched = chunk.astype({'student_id': str}).merge(rosters, on='student_id', how='inner', sort=False)
+            for username, rows in matched.groupby('username', sort=False):
+                path = os.path.join(build_dir, partitions[username]['file'])
+                rows[columns].to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+                partitions[username]['records'] += len(rows)
+
+        for username, partition in partitions.items():
+            path = os.path.join(build_dir, partition['file'])
+            if not os.path.exists(path):
+                # Nobody on this roster is in the extract; an empty partition still has the header
+                pd.DataFrame(columns=columns or list(EXTRACT_SCHEMA)).to_csv(path, index=False)
+        student_counts = rosters.groupby('username')['student_id'].nunique()
+        for username, partition in partitions.items():
+            partition['students'] = int(student_counts[username])
+
+        previous = self.manifest.get('directory')
+        self.manifest = {'version': version, 'rosters_version': rosters_version, 'directory': directory,
+                         'partitions': partitions}
+        path = os.path.join(self.root, MANIFEST_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+        if previous and previous != directory:
+            shutil.rmtree(os.path.join(self.root, previous), ignore_errors=True)
+        return self
+
+    def has_roster(self, username):
+        return username in self.manifest['partitions']
+
+    def read(self, username):
+        """Every term record of the username's roster; an empty frame when they have none"""
+        partition = self.manifest['partitions'].get(username)
+        if partition is None:
+            return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in EXTRACT_SCHEMA.items()})
+        return parse_term_file(os.path.join(self.root, self.manifest['directory'], partition['file']))
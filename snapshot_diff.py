@@ -0,0 +1,118 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# DATASET VERSION DIFFS
+# -----------------------------
+# Each dataset version leaves a compact copy of its latest-term snapshot: one
+# row per student, only the columns the diff needs, gzipped. When a new
+# version is loaded it is joined once against the previous copy on
+# student_id. Only the students that changed are kept, and written next to
+# the snapshots. The "What's new" page filters that small frame and never
+# repeats the join.
+
+DIFF_COLUMNS = ['student_id', 'major', 'term', 'pred_at_risk_flag', 'pred_dropout_probability',
+                'cum_gpa', 'attendance_rate']
+# Smallest probability move kept in a stored diff; the page can only ask for larger ones
+MIN_PROBABILITY_DELTA = 0.05
+DEFAULT_KEEP_VERSIONS = 5
+MANIFEST_FILE = 'manifest.json'
+
+
+def diff_snapshots(previous, current, min_delta=MIN_PROBABILITY_DELTA):
+    """Students that appeared, disappeared, changed risk flag or moved at least min_delta"""
+    merged = previous[DIFF_COLUMNS].merge(current[DIFF_COLUMNS], on='student_id', how='outer',
+                                          suffixes=('_previous', ''), indicator=True)
+    merged['status'] = merged['_merge'].map({'left_only': 'removed', 'right_only': 'new', 'both': 'both'}).astype(str)
+    merged['probability_delta'] = merged['pred_dropout_probability'] - merged['pred_dropout_probability_previous']
+    flag_changed = merged['pred_at_risk_flag'].to_numpy() != merged['pred_at_risk_flag_previous'].to_numpy()
+    keep = (merged['status'] != 'both').to_numpy() | flag_changed | (merged['probability_delta'].abs() >= min_delta).to_numpy()
+    return merged[keep].drop(columns='_merge').reset_index(drop=True)
+
+
+def change_lists(diff, probability_delta):
+    """The page's lists, as masks over a stored diff"""
+    both = diff['status'] == 'both'
+    return {
+        'newly_at_risk': diff[both & (diff['pred_at_risk_flag_previous'] == 0) & (diff['pred_at_risk_flag'] == 1)],
+        'recovered': diff[both & (diff['pred_at_risk_flag_previous'] == 1) & (diff['pred_at_risk_flag'] == 0)],
+        'probability_moved': diff[both & (diff['probability_delta'].abs() >= probability_delta)]
+                             .sort_values('probability_delta', key=np.abs, ascending=False),
+        'new': diff[diff['status'] == 'new'],
+        'removed': diff[diff['status'] == 'removed'],
+    }
+
+
+class SnapshotHistory:
+    """Compact latest-term snapshots of the last few dataset versions and the diff of each against its predecessor"""
+
+    def __init__(self, root, keep=DEFAULT_KEEP_VERSIONS):
+        self.root = root
+        self.keep = keep
+        path = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            # versions is oldest first; previous maps each version to the one it was diffed against
+            self.manifest = {'versions': [], 'previous': {}, 'recorded_at': {}}
+
+    def _path(self, version, kind):
+        return os.path.join(self.root, f'{version}.{kind}.csv.gz')
+
+    def _read(self, path):
+        # IDs stay text, so numeric-looking ones keep leading zeros and join against the current snapshot
+        return pd.read_csv(path, dtype={'student_id': str})
+
+    def _write(self, frame, path):
+        frame.to_csv(path + '.tmp', index=False, compression='gzip')
+        os.replace(path + '.tmp', path)
+
+    def _write_manifest(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def record(self, version, latest_df):
+        """Store version's snapshot and its diff against the newest stored version, once"""
+        if version in self.manifest['versions']:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        current = latest_df[DIFF_COLUMNS].astype({'student_id': str})
+        previous_version = self.manifest['versions'][-1] if self.manifest['versions'] else None
+        if previous_version is not None:
+            previous = self._read(self._path(previous_version, 'snapshot'))
+            self._write(diff_snapshots(previous, current), self._path(version, 'diff'))
+        self._write(current, self._path(version, 'snapshot'))
+        self.manifest['versions'].append(version)
+        self.manifest['previous'][version] = previous_version
+        self.manifest['recorded_at'][version] = datetime.now().isoformat(timespec='seconds')
+        self._prune()
+        self._write_manifest()
+
+    def _prune(self):
+        while len(self.manifest['versions']) > self.keep:
+            oldest = self.manifest['versions'].pop(0)
+            for kind in ('snapshot', 'diff'):
+                if os.path.exists(self._path(oldest, kind)):
+                    os.remove(self._path(oldest, kind))
+            self.manifest['previous'].pop(oldest, None)
+            self.manifest['recorded_at'].pop(oldest, None)
+
+    def previous_version(self, version):
+        return self.manifest['previous'].get(version)
+
+    def recorded_at(self, version):
+        return self.manifest['recorded_at'].get(version)
+
+    def load_diff(self, version):
+        """The stored diff of version, or None when it is the first version seen"""
+        path = self._path(version, 'diff')
+        if not os.path.exists(path):
+            return None
+        return self._read(path)
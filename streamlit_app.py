@@ -7,6 +7,9 @@ import hashlib
 import json
 import os
 
+from data_store import DEFAULT_STORE_DIR, DataStore, latest_snapshot, source_version
+from retraining import current_extract
+
 # Page configuration
 st.set_page_config(
     page_title="Student Risk Monitoring Dashboard",
@@ -39,6 +42,10 @@ st.markdown("""
 
 # User authentication functions
 USER_DB_FILE = "users.json"
+# This dashboard's own extract by default; DASHBOARD_DATA_FILE points it and my_app.py at the same one.
+# The extract may name its prediction columns either way.
+DATA_FILE = os.environ.get('DASHBOARD_DATA_FILE', 'HSU_Student_Success_Data.csv')
+DATA_STORE_DIR = os.environ.get('DASHBOARD_DATA_STORE', DEFAULT_STORE_DIR)
 
 def load_users():
     """Load users from JSON file"""
@@ -60,7 +67,10 @@ def verify_login(username, password):
     """Verify login credentials"""
     users = load_users()
     if username in users:
-        return users[username] == hash_password(password)
+        entry = users[username]
+        # Accounts registered in my_app.py also keep an email
+        stored = entry['password'] if isinstance(entry, dict) else entry
+        return stored == hash_password(password)
     return False
 
 def register_user(username, password, email):
@@ -72,12 +82,16 @@ def register_user(username, password, email):
     save_users(users)
     return True, "Registration successful"
 
-# Load data with caching
-@st.cache_data
-def load_data():
+# Load data with caching: one shared frame per file version, read from the store my_app.py uses
+@st.cache_resource
+def load_data(path, version):
     """Load student data"""
-    df = pd.read_csv('HSU_Student_Success_Data.csv')
-    return df
+    return DataStore(path, DATA_STORE_DIR).records()
+
+@st.cache_resource
+def load_latest(path, version):
+    """Latest term of each student, stored alongside the records"""
+    return DataStore(path, DATA_STORE_DIR).latest()
 
 # Login/Signup page
 def login_page():
@@ -133,7 +147,7 @@ def display_overview_metrics(df):
     col1, col2, col3, col4, col5 = st.columns(5)
     
     total_students = df['student_id'].nunique()
-    at_risk_students = df[df['at_risk_flag'] == 1]['student_id'].nunique()
+    at_risk_students = df[df['pred_at_risk_flag'] == 1]['student_id'].nunique()
     low_attendance = df[df['attendance_rate'] < 80]['student_id'].nunique()
     low_gpa = df[df['cum_gpa'] < 2.0]['student_id'].nunique()
     on_probation = df[df['probation_flag'] == 1]['student_id'].nunique()
@@ -156,10 +170,10 @@ def display_at_risk_students(df):
     st.subheader("🚨 At-Risk Students")
     
     # Filter for at-risk students
-    at_risk_df = df[df['at_risk_flag'] == 1].copy()
+    at_risk_df = df[df['pred_at_risk_flag'] == 1].copy()
     
     # Get latest term data for each student
-    at_risk_df = at_risk_df.sort_values('term').groupby('student_id').last().reset_index()
+    at_risk_df = latest_snapshot(at_risk_df)
     
     # Filtering options
     col1, col2, col3 = st.columns(3)
@@ -185,11 +199,11 @@ def display_at_risk_students(df):
     # Select columns to display
     display_columns = ['student_id', 'major', 'term', 'cum_gpa', 'attendance_rate', 
                       'assignments_on_time_pct', 'course_drop_count', 'probation_flag',
-                      'dropout_probability']
+                      'pred_dropout_probability']
     
     # Format the dataframe
     display_df = filtered_df[display_columns].copy()
-    display_df['dropout_probability'] = display_df['dropout_probability'].apply(lambda x: f"{x*100:.1f}%")
+    display_df['pred_dropout_probability'] = display_df['pred_dropout_probability'].apply(lambda x: f"{x*100:.1f}%")
     display_df['attendance_rate'] = display_df['attendance_rate'].apply(lambda x: f"{x:.1f}%")
     display_df['assignments_on_time_pct'] = display_df['assignments_on_time_pct'].apply(lambda x: f"{x:.1f}%")
     
@@ -209,13 +223,10 @@ def display_at_risk_students(df):
         mime="text/csv"
     )
 
-def display_analytics(df):
-    """Display analytics and visualizations"""
+def display_analytics(latest_df):
+    """Display analytics and visualizations from each student's latest term"""
     st.subheader("📈 Student Analytics Dashboard")
     
-    # Get latest data for each student
-    latest_df = df.sort_values('term').groupby('student_id').last().reset_index()
-    
     # Create two columns for charts
     col1, col2 = st.columns(2)
     
@@ -246,7 +257,7 @@ def display_analytics(df):
     
     with col3:
         st.markdown("#### At-Risk Students by Major")
-        risk_by_major = latest_df.groupby('major')['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        risk_by_major = latest_df.groupby('major')['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         risk_by_major['percentage'] = (risk_by_major['sum'] / risk_by_major['count'] * 100).round(1)
         risk_by_major = risk_by_major.sort_values('sum', ascending=True).tail(10)
         
@@ -264,10 +275,10 @@ def display_analytics(df):
         st.markdown("#### Assignment Completion vs GPA")
         sample_df = latest_df.sample(min(1000, len(latest_df)))
         fig4 = px.scatter(sample_df, x='assignments_on_time_pct', y='cum_gpa',
-                         color='at_risk_flag',
+                         color='pred_at_risk_flag',
                          labels={'assignments_on_time_pct': 'Assignments On Time (%)',
                                 'cum_gpa': 'Cumulative GPA',
-                                'at_risk_flag': 'At Risk'},
+                                'pred_at_risk_flag': 'At Risk'},
                          color_discrete_map={0: '#2ca02c', 1: '#d62728'},
                          opacity=0.6)
         st.plotly_chart(fig4, use_container_width=True)
@@ -315,20 +326,20 @@ def display_analytics(df):
     
     with col8:
         # LMS Logins vs At-Risk
-        fig8 = px.box(latest_df, x='at_risk_flag', y='lms_logins',
-                     labels={'at_risk_flag': 'At Risk Status', 'lms_logins': 'LMS Logins'},
+        fig8 = px.box(latest_df, x='pred_at_risk_flag', y='lms_logins',
+                     labels={'pred_at_risk_flag': 'At Risk Status', 'lms_logins': 'LMS Logins'},
                      title='LMS Logins by Risk Status',
-                     color='at_risk_flag',
+                     color='pred_at_risk_flag',
                      color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig8.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig8, use_container_width=True)
     
     with col9:
         # Advisor Meetings
-        fig9 = px.box(latest_df, x='at_risk_flag', y='advisor_meetings',
-                     labels={'at_risk_flag': 'At Risk Status', 'advisor_meetings': 'Advisor Meetings'},
+        fig9 = px.box(latest_df, x='pred_at_risk_flag', y='advisor_meetings',
+                     labels={'pred_at_risk_flag': 'At Risk Status', 'advisor_meetings': 'Advisor Meetings'},
                      title='Advisor Meetings by Risk Status',
-                     color='at_risk_flag',
+                     color='pred_at_risk_flag',
                      color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig9.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig9, use_container_width=True)
@@ -338,16 +349,16 @@ def display_analytics(df):
     col10, col11 = st.columns(2)
     
     with col10:
-        fig10 = px.histogram(latest_df, x='dropout_probability',
+        fig10 = px.histogram(latest_df, x='pred_dropout_probability',
                             nbins=30,
-                            labels={'dropout_probability': 'Dropout Probability', 'count': 'Number of Students'},
+                            labels={'pred_dropout_probability': 'Dropout Probability', 'count': 'Number of Students'},
                             title='Distribution of Dropout Probability',
                             color_discrete_sequence=['#ff7f0e'])
         st.plotly_chart(fig10, use_container_width=True)
     
     with col11:
         # High risk students (dropout probability > 0.5)
-        risk_levels = pd.cut(latest_df['dropout_probability'], 
+        risk_levels = pd.cut(latest_df['pred_dropout_probability'], 
                            bins=[0, 0.25, 0.5, 0.75, 1.0],
                            labels=['Low (0-25%)', 'Medium (25-50%)', 'High (50-75%)', 'Very High (75-100%)'])
         risk_counts = risk_levels.value_counts()
@@ -363,7 +374,7 @@ def display_analytics(df):
     
     with col12:
         # Financial Aid Status
-        financial_risk = latest_df.groupby('financial_aid_flag')['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        financial_risk = latest_df.groupby('financial_aid_flag')['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         financial_risk['percentage'] = (financial_risk['sum'] / financial_risk['count'] * 100).round(1)
         
         fig12 = px.bar(financial_risk, x='financial_aid_flag', y='sum',
@@ -425,20 +436,20 @@ def display_analytics(df):
     
     with col17:
         # Tutoring Sessions
-        fig17 = px.box(latest_df, x='at_risk_flag', y='tutoring_sessions',
-                      labels={'at_risk_flag': 'At Risk Status', 'tutoring_sessions': 'Tutoring Sessions'},
+        fig17 = px.box(latest_df, x='pred_at_risk_flag', y='tutoring_sessions',
+                      labels={'pred_at_risk_flag': 'At Risk Status', 'tutoring_sessions': 'Tutoring Sessions'},
                       title='Tutoring Sessions by Risk Status',
-                      color='at_risk_flag',
+                      color='pred_at_risk_flag',
                       color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig17.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig17, use_container_width=True)
     
     with col18:
         # Library Visits
-        fig18 = px.box(latest_df, x='at_risk_flag', y='library_visits',
-                      labels={'at_risk_flag': 'At Risk Status', 'library_visits': 'Library Visits'},
+        fig18 = px.box(latest_df, x='pred_at_risk_flag', y='library_visits',
+                      labels={'pred_at_risk_flag': 'At Risk Status', 'library_visits': 'Library Visits'},
                       title='Library Visits by Risk Status',
-                      color='at_risk_flag',
+                      color='pred_at_risk_flag',
                       color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig18.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig18, use_container_width=True)
@@ -458,10 +469,10 @@ def display_analytics(df):
     
     with col20:
         # Discussion Posts vs At-Risk
-        fig20 = px.box(latest_df, x='at_risk_flag', y='discussion_posts',
-                      labels={'at_risk_flag': 'At Risk Status', 'discussion_posts': 'Discussion Posts'},
+        fig20 = px.box(latest_df, x='pred_at_risk_flag', y='discussion_posts',
+                      labels={'pred_at_risk_flag': 'At Risk Status', 'discussion_posts': 'Discussion Posts'},
                       title='Discussion Posts by Risk Status',
-                      color='at_risk_flag',
+                      color='pred_at_risk_flag',
                       color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig20.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig20, use_container_width=True)
@@ -483,10 +494,10 @@ def display_analytics(df):
         # Credits vs GPA
         sample_df2 = latest_df.sample(min(1000, len(latest_df)))
         fig22 = px.scatter(sample_df2, x='credits_attempted', y='cum_gpa',
-                          color='at_risk_flag',
+                          color='pred_at_risk_flag',
                           labels={'credits_attempted': 'Credits Attempted',
                                  'cum_gpa': 'Cumulative GPA',
-                                 'at_risk_flag': 'At Risk'},
+                                 'pred_at_risk_flag': 'At Risk'},
                           title='Credits Attempted vs GPA',
                           color_discrete_map={0: '#2ca02c', 1: '#d62728'},
                           opacity=0.6)
@@ -506,7 +517,7 @@ def display_analytics(df):
     
     with col24:
         # At-Risk by Residence
-        residence_risk = latest_df.groupby('residence')['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        residence_risk = latest_df.groupby('residence')['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         residence_risk['percentage'] = (residence_risk['sum'] / residence_risk['count'] * 100).round(1)
         
         fig24 = px.bar(residence_risk, x='residence', y='percentage',
@@ -524,7 +535,7 @@ def display_analytics(df):
     
     with col25:
         # Late Registration Impact
-        late_reg_risk = latest_df.groupby('late_registration')['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        late_reg_risk = latest_df.groupby('late_registration')['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         late_reg_risk['percentage'] = (late_reg_risk['sum'] / late_reg_risk['count'] * 100).round(1)
         
         fig25 = px.bar(late_reg_risk, x='late_registration', y='sum',
@@ -540,11 +551,11 @@ def display_analytics(df):
     with col26:
         # Attendance vs Dropout Probability
         sample_df3 = latest_df.sample(min(1000, len(latest_df)))
-        fig26 = px.scatter(sample_df3, x='attendance_rate', y='dropout_probability',
-                          color='at_risk_flag',
+        fig26 = px.scatter(sample_df3, x='attendance_rate', y='pred_dropout_probability',
+                          color='pred_at_risk_flag',
                           labels={'attendance_rate': 'Attendance Rate (%)',
-                                 'dropout_probability': 'Dropout Probability',
-                                 'at_risk_flag': 'At Risk'},
+                                 'pred_dropout_probability': 'Dropout Probability',
+                                 'pred_at_risk_flag': 'At Risk'},
                           title='Attendance Rate vs Dropout Probability',
                           color_discrete_map={0: '#2ca02c', 1: '#d62728'},
                           opacity=0.6)
@@ -570,10 +581,10 @@ def display_analytics(df):
     
     with col28:
         # Balance vs Risk
-        fig28 = px.box(latest_df, x='at_risk_flag', y='outstanding_balance',
-                      labels={'at_risk_flag': 'At Risk Status', 'outstanding_balance': 'Outstanding Balance ($)'},
+        fig28 = px.box(latest_df, x='pred_at_risk_flag', y='outstanding_balance',
+                      labels={'pred_at_risk_flag': 'At Risk Status', 'outstanding_balance': 'Outstanding Balance ($)'},
                       title='Outstanding Balance by Risk Status',
-                      color='at_risk_flag',
+                      color='pred_at_risk_flag',
                       color_discrete_map={0: '#2ca02c', 1: '#d62728'})
         fig28.update_xaxis(ticktext=['Not At Risk', 'At Risk'], tickvals=[0, 1])
         st.plotly_chart(fig28, use_container_width=True)
@@ -595,7 +606,7 @@ def display_analytics(df):
     
     with col30:
         # At-Risk by Ethnicity
-        ethnicity_risk = latest_df.groupby('ethnicity')['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        ethnicity_risk = latest_df.groupby('ethnicity')['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         ethnicity_risk['percentage'] = (ethnicity_risk['sum'] / ethnicity_risk['count'] * 100).round(1)
         ethnicity_risk = ethnicity_risk.sort_values('sum', ascending=False).head(8)
         
@@ -626,7 +637,7 @@ def display_analytics(df):
         # Age vs Risk
         age_bins = pd.cut(latest_df['age'], bins=[0, 20, 25, 30, 35, 100],
                          labels=['Under 20', '20-25', '26-30', '31-35', '35+'])
-        age_risk = latest_df.groupby(age_bins)['at_risk_flag'].agg(['sum', 'count']).reset_index()
+        age_risk = latest_df.groupby(age_bins)['pred_at_risk_flag'].agg(['sum', 'count']).reset_index()
         age_risk['percentage'] = (age_risk['sum'] / age_risk['count'] * 100).round(1)
         
         fig32 = px.bar(age_risk, x='age', y='percentage',
@@ -645,7 +656,7 @@ def display_analytics(df):
     numeric_cols = ['age', 'credits_attempted', 'course_drop_count', 'gpa_term', 'cum_gpa',
                    'lms_logins', 'attendance_rate', 'assignments_on_time_pct', 'discussion_posts',
                    'library_visits', 'work_hours_per_week', 'advisor_meetings', 'tutoring_sessions',
-                   'dropout_probability', 'at_risk_flag']
+                   'pred_dropout_probability', 'pred_at_risk_flag']
     
     corr_matrix = latest_df[numeric_cols].corr()
     
@@ -682,7 +693,7 @@ def display_student_search(df):
             with col3:
                 st.metric("Attendance Rate", f"{latest_record['attendance_rate']:.1f}%")
             with col4:
-                risk_status = "🚨 AT RISK" if latest_record['at_risk_flag'] == 1 else "✅ Not At Risk"
+                risk_status = "🚨 AT RISK" if latest_record['pred_at_risk_flag'] == 1 else "✅ Not At Risk"
                 st.metric("Risk Status", risk_status)
             
             # Term-by-term progress
@@ -705,7 +716,7 @@ def display_student_search(df):
             display_cols = ['term', 'age', 'enrollment_status', 'credits_attempted', 
                           'course_drop_count', 'gpa_term', 'cum_gpa', 'attendance_rate',
                           'assignments_on_time_pct', 'lms_logins', 'advisor_meetings',
-                          'tutoring_sessions', 'dropout_probability', 'at_risk_flag']
+                          'tutoring_sessions', 'pred_dropout_probability', 'pred_at_risk_flag']
             st.dataframe(student_data[display_cols].sort_values('term'), use_container_width=True)
         else:
             st.error(f"No records found for student ID: {search_id}")
@@ -738,7 +749,11 @@ def main():
         
         # Load data
         try:
-            df = load_data()
+            # A rescored copy written by my_app.py's retraining page replaces the extract it was made from
+            path = current_extract(DATA_FILE)
+            version = source_version(path)
+            df = load_data(path, version)
+            latest_df = load_latest(path, version)
             
             # Main content
             st.title("📊 Student Risk Monitoring Dashboard")
@@ -752,11 +767,10 @@ def main():
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown("### Quick Summary")
-                    latest_df = df.sort_values('term').groupby('student_id').last().reset_index()
                     
                     st.write(f"- **Total Unique Students:** {df['student_id'].nunique():,}")
                     st.write(f"- **Total Records:** {len(df):,}")
-                    st.write(f"- **At-Risk Students:** {latest_df['at_risk_flag'].sum():,} ({latest_df['at_risk_flag'].mean()*100:.1f}%)")
+                    st.write(f"- **At-Risk Students:** {latest_df['pred_at_risk_flag'].sum():,} ({latest_df['pred_at_risk_flag'].mean()*100:.1f}%)")
                     st.write(f"- **Average Attendance:** {latest_df['attendance_rate'].mean():.1f}%")
                     st.write(f"- **Average GPA:** {latest_df['cum_gpa'].mean():.2f}")
                     st.write(f"- **Students on Probation:** {latest_df['probation_flag'].sum():,}")
@@ -775,13 +789,13 @@ def main():
                 display_at_risk_students(df)
             
             elif page == "Analytics":
-                display_analytics(df)
+                display_analytics(latest_df)
             
             elif page == "Student Search":
                 display_student_search(df)
         
         except FileNotFoundError:
-            st.error("❌ Data file not found. Please ensure 'HSU_Student_Success_Data.csv' is in the same directory.")
+            st.error(f"❌ Data file not found. Please ensure '{DATA_FILE}' is in the same directory.")
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
 
@@ -0,0 +1,243 @@
+"""Ingest a directory of per-term extracts into one dashboard dataset.
+
+Usage: python term_ingest.py path/to/term_dir [out.csv] [--jobs N]
+
+Every *.csv in the directory is one term file from the registrar. Files are
+parsed in parallel worker processes, checked against the extract schema and
+normalized to its dtypes, then concatenated. With out.csv the combined
+extract is written for the file-based backends (chunked, sqlite, duckdb, or
+term_partitions.py build).
+"""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# PARALLEL PER-TERM INGEST
+# -----------------------------
+# Parsing CSV is the slow part, and term files are independent, so each file
+# is parsed in its own worker process and ingest time follows the number of
+# cores rather than the number of terms. Every parsed file is kept as a
+# pickle named after the SHA-256 of its content and the parse format; a file
+# whose content has not changed is read back from its pickle instead of parsed
+# again. Each file
+# comes out with exactly the schema's columns and dtypes, so one concat
+# allocates every column once and nothing is upcast to object.
+
+DEFAULT_CACHE_DIR = 'ingest_cache'
+MANIFEST_FILE = 'manifest.json'
+# Part of every cached file name; bumped when the parse rules change, so pickles parsed by older rules are not served
+INGEST_FORMAT = 2
+
+# Column -> dtype of the dashboard extract, in extract order
+EXTRACT_SCHEMA = {
+    'student_id': 'object', 'term': 'object', 'major': 'object', 'gender': 'object', 'ethnicity': 'object',
+    'residence': 'object', 'first_generation_flag': 'int64', 'age': 'int64', 'enrollment_status': 'object',
+    'credits_attempted': 'int64', 'course_drop_count': 'int64', 'gpa_term': 'float64', 'cum_gpa': 'float64',
+    'lms_logins': 'int64', 'attendance_rate': 'float64', 'assignments_on_time_pct': 'float64',
+    'discussion_posts': 'int64', 'library_visits': 'int64', 'work_hours_per_week': 'int64',
+    'advisor_meetings': 'int64', 'tutoring_sessions': 'int64', 'probation_flag': 'int64',
+    'financial_aid_flag': 'int64', 'late_registration': 'int64', 'outstanding_balance': 'float64',
+    'pred_dropout_probability': 'float64', 'pred_at_risk_flag': 'int64',
+}
+# Top risk factors and their contributions, written by risk_attribution.py; kept when any term file has them
+FACTOR_COUNT = 3
+FACTOR_COLUMNS = [f'pred_factor_{rank}' for rank in range(1, FACTOR_COUNT + 1)]
+CONTRIBUTION_COLUMNS = [f'{col}_contribution' for col in FACTOR_COLUMNS]
+OPTIONAL_SCHEMA = {**{col: 'object' for col in FACTOR_COLUMNS}, **{col: 'float64' for col in CONTRIBUTION_COLUMNS}}
+# Other names for extract columns, as in HSU_Student_Success_Data.csv; used only when the extract's own name is absent
+COLUMN_ALIASES = {'at_risk_flag': 'pred_at_risk_flag', 'dropout_probability': 'pred_dropout_probability'}
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def term_files(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, '*.csv')))
+
+
+def directory_version(data_dir):
+    """Changes whenever a term file is added, removed or rewritten, from file metadata alone"""
+    stats = [(os.path.basename(path), os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in term_files(data_dir)]
+    return hashlib.sha256(json.dumps(stats).encode()).hexdigest()[:16]
+
+
+def source_columns(header):
+    """Extract column -> the file column it is read from"""
+    sources = {col: col for col in header}
+    for alias, col in COLUMN_ALIASES.items():
+        if alias in header and col not in header:
+            sources[col] = alias
+    return sources
+
+
+def _read_plan(path, columns):
+    """(dtype per wanted column, file column per extract column), checked against the file's header"""
+    sources = source_columns(pd.read_csv(path, nrows=0).columns)
+    if columns is None:
+        columns = list(EXTRACT_SCHEMA) + [col for col in OPTIONAL_SCHEMA if col in sources]
+    missing = [col for col in columns if col not in sources]
+    if missing:
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+    schema = {**EXTRACT_SCHEMA, **OPTIONAL_SCHEMA}
+    return {col: schema.get(col) for col in dict.fromkeys(columns)}, sources
+
+
+def _read_csv(path, dtypes, sources, **kwargs):
+    # Integer columns are parsed as floats, so that a blank is a NaN instead of an error
+    parse_dtypes = {sources[col]: 'float64' if dtype == 'int64' else dtype
+                    for col, dtype in dtypes.items() if dtype is not None}
+    try:
+        return pd.read_csv(path, usecols=[sources[col] for col in dtypes], dtype=parse_dtypes, **kwargs)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def _normalize(frame, path, dtypes, sources, first_line=2):
+    """Extract names and column order; integer columns back to int64 unless they have blanks, which are warned about"""
+    frame = frame.rename(columns={source: col for col, source in sources.items() if source != col})[list(dtypes)]
+    blanks = []
+    for col, dtype in dtypes.items():
+        if dtype != 'int64':
+            continue
+        values = frame[col].to_numpy()
+        blank = np.isnan(values)
+        if (np.mod(values[~blank], 1) != 0).any():
+            raise ValueError(f"{path}: non-integer values in {col}")
+        if blank.any():
+            # File line numbers: one header line, rows counted from 1
+            lines = (np.flatnonzero(blank)[:5] + first_line).tolist()
+            blanks.append(f"{col} ({blank.sum():,} rows, lines {', '.join(map(str, lines))}"
+                          f"{', ...' if blank.sum() > 5 else ''})")
+        else:
+            frame[col] = values.astype('int64')
+    if blanks:
+        warnings.warn(f"{path}: blank values kept as NaN in {'; '.join(blanks)}", stacklevel=3)
+    return frame
+
+
+def parse_term_file(path, columns=None):
+    """One term file with exactly the schema's columns, names and dtypes; ValueError naming the file otherwise
+
+    An integer column with blanks is kept as float64 with NaN, as pandas reads it, and the blank rows are
+    reported in a warning rather than failing the load. With columns, only those are read.
+    """
+    dtypes, sources = _read_plan(path, columns)
+    return _normalize(_read_csv(path, dtypes, sources), path, dtypes, sources)
+
+
+def read_extract_chunks(path, chunksize, columns=None):
+    """parse_term_file a chunk at a time, for extracts read out of core"""
+    dtypes, sources = _read_plan(path, columns)
+    first_line = 2
+    for chunk in _read_csv(path, dtypes, sources, chunksize=chunksize):
+        yield _normalize(chunk, path, dtypes, sources, first_line)
+        first_line += len(chunk)
+
+
+def add_missing_columns(frame, columns):
+    """Empty optional columns, so every term frame has the same columns before the concat"""
+    for col in columns:
+        if col not in frame:
+            frame[col] = pd.Series(None if OPTIONAL_SCHEMA[col] == 'object' else np.nan, index=frame.index,
+                                   dtype=OPTIONAL_SCHEMA[col])
+    return frame[list(EXTRACT_SCHEMA) + columns]
+
+
+def cache_path(cache_dir, content_hash):
+    return os.path.join(cache_dir, f'{content_hash}.v{INGEST_FORMAT}.pkl')
+
+
+def ingest_file(path, cache_dir):
+    """Parse one term file, or read it back from the cache when its content hash is unchanged"""
+    content_hash = file_hash(path)
+    cached = cache_path(cache_dir, content_hash)
+    if os.path.exists(cached):
+        return content_hash, pd.read_pickle(cached), False
+    frame = parse_term_file(path)
+    # Two files with the same content, or two processes ingesting the same directory, may write this pickle at once
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(cached) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        frame.to_pickle(tmp_path)
+        os.replace(tmp_path, cached)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return content_hash, frame, True
+
+
+def ingest_directory(data_dir, cache_dir=DEFAULT_CACHE_DIR, max_workers=None):
+    """All term files of data_dir as one frame, plus a per-file report of what was parsed or skipped"""
+    paths = term_files(data_dir)
+    if not paths:
+        raise FileNotFoundError(f"No term files (*.csv) in {data_dir}")
+    os.makedirs(cache_dir, exist_ok=True)
+    max_workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    if max_workers > 1:
+        # Spawned, not forked: the dashboard process runs server threads that a fork would copy mid-flight
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(ingest_file, paths, [cache_dir] * len(paths)))
+    else:
+        results = [ingest_file(path, cache_dir) for path in paths]
+
+    report = pd.DataFrame({
+        'file': [os.path.basename(path) for path in paths],
+        'hash': [content_hash for content_hash, _, _ in results],
+        'rows': [len(frame) for _, frame, _ in results],
+        'parsed': [parsed for _, _, parsed in results],
+    })
+    # Factor columns are kept when any term has them
+    optional = [col for col in OPTIONAL_SCHEMA if any(col in frame for _, frame, _ in results)]
+    frames = [add_missing_columns(frame, optional) for _, frame, _ in results]
+    del results
+    # Same columns and dtypes in every frame, so each column is allocated once
+    df = pd.concat(frames, ignore_index=True, copy=False)
+    del frames
+
+    # Drop the pickles of files that changed or left the directory, and those of older parse formats
+    keep = {cache_path(cache_dir, content_hash) for content_hash in report['hash']}
+    for path in glob.glob(os.path.join(cache_dir, '*.pkl')):
+        if path not in keep:
+            os.remove(path)
+    with open(os.path.join(cache_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(dict(zip(report['file'], report['hash'])), f, indent=2, sort_keys=True)
+    return df, report
+
+
+def main():
+    args = sys.argv[1:]
+    jobs = None
+    if '--jobs' in args:
+        i = args.index('--jobs')
+        jobs = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    df, report = ingest_directory(args[0], max_workers=jobs)
+    print(report.drop(columns='hash').to_string(index=False))
+    print(f"{len(df):,} records from {len(report)} term files ({int(report['parsed'].sum())} parsed, "
+          f"{int((~report['parsed']).sum())} unchanged)")
+    if len(args) > 1:
+        df.to_csv(args[1] + '.tmp', index=False)
+        os.replace(args[1] + '.tmp', args[1])
+        print(f"Wrote {args[1]}")
+
+
+if __name__ == '__main__':
+    main()
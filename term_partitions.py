@@ -0,0 +1,229 @@
+"""Term-partitioned storage for the dashboard extract.
+
+Usage:
+    python term_partitions.py build path/to/extract.csv [store_dir]
+    python term_partitions.py archive path/to/new_term.csv [store_dir]
+
+`build` splits a full extract into one partition per term. `archive` adds or
+replaces the terms found in a smaller file and leaves every other partition
+untouched.
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from chunked_ingest import DEFAULT_CHUNKSIZE, keep_recent_terms
+from term_ingest import EXTRACT_SCHEMA, OPTIONAL_SCHEMA, parse_term_file, read_extract_chunks
+
+# -----------------------------
+# TERM-PARTITIONED STORAGE
+# -----------------------------
+# One CSV per term plus small per-student snapshots: latest term, last two
+# terms, latest at-risk term, and each student's first and last term. Snapshot
+# pages read only the snapshots. Their size follows the number of students,
+# not the number of terms kept. History views read the partitions spanning
+# the requested students' terms, on demand. Archiving a new term folds it
+# into the snapshots and leaves the older partitions alone.
+
+DEFAULT_STORE_DIR = 'term_partitions'
+MANIFEST_FILE = 'manifest.json'
+SNAPSHOT_NAMES = ('latest', 'recent', 'at_risk_latest', 'student_terms')
+# Read back as text whatever they look like, so numeric-looking IDs and terms keep their leading zeros
+TEXT_DTYPES = {**{col: str for col, dtype in {**EXTRACT_SCHEMA, **OPTIONAL_SCHEMA}.items() if dtype == 'object'},
+               'first_term': str, 'last_term': str}
+
+
+def manifest_path(root):
+    return os.path.join(root, MANIFEST_FILE)
+
+
+class TermPartitionStore:
+    """Per-term CSV partitions with incrementally maintained per-student snapshots"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR, max_cached_terms=4):
+        self.root = root
+        self.max_cached_terms = max_cached_terms
+        self._term_cache = OrderedDict()
+        self._student_terms = None
+        # Sessions share one store, so the partition cache is guarded
+        self._lock = threading.Lock()
+        path = manifest_path(root)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'terms': {}}
+
+    @property
+    def terms(self):
+        return sorted(self.manifest['terms'])
+
+    def term_counts(self):
+        return pd.Series(self.manifest['terms'], dtype='int64').sort_index()
+
+    def _term_path(self, term):
+        return os.path.join(self.root, 'terms', f'{term}.csv')
+
+    def _snapshot_path(self, name):
+        return os.path.join(self.root, 'snapshots', f'{name}.csv')
+
+    def _read_csv(self, path, **kwargs):
+        return pd.read_csv(path, dtype=TEXT_DTYPES, **kwargs)
+
+    def _write_csv(self, frame, path):
+        # Readers never see a half-written file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = manifest_path(self.root)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    # -----------------------------
+    # READS
+    # -----------------------------
+    def read_snapshot(self, name):
+        return self._read_csv(self._snapshot_path(name))
+
+    def snapshot(self):
+        """What the snapshot pages need, without reading any term partition"""
+        return {name: self.read_snapshot(name) for name in ('latest', 'recent', 'at_risk_latest')}
+
+    def read_term(self, term):
+        with self._lock:
+            if term in self._term_cache:
+                self._term_cache.move_to_end(term)
+                return self._term_cache[term]
+        frame = self._read_csv(self._term_path(term))
+        with self._lock:
+            self._term_cache[term] = frame
+            if len(self._term_cache) > self.max_cached_terms:
+                self._term_cache.popitem(last=False)
+        return frame
+
+    @property
+    def student_terms(self):
+        if self._student_terms is None:
+            self._student_terms = self.read_snapshot('student_terms')
+        return self._student_terms
+
+    def history(self, student_ids):
+        """Rows of the given students, reading only the partitions their terms span"""
+        spans = self.student_terms[self.student_terms['student_id'].isin(student_ids)]
+        if spans.empty:
+            return self._read_csv(self._snapshot_path('latest'), nrows=0)
+        first, last = spans['first_term'].min(), spans['last_term'].max()
+        matches = []
+        for term in self.terms:
+            if first <= term <= last:
+                frame = self.read_term(term)
+                matches.append(frame[frame['student_id'].isin(spans['student_id'])])
+        return pd.concat(matches).sort_values(['student_id', 'term'], kind='stable')
+
+    def read_columns(self, columns):
+        """Selected columns of every partition, for whole-history aggregates"""
+        return pd.concat([self._read_csv(self._term_path(term), usecols=columns) for term in self.terms],
+                         ignore_index=True)
+
+    # -----------------------------
+    # WRITES
+    # -----------------------------
+    def archive(self, frame):
+        """Add or replace the terms present in frame"""
+        new_terms = sorted(frame['term'].unique())
+        replaces_older = bool(self.terms) and new_terms[0] <= self.terms[-1]
+        for term, rows in frame.groupby('term', sort=True):
+            self._write_csv(rows, self._term_path(term))
+            self.manifest['terms'][term] = len(rows)
+            self._term_cache.pop(term, None)
+        self._student_terms = None
+
+        if replaces_older:
+            # A corrected older term can change any student's snapshot rows, so fold every partition again
+            snapshots = None
+            for term in self.terms:
+                snapshots = fold_term(snapshots, self.read_term(term))
+        else:
+            snapshots = self._read_snapshots() if len(self.terms) > len(new_terms) else None
+            for term, rows in frame.groupby('term', sort=True):
+                snapshots = fold_term(snapshots, rows)
+        for name in SNAPSHOT_NAMES:
+            self._write_csv(snapshots[name], self._snapshot_path(name))
+        self._write_manifest()
+
+    def _read_snapshots(self):
+        return {name: self.read_snapshot(name) for name in SNAPSHOT_NAMES}
+
+
+def fold_term(snapshots, rows):
+    """Snapshots after adding one term that is newer than everything folded so far"""
+    term = rows['term'].iloc[0]
+    spans = pd.DataFrame({'student_id': rows['student_id'].unique(), 'first_term': term, 'last_term': term})
+    at_risk_rows = rows[rows['pred_at_risk_flag'] == 1]
+    if snapshots is None:
+        return {
+            'latest': keep_recent_terms(rows, 1),
+            'recent': keep_recent_terms(rows, 2),
+            'at_risk_latest': keep_recent_terms(at_risk_rows, 1),
+            'student_terms': spans,
+        }
+    # Terms arrive in order, so this term is the last one of everyone in it
+    student_terms = snapshots['student_terms'].copy()
+    student_terms.loc[student_terms['student_id'].isin(spans['student_id']), 'last_term'] = term
+    new_students = spans[~spans['student_id'].isin(student_terms['student_id'])]
+    student_terms = pd.concat([student_terms, new_students], ignore_index=True)
+    return {
+        'latest': keep_recent_terms(pd.concat([snapshots['latest'], rows]), 1),
+        'recent': keep_recent_terms(pd.concat([snapshots['recent'], rows]), 2),
+        'at_risk_latest': keep_recent_terms(pd.concat([snapshots['at_risk_latest'], at_risk_rows]), 1),
+        'student_terms': student_terms,
+    }
+
+
+def build_store(csv_path, root=DEFAULT_STORE_DIR, chunksize=DEFAULT_CHUNKSIZE):
+    """Split a full extract into term partitions, one chunk at a time"""
+    store = TermPartitionStore(root)
+    store.manifest = {'terms': {}}
+    parts_dir = os.path.join(root, 'terms')
+    os.makedirs(parts_dir, exist_ok=True)
+    for name in os.listdir(parts_dir):
+        os.remove(os.path.join(parts_dir, name))
+
+    for chunk in read_extract_chunks(csv_path, chunksize):
+        for term, rows in chunk.groupby('term', sort=True):
+            path = store._term_path(term)
+            rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+            store.manifest['terms'][term] = store.manifest['terms'].get(term, 0) + len(rows)
+
+    snapshots = None
+    for term in store.terms:
+        snapshots = fold_term(snapshots, store._read_csv(store._term_path(term)))
+    for name in SNAPSHOT_NAMES:
+        store._write_csv(snapshots[name], store._snapshot_path(name))
+    store._write_manifest()
+    return store
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('build', 'archive'):
+        print(__doc__)
+        sys.exit(1)
+    root = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_STORE_DIR
+    if sys.argv[1] == 'build':
+        store = build_store(sys.argv[2], root)
+    else:
+        store = TermPartitionStore(root)
+        store.archive(parse_term_file(sys.argv[2]))
+    print(f"{root}: {len(store.terms)} terms, {store.term_counts().sum():,} records")
+
+
+if __name__ == '__main__':
+    main()
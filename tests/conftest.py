@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from term_ingest import EXTRACT_SCHEMA
+
+TERMS = ['2022-1', '2022-2', '2023-1']
+MAJORS = ['Biology', 'Business', 'Engineering', 'Nursing']
+
+
+def make_extract(n_students=40, terms=TERMS, seed=0):
+    """A small extract with the dashboard's columns: one row per student and term"""
+    rng = np.random.default_rng(seed)
+    n = n_students * len(terms)
+    frame = pd.DataFrame({
+        'student_id': np.repeat([f"HSU{100000 + i}" for i in range(n_students)], len(terms)),
+        'term': np.tile(terms, n_students),
+        'major': np.repeat(rng.choice(MAJORS, n_students), len(terms)),
+        'gender': np.repeat(rng.choice(['F', 'M'], n_students), len(terms)),
+        'ethnicity': np.repeat(rng.choice(['A', 'B', 'C'], n_students), len(terms)),
+        'residence': np.repeat(rng.choice(['On-Campus', 'Off-Campus'], n_students), len(terms)),
+        'first_generation_flag': np.repeat(rng.integers(0, 2, n_students), len(terms)),
+        'age': np.repeat(rng.integers(18, 40, n_students), len(terms)),
+        'enrollment_status': rng.choice(['Full-Time', 'Part-Time'], n),
+        'credits_attempted': rng.integers(6, 18, n),
+        'course_drop_count': rng.integers(0, 3, n),
+        'gpa_term': rng.uniform(0, 4, n).round(2),
+        'cum_gpa': rng.uniform(0, 4, n).round(2),
+        'lms_logins': rng.integers(0, 80, n),
+        'attendance_rate': rng.uniform(40, 100, n).round(1),
+        'assignments_on_time_pct': rng.uniform(40, 100, n).round(1),
+        'discussion_posts': rng.integers(0, 10, n),
+        'library_visits': rng.integers(0, 10, n),
+        'work_hours_per_week': rng.integers(0, 40, n),
+        'advisor_meetings': rng.integers(0, 4, n),
+        'tutoring_sessions': rng.integers(0, 4, n),
+        'probation_flag': rng.integers(0, 2, n),
+        'financial_aid_flag': rng.integers(0, 2, n),
+        'late_registration': rng.integers(0, 2, n),
+        'outstanding_balance': rng.uniform(0, 2000, n).round(2),
+        'pred_dropout_probability': rng.uniform(0, 1, n).round(3),
+    })
+    frame['pred_at_risk_flag'] = (frame['pred_dropout_probability'] > 0.5).astype('int64')
+    return frame[list(EXTRACT_SCHEMA)]
+
+
+@pytest.fixture(name='make_extract')
+def make_extract_fixture():
+    """make_extract itself, for tests that need another size or seed"""
+    return make_extract
+
+
+@pytest.fixture
+def extract():
+    return make_extract()
+
+
+@pytest.fixture
+def extract_csv(tmp_path, extract):
+    path = tmp_path / 'extract.csv'
+    extract.to_csv(path, index=False)
+    return str(path)
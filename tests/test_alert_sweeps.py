@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from alert_sweeps import AlertIndex, evaluate_rules, load_rules, window_start
+
+NOW = datetime(2026, 3, 10, 12, tzinfo=timezone.utc)
+RULES = [{'id': 'low_gpa', 'label': 'GPA below 2.0', 'column': 'cum_gpa', 'op': '<', 'value': 2.0, 'window_days': 30}]
+
+
+def snapshot(gpas):
+    return pd.DataFrame({'student_id': list(gpas), 'cum_gpa': list(gpas.values())})
+
+
+def route_to(owners):
+    def route(alerts):
+        routed = alerts[alerts['student_id'].isin(owners)]
+        return routed.assign(recipient=routed['student_id'].map(owners))
+    return route
+
+
+def test_evaluate_rules_and_windows():
+    matches = evaluate_rules(snapshot({'A': 1.5, 'B': 3.0, 'C': 1.99}), RULES, NOW)
+    assert matches['student_id'].tolist() == ['A', 'C']
+    assert matches['detail'].tolist()[0] == 'GPA below 2.0 (cum_gpa = 1.5)'
+    assert window_start(NOW, 30) == matches['window_start'].iloc[0] <= NOW.date().isoformat()
+
+
+def test_load_rules_validates(tmp_path):
+    assert load_rules(str(tmp_path / 'missing.json'))[0]['id'] == 'high_dropout_risk'
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps([dict(RULES[0], op='~')]))
+    with pytest.raises(ValueError, match='unknown operator'):
+        load_rules(str(path))
+
+
+def test_sweep_only_evaluates_changed_students_and_dedupes_per_window(tmp_path):
+    index = AlertIndex(str(tmp_path / 'alerts.db'))
+    first = index.sweep(snapshot({'A': 1.5, 'B': 3.0}), RULES, 'v1', NOW)
+    assert (first['changed'], first['queued']) == (2, 1)
+    # B drops below the threshold; A changes but is already alerted in this window
+    second = index.sweep(snapshot({'A': 1.4, 'B': 1.8}), RULES, 'v2', NOW)
+    assert (second['changed'], second['matched'], second['queued']) == (2, 2, 1)
+    assert index.sweep(snapshot({'A': 1.4, 'B': 1.8}), RULES, 'v3', NOW)['changed'] == 0
+    assert index.status_counts() == {'queued': 2}
+
+
+def test_deliver_sends_one_digest_per_recipient_and_keeps_failures_queued(tmp_path):
+    index = AlertIndex(str(tmp_path / 'alerts.db'))
+    index.sweep(snapshot({'A': 1.5, 'B': 1.0, 'C': 0.5}), RULES, 'v1', NOW)
+    sent = []
+
+    def send(recipient, subject, body):
+        if recipient == 'broken@example.edu':
+            raise OSError("mailbox unavailable")
+        sent.append((recipient, subject))
+
+    route = route_to({'A': 'ann@example.edu', 'B': 'ann@example.edu', 'C': 'broken@example.edu'})
+    assert index.deliver(send, route) == 2
+    assert sent == [('ann@example.edu', 'Student alerts: 2 students')]
+    queued = index.queued()
+    assert queued['student_id'].tolist() == ['C'] and queued['error'].tolist() == ['mailbox unavailable']
+
+
+def test_alerts_without_a_recipient_are_not_queued(tmp_path):
+    index = AlertIndex(str(tmp_path / 'alerts.db'))
+    summary = index.sweep(snapshot({'A': 1.5, 'B': 1.0}), RULES, 'v1', NOW, route=route_to({'A': 'ann@example.edu'}))
+    assert (summary['queued'], summary['unrouted']) == (1, 1)
+    assert index.queued()['student_id'].tolist() == ['A']
+    # B stays unevaluated, so it is queued as soon as someone can receive it
+    later = index.sweep(snapshot({'A': 1.5, 'B': 1.0}), RULES, 'v2', NOW,
+                        route=route_to({'A': 'ann@example.edu', 'B': 'bob@example.edu'}))
+    assert (later['changed'], later['queued']) == (1, 1)
+
+
+def test_manual_sends_are_recorded(tmp_path):
+    index = AlertIndex(str(tmp_path / 'alerts.db'))
+    index.record('A', 'ann@example.edu', 'Attendance warning', NOW)
+    history = index.notifications(['A', 'B'])
+    assert history[['rule', 'status', 'recipients']].values.tolist() == [['manual', 'sent', 'ann@example.edu']]
+
+
+def test_failed_sweeps_are_kept_until_one_succeeds(tmp_path):
+    index = AlertIndex(str(tmp_path / 'alerts.db'))
+    assert index.last_failure() is None
+    index.record_failure('v1', 0, 'OSError: disk full', NOW)
+    index.record_failure('v1', 1, 'OSError: disk full', NOW)
+    # Another process opening the same index sees the failure too
+    assert AlertIndex(index.path).last_failure() == {
+        'version': 'v1', 'attempt': 1, 'failed_at': NOW.isoformat(timespec='seconds'), 'error': 'OSError: disk full'}
+    index.clear_failure()
+    assert index.last_failure() is None
@@ -0,0 +1,100 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api_server
+from api_server import APIError, APIServer, DashboardData, DatasetSnapshot, int_param, is_loopback
+
+
+@pytest.fixture
+def memory_snapshot(monkeypatch, tmp_path, extract_csv):
+    monkeypatch.setattr(api_server, 'DATA_DIR', None)
+    monkeypatch.setattr(api_server, 'extract_file', lambda: extract_csv)
+    monkeypatch.setattr(api_server, 'DATA_STORE_DIR', str(tmp_path / 'store'))
+    return DatasetSnapshot('v1', 'memory')
+
+
+def test_int_param_rejects_negative_values():
+    assert int_param({'limit': ['5']}, 'limit', 10) == 5
+    assert int_param({}, 'offset', 0) == 0
+    for value in ('-1', 'x'):
+        with pytest.raises(APIError) as error:
+            int_param({'limit': [value]}, 'limit', 10)
+        assert error.value.status == 400
+
+
+def test_only_loopback_hosts_are_allowed():
+    assert is_loopback('127.0.0.1') and is_loopback('::1') and is_loopback('localhost')
+    assert not is_loopback('0.0.0.0') and not is_loopback('10.1.2.3') and not is_loopback('example.edu')
+
+
+def test_memory_snapshot_answers_filters(memory_snapshot, extract):
+    latest = extract.groupby('student_id').tail(1)
+    assert memory_snapshot.overview({})['total_students'] == len(latest)
+    biology = memory_snapshot.overview({'major': ['Biology']})
+    assert biology['total_students'] == (latest['major'] == 'Biology').sum()
+    at_risk = memory_snapshot.at_risk({}, 0.5)
+    assert set(at_risk['student_id']) == set(latest.loc[latest['pred_dropout_probability'] > 0.5, 'student_id'])
+    assert len(memory_snapshot.student_history('HSU100002')) == 3
+
+
+def test_refresh_swaps_whole_snapshots(monkeypatch):
+    built = []
+
+    class FakeSnapshot:
+        def __init__(self, version, backend):
+            self.version = version
+            built.append(self)
+
+    monkeypatch.setattr(api_server, 'DatasetSnapshot', FakeSnapshot)
+    data = DashboardData('memory')
+    first = data.current('v1')
+    assert data.current('v1') is first
+    second = data.current('v2')
+    assert second is not first and first.version == 'v1' and second.version == 'v2'
+
+    threads = [threading.Thread(target=data.current, args=('v3',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [snapshot.version for snapshot in built] == ['v1', 'v2', 'v3']
+
+
+class BrokenData:
+    def current(self, version):
+        raise RuntimeError("/secret/path/hsu.db is locked")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(api_server, 'get_dataset_version', lambda: 'v1')
+    server = APIServer(('127.0.0.1', 0), BrokenData())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={'If-None-Match': etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_bad_requests_are_rejected_before_the_etag_check(server):
+    assert get(f"{server}/api/nothing", '"v1"')[0] == 404
+    assert get(f"{server}/api/at-risk?limit=-1", '"v1"')[0] == 400
+    assert get(f"{server}/api/overview?cum_gpa=low", '"v1"')[0] == 400
+    assert get(f"{server}/api/overview", '"v1"')[0] == 304
+
+
+def test_internal_errors_do_not_leak_details(server):
+    status, body = get(f"{server}/api/overview")
+    assert status == 500 and json.loads(body) == {'error': 'Internal error'}
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from chunked_ingest import keep_recent_terms, scan_students_history, stream_extract
+from data_store import latest_snapshot
+
+
+def test_keep_recent_terms_keeps_whole_rows_in_student_order(extract):
+    shuffled = extract.sample(frac=1, random_state=1)
+    recent = keep_recent_terms(shuffled, 2)
+    assert recent.groupby('student_id').size().eq(2).all()
+    assert set(recent['term']) == {'2022-2', '2023-1'}
+    assert recent['student_id'].is_monotonic_increasing
+
+
+def test_stream_extract_matches_in_memory_snapshot(tmp_path, extract):
+    # A blank in the latest term must stay blank rather than fall back to an older value
+    extract.loc[extract['term'] == '2023-1', 'cum_gpa'] = np.nan
+    path = tmp_path / 'extract.csv'
+    extract.sample(frac=1, random_state=2).to_csv(path, index=False)
+
+    streamed = stream_extract(path, chunksize=17)
+    expected = latest_snapshot(pd.read_csv(path))
+    pd.testing.assert_frame_equal(streamed['latest'], expected)
+    assert streamed['latest']['cum_gpa'].isna().all()
+    assert streamed['aggregates'].records == len(extract)
+    assert streamed['aggregates'].term_counts.to_dict() == extract['term'].value_counts().to_dict()
+
+
+def test_at_risk_latest_is_each_students_last_flagged_term(extract_csv, extract):
+    at_risk = stream_extract(extract_csv, chunksize=10)['at_risk_latest']
+    flagged = extract[extract['pred_at_risk_flag'] == 1]
+    assert len(at_risk) == flagged['student_id'].nunique()
+    expected = flagged.groupby('student_id')['term'].max()
+    assert (at_risk.set_index('student_id')['term'] == expected).all()
+
+
+def test_scan_students_history(extract_csv):
+    rows = scan_students_history(extract_csv, ['HSU100003', 'HSU100001'], chunksize=7)
+    assert rows['student_id'].tolist() == ['HSU100001'] * 3 + ['HSU100003'] * 3
+    assert rows['term'].tolist()[:3] == ['2022-1', '2022-2', '2023-1']
+
+
+def test_header_only_extract_gives_empty_snapshots(tmp_path, extract):
+    path = tmp_path / 'empty.csv'
+    extract.iloc[:0].to_csv(path, index=False)
+    streamed = stream_extract(path)
+    for name in ('latest', 'recent', 'at_risk_latest'):
+        assert streamed[name].empty and list(streamed[name].columns) == list(extract.columns)
+    assert streamed['aggregates'].records == 0 and streamed['sketches'].summary()[2] == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from cohort_index import CohortIndex, filter_key
+from data_store import latest_snapshot
+
+
+@pytest.fixture
+def latest(extract):
+    latest = latest_snapshot(extract)
+    latest.loc[3, 'cum_gpa'] = np.nan
+    return latest
+
+
+def expected_mask(latest, filters):
+    mask = np.ones(len(latest), dtype=bool)
+    for col, predicate in filters.items():
+        if isinstance(predicate, tuple):
+            mask &= latest[col].between(*predicate).to_numpy()
+        elif predicate:
+            mask &= latest[col].isin(predicate).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'major': ['Biology', 'Nursing']},
+    {'major': ['Business'], 'residence': ['On-Campus'], 'probation_flag': [1]},
+    {'cum_gpa': (1.0, 2.5)},
+    {'gender': ['F'], 'pred_dropout_probability': (0.5, 1.0), 'attendance_rate': (60, 90)},
+    {'major': []},
+    {'major': ['Astronomy']},
+])
+def test_select_matches_boolean_masks(latest, filters):
+    index = CohortIndex(latest)
+    bits = index.select(filters)
+    np.testing.assert_array_equal(index.to_mask(bits), expected_mask(latest, filters))
+    assert index.count(bits) == expected_mask(latest, filters).sum()
+
+
+def test_ranges_skip_missing_values(latest):
+    index = CohortIndex(latest)
+    assert not index.to_mask(index.between('cum_gpa'))[3]
+    assert index.bounds('cum_gpa') == (latest['cum_gpa'].min(), latest['cum_gpa'].max())
+    assert index.values('major') == sorted(latest['major'].unique())
+
+
+def test_empty_snapshot(latest):
+    index = CohortIndex(latest.iloc[:0])
+    assert index.count(index.select({'major': ['Biology']})) == 0
+    assert index.bounds('cum_gpa') == (0.0, 0.0)
+
+
+def test_filter_key_ignores_order_and_empty_predicates():
+    assert filter_key({'major': ['Nursing', 'Biology'], 'cum_gpa': (1.0, 2.0), 'gender': []}) == \
+        filter_key({'cum_gpa': (1.0, 2.0), 'major': ['Biology', 'Nursing']})
+    assert filter_key({'probation_flag': [1]}) == filter_key({'probation_flag': ['1']})
@@ -0,0 +1,51 @@
+import numpy as np
+
+from cohort_sketches import SKETCH_COLUMNS, CohortSketches, HyperLogLog, KLLSketch, exact_summary
+
+QS = (0.1, 0.5, 0.9)
+
+
+def rank_error(values, estimate, q):
+    # Tied values share every rank between their first and last position
+    values = np.sort(values)
+    low, high = np.searchsorted(values, estimate, side='left'), np.searchsorted(values, estimate, side='right')
+    return max(low / len(values) - q, q - high / len(values), 0)
+
+
+def test_kll_quantiles_stay_within_bounds():
+    values = np.random.default_rng(1).normal(size=50_000)
+    sketch = KLLSketch().update(values[:20_000]).merge(KLLSketch(seed=1).update(values[20_000:]))
+    assert sketch.n == len(values)
+    for q, estimate in zip(QS, sketch.quantiles(QS)):
+        assert rank_error(values, estimate, q) < 0.02
+
+
+def test_kll_ignores_nan_and_handles_empty():
+    assert np.isnan(KLLSketch().quantiles([0.5])[0])
+    assert KLLSketch().update([1.0, np.nan, 3.0]).n == 2
+
+
+def test_hyperloglog_counts_distinct_ids():
+    ids = np.array([f"HSU{i}" for i in range(20_000)], dtype=object)
+    hll = HyperLogLog().update(ids[:12_000]).merge(HyperLogLog().update(ids[8_000:]))
+    assert abs(hll.count() - len(ids)) / len(ids) < 0.05
+    # Linear counting keeps small cohorts within a student or two
+    assert abs(HyperLogLog().update(ids[:100]).count() - 100) <= 2
+
+
+def test_cohort_matches_exact_summary_and_merges_by_chunk(make_extract):
+    records = make_extract(n_students=500)
+    whole = CohortSketches().update(records)
+    chunked = CohortSketches().update(records.iloc[:700]).merge(CohortSketches().update(records.iloc[700:]))
+    selections = {'major': ['Biology', 'Nursing'], 'term': ['2023-1']}
+    exact, students, n = exact_summary(records, selections, qs=QS)
+    cohort = records[records['major'].isin(selections['major']) & records['term'].isin(selections['term'])]
+    for sketches in (whole, chunked):
+        table, approx_students, approx_n = sketches.summary(selections, qs=QS)
+        assert approx_n == n and abs(approx_students - students) <= 2
+        assert table.index.tolist() == exact.index.tolist()
+        for col in SKETCH_COLUMNS:
+            for q in QS:
+                assert rank_error(cohort[col].to_numpy(), table.loc[col, q], q) < 0.02
+    assert whole.summary()[2] == len(records)
+    assert list(whole.keys().columns) == whole.group_cols
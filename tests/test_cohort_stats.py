@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from cohort_stats import build_cohort_stats, cohort_correlation
+
+NUMERIC = ['cum_gpa', 'attendance_rate', 'lms_logins']
+
+
+def cohort_frame(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'major': rng.choice(['Biology', 'Nursing', 'History'], n),
+        'term': rng.choice(['2022-1', '2023-1'], n),
+        'residence': rng.choice(['On-campus', 'Off-campus'], n),
+        'cum_gpa': rng.normal(3.0, 0.5, n),
+    })
+    frame['attendance_rate'] = 60 + 10 * frame['cum_gpa'] + rng.normal(0, 5, n)
+    frame['lms_logins'] = rng.poisson(20, n).astype('float64')
+    # Different rows missing in each column, so every pair has its own complete rows
+    for col, share in zip(NUMERIC, (0.1, 0.2, 0.15)):
+        frame.loc[rng.random(n) < share, col] = np.nan
+    return frame
+
+
+def test_one_cohort_matches_pairwise_complete_corr():
+    frame = cohort_frame()
+    stats = build_cohort_stats(frame, NUMERIC)
+    corr, size = cohort_correlation(stats, {'major': ['Biology']})
+    cohort = frame[frame['major'] == 'Biology']
+    assert size == len(cohort)
+    pd.testing.assert_frame_equal(corr, cohort[NUMERIC].corr())
+
+
+def test_a_union_of_cohorts_adds_their_groups():
+    frame = cohort_frame(seed=1)
+    stats = build_cohort_stats(frame, NUMERIC)
+    corr, size = cohort_correlation(stats, {'major': ['Biology', 'History'], 'residence': ['On-campus']})
+    cohort = frame[frame['major'].isin(['Biology', 'History']) & (frame['residence'] == 'On-campus')]
+    assert size == len(cohort)
+    pd.testing.assert_frame_equal(corr, cohort[NUMERIC].corr())
+
+
+def test_pairs_with_fewer_than_two_rows_are_nan():
+    frame = cohort_frame(n=40, seed=2)
+    frame.loc[frame['major'] == 'Nursing', 'lms_logins'] = np.nan
+    frame.loc[frame.index[frame['major'] == 'Nursing'][0], 'lms_logins'] = 5.0
+    corr, _ = cohort_correlation(build_cohort_stats(frame, NUMERIC), {'major': ['Nursing']})
+    assert corr['lms_logins'].isna().all()
+    assert corr.loc['cum_gpa', 'attendance_rate'] > 0.5
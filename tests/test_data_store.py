@@ -0,0 +1,67 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import DataStore, latest_snapshot
+from term_ingest import EXTRACT_SCHEMA, parse_term_file
+
+
+def test_store_parses_once_and_reads_back(tmp_path, extract_csv, extract):
+    store = DataStore(extract_csv, str(tmp_path / 'store'))
+    records = store.records()
+    pd.testing.assert_frame_equal(records, extract)
+    pd.testing.assert_frame_equal(store.latest(), latest_snapshot(extract))
+    assert len(os.listdir(tmp_path / 'store')) == 2
+    # A second store on the same file version reads the pickles, not the CSV
+    pd.testing.assert_frame_equal(DataStore(extract_csv, str(tmp_path / 'store')).records(), records)
+
+
+def test_a_new_file_version_replaces_the_stored_one(tmp_path, extract_csv, extract):
+    root = str(tmp_path / 'store')
+    DataStore(extract_csv, root).records()
+    extract.iloc[:30].to_csv(extract_csv, index=False)
+    os.utime(extract_csv, ns=(10**18, 10**18))
+    assert len(DataStore(extract_csv, root).records()) == 30
+    assert len(os.listdir(root)) == 2
+
+
+def test_aliased_prediction_columns(tmp_path, extract):
+    path = tmp_path / 'legacy.csv'
+    extract.rename(columns={'pred_at_risk_flag': 'at_risk_flag',
+                            'pred_dropout_probability': 'dropout_probability'}).to_csv(path, index=False)
+    records = DataStore(str(path), str(tmp_path / 'store')).records()
+    pd.testing.assert_frame_equal(records, extract)
+
+
+def test_blank_integer_values_are_kept_and_reported(tmp_path, extract):
+    path = tmp_path / 'blanks.csv'
+    extract.astype({'age': 'float64'}).assign(age=lambda f: f['age'].mask(f.index.isin([0, 4]))).to_csv(path, index=False)
+    with pytest.warns(UserWarning, match=r"age \(2 rows, lines 2, 6\)"):
+        frame = parse_term_file(str(path))
+    assert frame['age'].dtype == 'float64' and frame['age'].isna().sum() == 2
+    assert frame['credits_attempted'].dtype == 'int64'
+
+
+def test_clean_files_keep_the_schema_dtypes(extract_csv):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        frame = parse_term_file(extract_csv)
+    assert frame.dtypes.astype(str).to_dict() == EXTRACT_SCHEMA
+
+
+@pytest.mark.parametrize('value, message', [('abc', 'blanks.csv'), ('2.5', 'non-integer values in age')])
+def test_unparseable_values_name_the_file(tmp_path, extract, value, message):
+    path = tmp_path / 'blanks.csv'
+    extract.astype({'age': object}).assign(age=lambda f: f['age'].where(f.index != 3, value)).to_csv(path, index=False)
+    with pytest.raises(ValueError, match=message):
+        parse_term_file(str(path))
+
+
+def test_latest_snapshot_takes_each_students_last_row():
+    frame = pd.DataFrame({'student_id': ['A', 'A', 'B'], 'term': ['2023-1', '2022-1', '2022-1'],
+                          'cum_gpa': [np.nan, 3.0, 2.0]})
+    latest = latest_snapshot(frame)
+    assert latest['term'].tolist() == ['2023-1', '2022-1'] and np.isnan(latest['cum_gpa'].iloc[0])
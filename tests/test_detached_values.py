@@ -0,0 +1,62 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from detached_values import DetachedValues
+
+
+def test_a_session_takes_over_what_a_background_thread_built():
+    values = DetachedValues()
+    built = values.get_or_build(('snapshot', 'v1'), lambda: pd.DataFrame({'a': [1]}))
+    assert values.get_or_build(('snapshot', 'v1'), lambda: pytest.fail("built twice")) is built
+    assert values.take(('snapshot', 'v1'), lambda: pytest.fail("built twice")) is built
+    assert len(values) == 0
+
+
+def test_a_background_thread_reuses_what_a_session_built():
+    values = DetachedValues()
+    built = values.take(('snapshot', 'v1'), lambda: pd.DataFrame({'a': [1]}))
+    assert values.get_or_build(('snapshot', 'v1'), lambda: pytest.fail("built twice")) is built
+    assert len(values) == 0
+    # Held weakly: once the session cache lets go, a background thread builds its own
+    del built
+    assert values.get_or_build(('snapshot', 'v1'), lambda: pd.DataFrame({'a': [2]}))['a'].tolist() == [2]
+
+
+def test_values_no_session_takes_are_dropped():
+    now = [0.0]
+    values = DetachedValues(max_age=60, clock=lambda: now[0])
+    values.get_or_build(('diff', 'v1'), dict)
+    now[0] = 61.0
+    values.get_or_build(('diff', 'v2'), dict)
+    assert len(values) == 1
+    assert values.take(('diff', 'v1'), lambda: {'rebuilt': True}) == {'rebuilt': True}
+
+
+def test_a_session_waits_for_a_build_in_progress():
+    values = DetachedValues()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build():
+        started.set()
+        release.wait()
+        return ['background']
+
+    thread = threading.Thread(target=values.get_or_build, args=(('index', 'v1'), slow_build))
+    thread.start()
+    started.wait()
+    threading.Timer(0.1, release.set).start()
+    assert values.take(('index', 'v1'), lambda: ['session']) == ['background']
+    thread.join()
+
+
+def test_a_failed_background_build_leaves_the_session_to_build():
+    values = DetachedValues()
+
+    def failing_build():
+        raise OSError("extract unreadable")
+
+    with pytest.raises(OSError):
+        values.get_or_build(('snapshot', 'v1'), failing_build)
+    assert values.take(('snapshot', 'v1'), lambda: ['session']) == ['session']
@@ -0,0 +1,51 @@
+import threading
+
+import numpy as np
+import pytest
+
+from filter_cache import FilterResultCache
+
+
+def test_get_or_compute_caches_read_only_positions():
+    cache = FilterResultCache()
+    calls = []
+    positions = cache.get_or_compute(('v1', 'cohort'), lambda: calls.append(1) or [3, 1, 2])
+    assert positions.dtype == np.int32 and positions.tolist() == [3, 1, 2]
+    assert cache.get_or_compute(('v1', 'cohort'), lambda: calls.append(1) or []) is positions
+    assert len(calls) == 1
+    with pytest.raises(ValueError):
+        positions[0] = 0
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_results_are_evicted_under_the_byte_cap():
+    cache = FilterResultCache(max_bytes=3 * 400)
+    for key in 'abc':
+        cache.put(key, np.arange(100))
+    cache.get('a')
+    cache.put('d', np.arange(100))
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 1200
+    # A result larger than the cap is returned but not kept
+    assert len(cache.put('e', np.arange(1000))) == 1000 and cache.get('e') is None
+
+
+def test_concurrent_sessions_share_one_consistent_cache():
+    cache = FilterResultCache(max_bytes=40 * 400)
+    wrong = []
+
+    def session(i):
+        for j in range(200):
+            key = (i + j) % 60
+            if cache.get_or_compute(key, lambda: np.full(100, key))[0] != key:
+                wrong.append(key)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert wrong == []
+    stats = cache.stats()
+    assert stats['bytes'] == stats['entries'] * 400 <= 40 * 400
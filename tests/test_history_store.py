@@ -0,0 +1,32 @@
+import pandas as pd
+
+from history_store import HistoryStore
+
+
+def expected_history(extract, student_ids):
+    frames = [extract[extract['student_id'] == student_id].sort_values('term') for student_id in student_ids]
+    return pd.concat(frames)
+
+
+def test_history_groups_students_in_term_order(extract):
+    shuffled = extract.sample(frac=1, random_state=0)
+    store = HistoryStore(shuffled)
+    assert len(store) == extract['student_id'].nunique()
+    student_ids = ['HSU100007', 'HSU100002', 'HSU100031']
+    pd.testing.assert_frame_equal(store.history(student_ids), expected_history(shuffled, student_ids))
+
+
+def test_unknown_students_are_skipped(extract):
+    store = HistoryStore(extract)
+    assert store.locate(['HSU100001', 'HSU999999']).tolist()[1] == -1
+    pd.testing.assert_frame_equal(store.history(['HSU999999', 'HSU100001']),
+                                  expected_history(extract, ['HSU100001']))
+    assert store.student('HSU999999').empty
+    assert list(store.student('HSU999999').columns) == list(extract.columns)
+
+
+def test_student_with_a_single_term(extract):
+    single = pd.concat([extract, extract.iloc[[0]].assign(student_id='HSU200000')], ignore_index=True)
+    store = HistoryStore(single)
+    assert store.student('HSU200000')['term'].tolist() == [extract['term'].iloc[0]]
+    assert store.student('HSU100039')['term'].tolist() == sorted(extract['term'].unique())
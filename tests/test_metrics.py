@@ -0,0 +1,81 @@
+import os
+import threading
+import urllib.request
+
+import pytest
+
+from metrics import MetricsRegistry, serve_metrics
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', "Requests")
+    registry.gauge('queue_depth', "Queued jobs")
+    registry.histogram('load_seconds', "Load time", buckets=(0.1, 1.0))
+    return registry
+
+
+def test_render_exposition_format(registry):
+    registry.inc('requests_total', page='Overview')
+    registry.inc('requests_total', 2, page='Overview')
+    registry.set('queue_depth', 3)
+    registry.observe('load_seconds', 0.5, cache='load_data')
+    registry.observe('load_seconds', 5.0, cache='load_data')
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{page="Overview"} 3.0' in lines
+    assert 'queue_depth 3.0' in lines
+    assert 'load_seconds_bucket{cache="load_data",le="0.1"} 0' in lines
+    assert 'load_seconds_bucket{cache="load_data",le="1.0"} 1' in lines
+    assert 'load_seconds_bucket{cache="load_data",le="+Inf"} 2' in lines
+    assert 'load_seconds_sum{cache="load_data"} 5.5' in lines
+    assert 'load_seconds_count{cache="load_data"} 2' in lines
+
+
+def test_labels_are_escaped(registry):
+    registry.inc('requests_total', page='What\'s "New"\n')
+    assert 'requests_total{page="What\'s \\"New\\"\\n"} 1.0' in registry.render()
+
+
+def test_failing_collector_does_not_break_render(registry):
+    registry.collector(lambda r: r.set('queue_depth', 7))
+    registry.collector(lambda r: 1 / 0)
+    assert 'queue_depth 7.0' in registry.render()
+
+
+def test_concurrent_write_textfile(registry, tmp_path):
+    path = str(tmp_path / 'dashboard.prom')
+    errors = []
+
+    def writer():
+        for _ in range(200):
+            try:
+                registry.inc('requests_total')
+                registry.write_textfile(path)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ['dashboard.prom']
+    with open(path) as f:
+        assert f.read().endswith('\n')
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+
+def test_serve_metrics(registry):
+    registry.set('queue_depth', 1)
+    server = serve_metrics(registry, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert 'queue_depth 1.0' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + '/other')
+    finally:
+        server.shutdown()
@@ -0,0 +1,70 @@
+import threading
+
+import pandas as pd
+
+from chunked_ingest import keep_recent_terms
+from query_backend import QueryBackend, build_database, open_backend, stored_version
+
+
+def test_open_backend_builds_once_per_version(tmp_path, extract_csv, extract):
+    db_path = str(tmp_path / 'dashboard.db')
+    backend = open_backend(extract_csv, db_path, 'v1')
+    assert stored_version(db_path) == 'v1'
+    assert len(backend.latest()) == extract['student_id'].nunique()
+    assert open_backend(extract_csv, db_path, 'v1').columns == backend.columns
+
+
+def test_concurrent_builds_do_not_share_a_temporary_file(tmp_path, extract_csv):
+    db_path = str(tmp_path / 'dashboard.db')
+    errors = []
+
+    def build(version):
+        try:
+            build_database(extract_csv, db_path, version, chunksize=25)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build, args=(f"v{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert stored_version(db_path) in {f"v{i}" for i in range(6)}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['dashboard.db', 'extract.csv']
+    assert len(QueryBackend(db_path).latest()) == 40
+
+
+def test_at_risk_latest_has_a_stable_student_order(tmp_path, extract):
+    # Rows arrive in a scrambled order, so only ORDER BY gives a fixed result order
+    path = tmp_path / 'shuffled.csv'
+    extract.sample(frac=1, random_state=3).to_csv(path, index=False)
+    backend = open_backend(str(path), str(tmp_path / 'dashboard.db'), 'v1')
+
+    at_risk = backend.at_risk_latest()
+    flagged = extract[extract['pred_at_risk_flag'] == 1]
+    assert at_risk['student_id'].tolist() == sorted(flagged['student_id'].unique())
+    assert (at_risk.set_index('student_id')['term'] == flagged.groupby('student_id')['term'].max()).all()
+    filtered = backend.at_risk_latest({'major': ['Biology', 'Nursing']})
+    assert filtered['student_id'].is_monotonic_increasing
+    assert filtered['student_id'].tolist() == backend.at_risk_latest({'major': ['Biology', 'Nursing']})['student_id'].tolist()
+    assert backend.latest()['student_id'].is_monotonic_increasing
+
+
+def test_a_repeated_latest_term_gives_one_row_per_student(tmp_path, extract):
+    # A student whose latest term appears twice keeps the later row, as in pandas
+    last = extract.sort_values(['student_id', 'term'], kind='stable').groupby('student_id').tail(1)
+    repeats = last.iloc[:5].assign(cum_gpa=1.0, pred_at_risk_flag=1)
+    frame = pd.concat([extract, repeats], ignore_index=True)
+    path = tmp_path / 'repeated.csv'
+    frame.to_csv(path, index=False)
+    backend = open_backend(str(path), str(tmp_path / 'dashboard.db'), 'v1')
+
+    latest = backend.latest()
+    assert latest['student_id'].is_unique and len(latest) == extract['student_id'].nunique()
+    expected = keep_recent_terms(frame, 1).set_index('student_id')['cum_gpa']
+    assert (latest.set_index('student_id')['cum_gpa'] == expected.loc[latest['student_id']]).all()
+    assert (latest.set_index('student_id').loc[repeats['student_id'], 'cum_gpa'] == 1.0).all()
+    at_risk = backend.at_risk_latest()
+    assert at_risk['student_id'].is_unique
+    assert (at_risk.set_index('student_id').loc[repeats['student_id'], 'cum_gpa'] == 1.0).all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from retention import build_retention
+
+
+def records():
+    rows = [
+        # student, term, status, major, first generation
+        ('S1', '2021-1', 'Enrolled', 'Biology', 1),
+        ('S1', '2021-2', 'Enrolled', 'Biology', 1),
+        ('S1', '2021-2', 'Enrolled', 'Biology', 1),  # a repeated row counts once
+        ('S1', '2022-1', 'Enrolled', 'Biology', 1),
+        ('S2', '2021-1', 'Enrolled', 'Biology', 0),
+        ('S2', '2021-2', 'Withdrawn', 'Biology', 0),
+        ('S2', '2022-1', 'Enrolled', 'Nursing', 0),  # breakdowns are as of the entering term
+        ('S3', '2021-1', 'Enrolled', 'Nursing', 0),
+        ('S4', '2021-2', 'Enrolled', 'Nursing', 1),
+        ('S4', '2022-1', 'Enrolled', 'Nursing', 1),
+        ('S5', '2022-1', 'Enrolled', 'Biology', 0),
+    ]
+    return pd.DataFrame(rows, columns=['student_id', 'term', 'enrollment_status', 'major', 'first_generation_flag'])
+
+
+def shares(matrix, keys):
+    return matrix.set_index(keys)[[0, 1, 2]].astype(float)
+
+
+def test_overall_shares_leave_unreached_terms_empty():
+    overall = build_retention(records())['overall']
+    assert overall['cohort_size'].tolist() == [3, 1, 1]
+    assert overall['entering_term'].tolist() == ['2021-1', '2021-2', '2022-1']
+    np.testing.assert_allclose(shares(overall, 'entering_term'),
+                               [[1.0, 1 / 3, 2 / 3], [1.0, 1.0, np.nan], [1.0, np.nan, np.nan]])
+
+
+def test_breakdowns_split_each_entering_cohort():
+    by_major = shares(build_retention(records())['major'], ['major', 'entering_term'])
+    np.testing.assert_allclose(by_major.loc[('Biology', '2021-1')], [1.0, 0.5, 1.0])
+    np.testing.assert_allclose(by_major.loc[('Nursing', '2021-1')], [1.0, 0.0, 0.0])
+    np.testing.assert_allclose(by_major.loc[('Nursing', '2021-2')], [1.0, 1.0, np.nan])
+    np.testing.assert_allclose(by_major.loc[('Biology', '2022-1')], [1.0, np.nan, np.nan])
+
+    first_generation = build_retention(records())['first_generation_flag']
+    assert first_generation.set_index(['first_generation_flag', 'entering_term']).loc[(0, '2021-1'), 'cohort_size'] == 2
+    np.testing.assert_allclose(shares(first_generation, ['first_generation_flag', 'entering_term']).loc[(0, '2021-1')],
+                               [1.0, 0.0, 0.5])
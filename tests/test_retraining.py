@@ -0,0 +1,32 @@
+import os
+
+from retraining import current_extract, prune_rescored
+
+
+def touch(path, mtime_ns):
+    path.write_text('student_id\n')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_current_extract_prefers_the_newest_rescore(tmp_path):
+    extract = touch(tmp_path / 'extract.csv', 1_000)
+    assert current_extract(extract) == extract
+    touch(tmp_path / 'extract.rescored-20260101-090000.csv', 2_000)
+    newest = touch(tmp_path / 'extract.rescored-20260102-090000.csv', 3_000)
+    assert current_extract(extract) == newest
+
+
+def test_a_replaced_extract_wins_over_older_rescores(tmp_path):
+    touch(tmp_path / 'extract.rescored-20260101-090000.csv', 2_000)
+    extract = touch(tmp_path / 'extract.csv', 5_000)
+    assert current_extract(extract) == extract
+
+
+def test_prune_keeps_the_newest_copies(tmp_path):
+    extract = touch(tmp_path / 'extract.csv', 1_000)
+    for day in range(1, 5):
+        touch(tmp_path / f'extract.rescored-2026010{day}-090000.csv', 1_000 + day)
+    prune_rescored(extract, keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'extract.csv', 'extract.rescored-20260103-090000.csv', 'extract.rescored-20260104-090000.csv']
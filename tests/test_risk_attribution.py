@@ -0,0 +1,48 @@
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from risk_attribution import CONTRIBUTION_COLUMNS, FACTOR_COLUMNS, RiskAttributor, annotate_extract
+
+
+def test_linear_contributions_are_coef_times_distance_from_the_mean():
+    frame = pd.DataFrame({'cum_gpa': [0.0, 1.0, 2.0], 'attendance_rate': [1.0, 1.0, 4.0]})
+    model = LogisticRegression().fit(frame, [0, 1, 0])
+    model.coef_ = np.array([[2.0, -1.0]])
+    attributor = RiskAttributor(model)
+    # Means are (1, 2): row 0 is (-1 * 2, -1 * -1), row 2 is (1 * 2, 2 * -1)
+    np.testing.assert_allclose(attributor.contributions(frame), [[-2.0, 1.0], [0.0, 1.0], [2.0, -2.0]])
+    factors = attributor.top_factors(frame, count=2)
+    assert factors[FACTOR_COLUMNS[0]].tolist() == ['attendance_rate', 'attendance_rate', 'cum_gpa']
+    assert factors[CONTRIBUTION_COLUMNS[0]].tolist() == [1.0, 1.0, 2.0]
+    # Only features that raise the risk are listed
+    assert factors[FACTOR_COLUMNS[1]].isna().all()
+
+
+def test_tree_contributions_follow_the_split_path():
+    frame = pd.DataFrame({'cum_gpa': [0.0, 0.0, 1.0, 1.0], 'attendance_rate': [5.0, 6.0, 5.0, 6.0]})
+    model = DecisionTreeClassifier(max_depth=1).fit(frame, [0, 0, 1, 1])
+    # The root holds half positives; each leaf moves the risk by 0.5 on cum_gpa
+    contributions = RiskAttributor(model).contributions(frame)
+    np.testing.assert_allclose(contributions, [[-0.5, 0.0], [-0.5, 0.0], [0.5, 0.0], [0.5, 0.0]])
+    factors = RiskAttributor(model).top_factors(frame, count=1)
+    assert factors[FACTOR_COLUMNS[0]].tolist() == [None, None, 'cum_gpa', 'cum_gpa']
+
+
+def test_annotate_keeps_text_ids_and_integer_columns(tmp_path, extract):
+    extract = extract.assign(student_id='0' + extract['student_id'].str[3:])
+    path = tmp_path / 'extract.csv'
+    blank = extract.astype({'library_visits': 'Int64'})
+    blank.loc[70, 'library_visits'] = pd.NA
+    blank.to_csv(path, index=False)
+    model_path = tmp_path / 'model.joblib'
+    features = ['cum_gpa', 'attendance_rate', 'age']
+    joblib.dump(LogisticRegression().fit(extract[features], extract['pred_at_risk_flag']), model_path)
+
+    assert annotate_extract(str(model_path), str(path), chunksize=25, rescore=True) == len(extract)
+    annotated = pd.read_csv(path, dtype=str, keep_default_na=False)
+    assert annotated['student_id'].tolist() == extract['student_id'].tolist()
+    assert annotated.loc[70, 'library_visits'] == '' and not annotated['library_visits'].str.contains(r'\.').any()
+    assert set(FACTOR_COLUMNS) <= set(annotated.columns)
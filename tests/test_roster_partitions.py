@@ -0,0 +1,55 @@
+import pandas as pd
+
+from data_store import DataStore
+from roster_partitions import RosterPartitionStore, load_rosters
+
+
+def chunks(frame, size=25):
+    return (frame.iloc[start:start + size] for start in range(0, len(frame), size))
+
+
+def test_partitions_hold_each_rosters_records(tmp_path, extract):
+    rosters = pd.DataFrame({'username': ['ann', 'ann', 'bob', 'bob', 'cy'],
+                            'student_id': ['HSU100001', 'HSU100002', 'HSU100002', 'HSU100003', 'HSU999999']})
+    store = RosterPartitionStore(str(tmp_path)).build(chunks(extract), rosters, 'v1', 'r1')
+    assert store.is_current('v1', 'r1') and not store.is_current('v2', 'r1')
+
+    reopened = RosterPartitionStore(str(tmp_path))
+    ann = reopened.read('ann')
+    assert sorted(ann['student_id'].unique()) == ['HSU100001', 'HSU100002'] and len(ann) == 6
+    # A student on two rosters is in both partitions
+    assert 'HSU100002' in set(reopened.read('bob')['student_id'])
+    assert reopened.read('cy').empty and reopened.manifest['partitions']['cy']['students'] == 1
+    assert reopened.read('nobody').empty and not reopened.has_roster('nobody')
+
+
+def test_partitions_read_back_with_the_stores_dtypes(tmp_path, extract_csv):
+    records = DataStore(extract_csv, str(tmp_path / 'store')).records()
+    rosters = pd.DataFrame({'username': ['ann'], 'student_id': ['HSU100004']})
+    store = RosterPartitionStore(str(tmp_path / 'rosters')).build(chunks(records), rosters, 'v1', 'r1')
+    pd.testing.assert_series_equal(store.read('ann').dtypes, records.dtypes)
+    pd.testing.assert_series_equal(store.read('nobody').dtypes, records.dtypes)
+
+
+def test_rebuild_replaces_the_previous_directory(tmp_path, extract):
+    rosters = pd.DataFrame({'username': ['ann'], 'student_id': ['HSU100001']})
+    store = RosterPartitionStore(str(tmp_path))
+    store.build(chunks(extract), rosters, 'v1', 'r1')
+    first = store.manifest['directory']
+    store.build(chunks(extract), rosters, 'v2', 'r1')
+    assert not (tmp_path / first).exists() and (tmp_path / store.manifest['directory']).exists()
+
+
+def test_load_rosters_keeps_ids_as_text(tmp_path):
+    path = tmp_path / 'rosters.csv'
+    path.write_text('username,student_id,section\nann,007,A\nann,007,B\nbob,,A\n')
+    assert load_rosters(str(path)).to_dict('records') == [{'username': 'ann', 'student_id': '007'}]
+
+
+def test_numeric_student_ids_match_text_roster_ids(tmp_path, extract):
+    # Chunks read without a schema come back with int64 IDs; rosters are always read as text
+    numeric = extract.assign(student_id=extract['student_id'].str[3:].astype('int64'))
+    rosters = pd.DataFrame({'username': ['ann', 'ann'], 'student_id': ['100001', '100002']})
+    store = RosterPartitionStore(str(tmp_path)).build(chunks(numeric), rosters, 'v1', 'r1')
+    ann = store.read('ann')
+    assert sorted(ann['student_id'].unique()) == ['100001', '100002'] and len(ann) == 6
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from snapshot_diff import DIFF_COLUMNS, SnapshotHistory, change_lists, diff_snapshots
+
+
+def snapshot(rows):
+    return pd.DataFrame(rows, columns=DIFF_COLUMNS)
+
+
+def test_diff_keeps_only_changed_students():
+    previous = snapshot([['A', 'Biology', '2022-1', 0, 0.20, 3.0, 90.0],
+                         ['B', 'Biology', '2022-1', 1, 0.70, 1.8, 60.0],
+                         ['C', 'Nursing', '2022-1', 0, 0.10, 3.5, 95.0],
+                         ['D', 'Nursing', '2022-1', 0, 0.30, 2.5, 80.0]])
+    current = snapshot([['A', 'Biology', '2022-2', 1, 0.60, 2.9, 70.0],
+                        ['B', 'Biology', '2022-2', 0, 0.40, 2.1, 75.0],
+                        ['C', 'Nursing', '2022-2', 0, 0.12, 3.5, 95.0],
+                        ['E', 'Nursing', '2022-2', 0, 0.20, 3.1, 85.0]])
+    diff = diff_snapshots(previous, current)
+    assert dict(zip(diff['student_id'], diff['status'])) == {'A': 'both', 'B': 'both', 'D': 'removed', 'E': 'new'}
+
+    lists = change_lists(diff, 0.25)
+    assert lists['newly_at_risk']['student_id'].tolist() == ['A']
+    assert lists['recovered']['student_id'].tolist() == ['B']
+    assert lists['probability_moved']['student_id'].tolist() == ['A', 'B']
+    assert lists['new']['student_id'].tolist() == ['E']
+    assert lists['removed']['student_id'].tolist() == ['D']
+
+
+def test_record_joins_numeric_looking_ids(tmp_path):
+    history = SnapshotHistory(str(tmp_path))
+    first = snapshot([['007', 'Biology', '2022-1', 0, 0.2, 3.0, 90.0],
+                      ['042', 'Biology', '2022-1', 0, 0.2, 3.0, 90.0]])
+    second = snapshot([['007', 'Biology', '2022-2', 1, 0.8, 2.0, 60.0],
+                       ['042', 'Biology', '2022-2', 0, 0.2, 3.0, 90.0]])
+    history.record('v1', first)
+    history.record('v2', second)
+
+    diff = history.load_diff('v2')
+    assert diff['student_id'].tolist() == ['007']
+    assert diff['status'].tolist() == ['both']
+    assert history.previous_version('v2') == 'v1'
+    assert history.load_diff('v1') is None
+
+
+def test_record_is_idempotent_and_prunes_old_versions(tmp_path):
+    history = SnapshotHistory(str(tmp_path), keep=2)
+    rows = snapshot([['A', 'Biology', '2022-1', 0, 0.2, 3.0, 90.0]])
+    for version in ('v1', 'v2', 'v2', 'v3'):
+        history.record(version, rows)
+    assert SnapshotHistory(str(tmp_path)).manifest['versions'] == ['v2', 'v3']
+    assert not (tmp_path / 'v1.snapshot.csv.gz').exists()
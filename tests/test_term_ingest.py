@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+
+from chunked_ingest import stream_extract
+from data_store import latest_snapshot
+from query_backend import open_backend
+from term_ingest import INGEST_FORMAT, ingest_directory, parse_term_file, read_extract_chunks
+from term_partitions import build_store
+
+
+def write_terms(data_dir, extract):
+    os.makedirs(data_dir, exist_ok=True)
+    for term, frame in extract.groupby('term'):
+        frame.to_csv(os.path.join(data_dir, f'{term}.csv'), index=False)
+
+
+def test_unchanged_files_are_read_from_the_cache(tmp_path, extract):
+    data_dir, cache_dir = str(tmp_path / 'terms'), str(tmp_path / 'cache')
+    write_terms(data_dir, extract)
+    df, report = ingest_directory(data_dir, cache_dir, max_workers=1)
+    assert report['parsed'].all()
+    expected = extract.sort_values(['term', 'student_id'], kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected)
+    df, report = ingest_directory(data_dir, cache_dir, max_workers=1)
+    assert not report['parsed'].any()
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_identical_files_share_one_pickle(tmp_path, extract):
+    data_dir, cache_dir = str(tmp_path / 'terms'), str(tmp_path / 'cache')
+    write_terms(data_dir, extract)
+    extract[extract['term'] == '2022-1'].to_csv(os.path.join(data_dir, 'copy.csv'), index=False)
+    df, report = ingest_directory(data_dir, cache_dir, max_workers=2)
+    assert len(df) == len(extract) + 40
+    assert sorted(os.listdir(cache_dir)) == sorted(
+        [f'{content_hash}.v{INGEST_FORMAT}.pkl' for content_hash in set(report['hash'])] + ['manifest.json'])
+
+
+def test_pickles_of_an_older_format_are_parsed_again_and_dropped(tmp_path, extract):
+    data_dir, cache_dir = str(tmp_path / 'terms'), str(tmp_path / 'cache')
+    write_terms(data_dir, extract)
+    _, report = ingest_directory(data_dir, cache_dir, max_workers=1)
+    for content_hash in report['hash']:
+        # What an older release cached: same content hash, different parse rules
+        extract.iloc[:1].to_pickle(os.path.join(cache_dir, f'{content_hash}.pkl'))
+        os.remove(os.path.join(cache_dir, f'{content_hash}.v{INGEST_FORMAT}.pkl'))
+    df, report = ingest_directory(data_dir, cache_dir, max_workers=1)
+    assert report['parsed'].all() and len(df) == len(extract)
+    assert not [name for name in os.listdir(cache_dir) if not name.endswith((f'.v{INGEST_FORMAT}.pkl', '.json'))]
+
+
+def legacy_extract_csv(tmp_path, extract):
+    # Older extracts such as HSU_Student_Success_Data.csv name the prediction columns without the pred_ prefix
+    path = tmp_path / 'legacy.csv'
+    extract.rename(columns={'pred_at_risk_flag': 'at_risk_flag',
+                            'pred_dropout_probability': 'dropout_probability'}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunks_match_the_whole_file(tmp_path, extract):
+    path = legacy_extract_csv(tmp_path, extract)
+    chunks = list(read_extract_chunks(path, 25))
+    assert len(chunks) == 5
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), parse_term_file(path))
+    columns = ['student_id', 'pred_at_risk_flag']
+    pd.testing.assert_frame_equal(pd.concat(read_extract_chunks(path, 25, columns), ignore_index=True),
+                                  extract[columns])
+
+
+def test_every_backend_reads_the_older_naming(tmp_path, extract):
+    path = legacy_extract_csv(tmp_path, extract)
+    expected = latest_snapshot(extract)
+    pd.testing.assert_frame_equal(stream_extract(path, chunksize=25)['latest'], expected)
+    backend = open_backend(path, str(tmp_path / 'dashboard.db'), 'v1')
+    pd.testing.assert_frame_equal(backend.latest(), expected, check_dtype=False)
+    store = build_store(path, str(tmp_path / 'partitions'), chunksize=25)
+    assert store.read_snapshot('latest')['pred_at_risk_flag'].tolist() == expected['pred_at_risk_flag'].tolist()
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from data_store import latest_snapshot
+from term_partitions import TermPartitionStore, build_store
+
+
+def numeric_ids(extract):
+    # IDs that look like numbers, with leading zeros
+    return extract.assign(student_id='00' + extract['student_id'].str[3:])
+
+
+def test_store_reads_back_text_ids(tmp_path, extract):
+    extract = numeric_ids(extract)
+    path = tmp_path / 'extract.csv'
+    extract.to_csv(path, index=False)
+    build_store(str(path), str(tmp_path / 'store'), chunksize=25)
+
+    store = TermPartitionStore(str(tmp_path / 'store'))
+    pd.testing.assert_frame_equal(store.read_snapshot('latest'), latest_snapshot(extract))
+    assert store.student_terms['student_id'].iloc[0] == '00100000'
+    history = store.history(['00100003'])
+    assert history['term'].tolist() == ['2022-1', '2022-2', '2023-1']
+    assert store.history(['100003']).empty
+    assert store.read_columns(['student_id'])['student_id'].str.startswith('00').all()
+
+
+def test_archive_folds_a_new_term(tmp_path, extract):
+    extract = numeric_ids(extract)
+    store = TermPartitionStore(str(tmp_path))
+    store.archive(extract[extract['term'] < '2023-1'])
+    store.archive(extract[extract['term'] == '2023-1'])
+    reopened = TermPartitionStore(str(tmp_path))
+    assert reopened.terms == ['2022-1', '2022-2', '2023-1']
+    pd.testing.assert_frame_equal(reopened.read_snapshot('latest'), latest_snapshot(extract))
+    assert reopened.read_snapshot('recent').groupby('student_id').size().eq(2).all()
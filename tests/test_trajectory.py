@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from trajectory import build_trajectories, rapid_decline
+
+
+def history():
+    # A skipped 2022-2 and 2023-1, rows out of order, and a student with a single term
+    return pd.DataFrame({
+        'student_id': ['A', 'B', 'A', 'A'],
+        'term': ['2023-2', '2022-1', '2022-1', '2021-2'],
+        'gpa_term': [2.0, 3.5, 3.2, 3.0],
+        'cum_gpa': [2.8, 3.5, 3.1, 3.0],
+        'attendance_rate': [70.0, 95.0, 90.0, np.nan],
+        'lms_logins': [10.0, 30.0, 40.0, 35.0],
+        'assignments_on_time_pct': [60.0, 90.0, 85.0, 80.0],
+    })
+
+
+def test_deltas_are_against_the_previous_recorded_term():
+    trajectories = build_trajectories(history()).set_index(['student_id', 'term'])
+    assert list(trajectories.index) == [('A', '2021-2'), ('A', '2022-1'), ('A', '2023-2'), ('B', '2022-1')]
+    # 2023-2 follows 2022-1 across the missing terms
+    gap = trajectories.loc[('A', '2023-2')]
+    assert np.isclose(gap['gpa_term_delta'], -1.2) and np.isclose(gap['cum_gpa_delta'], -0.3)
+    assert gap['attendance_rate_delta'] == -20.0 and gap['lms_logins_delta'] == -30.0
+    # A blank value leaves only the deltas that touch it blank
+    assert np.isnan(trajectories.loc[('A', '2022-1'), 'attendance_rate_delta'])
+    assert trajectories.loc[('A', '2022-1'), 'lms_logins_delta'] == 5.0
+    # First terms have no delta
+    assert trajectories.loc[[('A', '2021-2'), ('B', '2022-1')], 'gpa_term_delta'].isna().all()
+    assert trajectories['is_latest'].tolist() == [False, False, True, True]
+
+
+def test_rapid_decline_counts_signals_across_the_gap():
+    latest = pd.DataFrame({'student_id': ['A', 'B'], 'major': ['Biology', 'Nursing'],
+                           'pred_dropout_probability': [0.3, 0.1], 'pred_at_risk_flag': [0, 0]})
+    declining = rapid_decline(build_trajectories(history()), latest)
+    assert declining['student_id'].tolist() == ['A']
+    # gpa_term, cum_gpa, attendance, logins and on-time assignments all crossed their thresholds
+    assert declining['decline_signals'].tolist() == [5]
+    assert rapid_decline(build_trajectories(history()), latest.assign(pred_at_risk_flag=1)).empty
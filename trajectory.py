@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# TERM-OVER-TERM TRAJECTORIES
+# -----------------------------
+TRAJECTORY_COLUMNS = ['gpa_term', 'cum_gpa', 'attendance_rate', 'lms_logins', 'assignments_on_time_pct']
+
+# A change at or below these values counts as one declining signal
+DECLINE_THRESHOLDS = {
+    'gpa_term': -0.5,
+    'cum_gpa': -0.2,
+    'attendance_rate': -10.0,
+    'lms_logins': -15.0,
+    'assignments_on_time_pct': -15.0,
+}
+
+
+def build_trajectories(df, columns=TRAJECTORY_COLUMNS):
+    """Term-over-term deltas for every student in one grouped shift"""
+    history = df.sort_values(['student_id', 'term'], kind='stable')
+    previous = history.groupby('student_id', sort=False)[columns].shift()
+    deltas = (history[columns] - previous).add_suffix('_delta')
+    trajectories = pd.concat([history[['student_id', 'term'] + columns], deltas], axis=1)
+    trajectories['is_latest'] = ~history['student_id'].duplicated(keep='last').to_numpy()
+    return trajectories.reset_index(drop=True)
+
+
+def rapid_decline(trajectories, latest_df, thresholds=DECLINE_THRESHOLDS, min_signals=2,
+                  exclude_flagged=True):
+    """Students whose latest term crossed at least min_signals decline thresholds"""
+    latest = trajectories[trajectories['is_latest']]
+    signals = np.zeros(len(latest), dtype='int64')
+    for col, threshold in thresholds.items():
+        signals += (latest[f'{col}_delta'] <= threshold).to_numpy()
+
+    declining = latest[signals >= min_signals].assign(decline_signals=signals[signals >= min_signals])
+    info = latest_df[['student_id', 'major', 'pred_dropout_probability', 'pred_at_risk_flag']]
+    declining = declining.merge(info, on='student_id', how='inner')
+    if exclude_flagged:
+        declining = declining[declining['pred_at_risk_flag'] != 1]
+    return declining.sort_values(['decline_signals', 'gpa_term_delta'], ascending=[False, True])